@@ -3,12 +3,15 @@ from .models import (
     Course, Chapter, Topic, 
     Quiz, Question, Answer, 
     UserProgress, QuizAttempt,
-    MatchingGame, MatchingPair, GameAttempt # <-- GameAttempt ইমপোর্ট করুন
+    MatchingGame, MatchingPair, GameAttempt, # <-- GameAttempt ইমপোর্ট করুন
+    UserCourseStats, QuizScoreSummary, GameScoreSummary,
+    LeaderboardEntry, LeaderboardScoreCount, CourseSnapshot,
+    OptimizedImage, ImageUpload
 )
+from .snapshots import publish_course, unpublish_course
 #from nested_admin.nested import NestedModelAdmin, NestedTabularInline # <-- nested_admin ইমপোর্ট করুন (যদি আগে থাকে)
 
 # --- সাধারণ মডেলগুলো রেজিস্টার করা ---
-admin.site.register(Course)
 admin.site.register(Chapter)
 admin.site.register(Topic)
 # admin.site.register(Quiz) # <-- এটি নিচে বিশেষভাবে রেজিস্টার হবে
@@ -17,6 +20,46 @@ admin.site.register(Answer)
 admin.site.register(UserProgress)
 admin.site.register(QuizAttempt) 
 admin.site.register(GameAttempt) # <-- নতুন গেম অ্যাটেম্পট
+admin.site.register(UserCourseStats)
+admin.site.register(QuizScoreSummary)
+admin.site.register(GameScoreSummary)
+admin.site.register(LeaderboardEntry)
+admin.site.register(LeaderboardScoreCount)
+admin.site.register(OptimizedImage)
+admin.site.register(ImageUpload)
+
+# --- Publishing (api/snapshots.py) ---
+# Edits change the draft only; learners see a course as it was last published
+@admin.register(Course)
+class CourseAdmin(admin.ModelAdmin):
+    list_display = ('title', 'content_version', 'published_version', 'published_at')
+    readonly_fields = ('content_version', 'published_version', 'published_at')
+    actions = ('publish', 'unpublish')
+
+    @admin.action(description="Publish selected courses")
+    def publish(self, request, queryset):
+        for course_id in queryset.values_list('id', flat=True):
+            publish_course(course_id)
+        self.message_user(request, f"Published {len(queryset)} course(s).")
+
+    @admin.action(description="Unpublish selected courses (serve the live draft)")
+    def unpublish(self, request, queryset):
+        for course_id in queryset.values_list('id', flat=True):
+            unpublish_course(course_id)
+        self.message_user(request, f"Unpublished {len(queryset)} course(s).")
+
+@admin.register(CourseSnapshot)
+class CourseSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('course', 'version', 'content_version', 'created_at')
+    list_filter = ('course',)
+    exclude = ('body', 'body_gzip', 'body_br', 'answer_keys')
+    readonly_fields = ('course', 'version', 'content_version', 'tree_format', 'sha256', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 # --- Quiz-এর জন্য বিশেষ অ্যাডমিন ---
 # (যদি nested_admin ব্যবহার না করেন, তবে এটি বাদ দিতে পারেন)
@@ -0,0 +1,236 @@
+import html
+import math
+import re
+from collections import namedtuple
+from html.parser import HTMLParser
+
+from django.conf import settings
+
+
+# --- Pre-rendered articles ---
+# Topic.article_content is whatever CKEditor (or an admin pasting HTML)
+# produced. Every save renders it once (api/signals.py) into:
+#   - article_html: the markup readers get, restricted to ALLOWED_TAGS and
+#     their attributes (no scripts, event handlers or javascript: URLs) and
+#     with insignificant whitespace and comments removed
+#   - article_text: plain text, one block per line, for search and summaries
+#   - word_count / reading_minutes
+# so serving an article never parses or cleans it per request.
+DEFAULTS = {
+    'WORDS_PER_MINUTE': 200,
+}
+
+
+def article_config():
+    return {**DEFAULTS, **getattr(settings, 'ARTICLE_RENDERING', {})}
+
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'caption', 'cite', 'code', 'col', 'colgroup',
+    'dd', 'del', 'div', 'dl', 'dt', 'em', 'figcaption', 'figure',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'ins', 'kbd', 'li', 'mark',
+    'ol', 'p', 'picture', 'pre', 'q', 's', 'samp', 'small', 'source', 'span', 'strike',
+    'strong', 'sub', 'sup', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul',
+}
+GLOBAL_ATTRIBUTES = {'class', 'dir', 'lang', 'style', 'title'}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'id', 'name', 'rel', 'target'},
+    'blockquote': {'cite'},
+    'col': {'span'},
+    'colgroup': {'span'},
+    # srcset/sizes/loading/decoding come from api/images.py
+    'img': {'alt', 'decoding', 'height', 'loading', 'sizes', 'src', 'srcset', 'width'},
+    'ol': {'reversed', 'start', 'type'},
+    'q': {'cite'},
+    'source': {'media', 'sizes', 'srcset', 'type'},
+    'table': {'border', 'cellpadding', 'cellspacing', 'summary'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+}
+URL_ATTRIBUTES = {'cite', 'href', 'src'}
+SAFE_SCHEMES = {'http', 'https', 'mailto', 'tel'}
+# Removed together with everything inside them; other unknown tags are
+# unwrapped, keeping their text
+DROPPED_TAGS = {
+    'button', 'embed', 'form', 'frame', 'frameset', 'head', 'iframe', 'input', 'math',
+    'noscript', 'object', 'script', 'select', 'style', 'svg', 'template', 'textarea', 'title',
+}
+VOID_TAGS = {'br', 'col', 'embed', 'frame', 'hr', 'img', 'input', 'source', 'wbr'}
+# Whitespace next to these is insignificant, and they end a line of text
+BLOCK_TAGS = {
+    'blockquote', 'br', 'caption', 'col', 'colgroup', 'dd', 'div', 'dl', 'dt', 'figcaption',
+    'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'li', 'ol', 'p', 'picture', 'pre',
+    'source', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'ul',
+}
+
+WHITESPACE = re.compile(r'\s+')
+# Only these collapse in HTML; &nbsp; stays as it is
+HTML_WHITESPACE = re.compile(r'[ \t\n\r\f]+')
+# Browsers ignore these inside a URL, so "java\tscript:" is still javascript:
+URL_IGNORED = re.compile(r'[\x00-\x20\x7f]+')
+UNSAFE_STYLE = ('url(', 'expression(', 'javascript:', '@import', 'behavior:', '-moz-binding')
+
+RenderedArticle = namedtuple('RenderedArticle', 'html text word_count reading_minutes')
+
+
+def _safe_url(value):
+    cleaned = URL_IGNORED.sub('', value)
+    scheme, colon, _ = cleaned.partition(':')
+    if not colon or any(ch in scheme for ch in '/?#'):
+        return True  # relative
+    return scheme.lower() in SAFE_SCHEMES
+
+
+def _safe_attribute(name, value):
+    if name.startswith('on'):
+        return False
+    if name in URL_ATTRIBUTES:
+        return _safe_url(value)
+    if name == 'srcset':
+        return all(_safe_url(candidate.strip().split(' ')[0]) for candidate in value.split(',') if candidate.strip())
+    if name == 'style':
+        if '\\' in value:
+            # A CSS escape can spell any character (\75rl( is url(), and
+            # editors never write them
+            return False
+        normalized = re.sub(r'/\*.*?\*/|\s', '', value, flags=re.DOTALL).lower()
+        return not any(token.replace(' ', '') in normalized for token in UNSAFE_STYLE)
+    return True
+
+
+class ArticleRenderer(HTMLParser):
+    """
+    One pass over the editor's HTML, writing the cleaned markup and the
+    plain text side by side. Unbalanced markup is closed as it would be in
+    the browser, so the output never leaks tags into the page around it.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.markup = []
+        self.text = []
+        self.open_tags = []
+        self.dropping = 0
+        self.preformatted = 0
+        self.trim = True  # drop the whitespace that follows (start, or after a block tag)
+
+    # Markup output
+    def _emit_tag(self, tag, attrs, closing=False):
+        block = tag in BLOCK_TAGS
+        if block and not self.preformatted and self.markup and self.markup[-1].endswith(' '):
+            # Text chunks are escaped, so only they can end in a space
+            self.markup[-1] = self.markup[-1].rstrip(' ')
+        if closing:
+            if tag == 'pre':
+                self.preformatted -= 1
+            self.markup.append(f'</{tag}>')
+        else:
+            allowed = GLOBAL_ATTRIBUTES | ALLOWED_ATTRIBUTES.get(tag, set())
+            rendered = {}
+            for name, value in attrs:
+                value = (value or '').strip()
+                if name in allowed and name not in rendered and _safe_attribute(name, value):
+                    rendered[name] = value
+            if tag == 'a' and rendered.get('target') == '_blank':
+                rendered['rel'] = 'noopener noreferrer'
+            self.markup.append(f'<{tag}' + ''.join(
+                f' {name}="{html.escape(value)}"' if value else f' {name}' for name, value in rendered.items()
+            ) + '>')
+            if tag == 'pre':
+                self.preformatted += 1
+        if block:
+            self.text.append('\n')
+            self.trim = not self.preformatted
+        elif tag in VOID_TAGS:
+            self.trim = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROPPED_TAGS:
+            if tag not in VOID_TAGS:
+                self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        self._emit_tag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in DROPPED_TAGS or self.dropping or tag not in ALLOWED_TAGS:
+            return
+        self._emit_tag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self._emit_tag(tag, (), closing=True)
+
+    def handle_endtag(self, tag):
+        if tag in DROPPED_TAGS:
+            if self.dropping and tag not in VOID_TAGS:
+                self.dropping -= 1
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        while self.open_tags:
+            current = self.open_tags.pop()
+            self._emit_tag(current, (), closing=True)
+            if current == tag:
+                break
+
+    def handle_data(self, data):
+        if self.dropping:
+            return
+        self.text.append(data)
+        if not self.preformatted:
+            data = HTML_WHITESPACE.sub(' ', data)
+            if self.trim or (self.markup and self.markup[-1].endswith(' ')):
+                data = data.lstrip(' ')
+            if not data:
+                return
+            self.trim = False
+        self.markup.append(html.escape(data, quote=False))
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self._emit_tag(self.open_tags.pop(), (), closing=True)
+
+    # Results
+    def rendered_html(self):
+        return ''.join(self.markup).strip()
+
+    def plain_text(self):
+        lines = (WHITESPACE.sub(' ', line).strip() for line in ''.join(self.text).split('\n'))
+        return '\n'.join(line for line in lines if line)
+
+
+def count_words(text):
+    # Whitespace-separated tokens with a letter or digit in them. Unlike \w+
+    # this keeps Bengali words whole: their vowel signs are not alphanumeric
+    return sum(1 for token in text.split() if any(ch.isalnum() for ch in token))
+
+
+def render_article(content, config=None):
+    """
+    The RenderedArticle for an article's stored HTML. Rendering its own
+    output again gives the same result.
+    """
+    config = config or article_config()
+    if content is None:
+        return RenderedArticle(None, '', 0, 0)
+    renderer = ArticleRenderer()
+    renderer.feed(content)
+    renderer.close()
+    text = renderer.plain_text()
+    words = count_words(text)
+    minutes = math.ceil(words / config['WORDS_PER_MINUTE']) if words else 0
+    return RenderedArticle(renderer.rendered_html(), text, words, minutes)
+
+
+def apply_rendered_article(topic, config=None):
+    """
+    Sets the rendered fields of an (unsaved) Topic from its article_content.
+    """
+    rendered = render_article(topic.article_content, config)
+    topic.article_html = rendered.html
+    topic.article_text = rendered.text
+    topic.word_count = rendered.word_count
+    topic.reading_minutes = rendered.reading_minutes
+    return rendered
@@ -0,0 +1,213 @@
+from asgiref.sync import sync_to_async
+from django.db import connections, router, transaction
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from . import leaderboards
+from .models import QuizAttempt, GameAttempt, QuizScoreSummary, GameScoreSummary
+from .stats import PendingRecompute, bump_course_stats_many, course_stats_pending, latest_quiz_score_deltas
+
+
+# --- Append-only attempt log + best/latest summary ---
+# Every submission is a plain INSERT into QuizAttempt/GameAttempt; the
+# per-(user, quiz/game) summary row is kept current with a single
+# INSERT ... ON CONFLICT DO UPDATE, so concurrent submissions never race
+# on a read-modify-write.
+def upsert_score_summaries(summary_model, key, user_id, scores, at):
+    """
+    Folds `scores` ([(object id, score), ...] in submission order) into
+    `summary_model` with one statement.
+    """
+    return upsert_score_summaries_many(summary_model, key, [(user_id, object_id, score) for object_id, score in scores], at)
+
+
+def upsert_score_summaries_many(summary_model, key, scores, at):
+    """
+    upsert_score_summaries() for several users: `scores` is
+    [(user id, object id, score), ...] in submission order. An entry may
+    carry its submission time as a fourth item; `at` is used otherwise.
+    Returns {(user id, object id): (previous latest score or None, latest
+    score)} for the dashboard rollup (api/stats.py).
+    """
+    rows = {}
+    for user_id, object_id, score, *submitted in scores:
+        latest_at = submitted[0] if submitted else at
+        row = rows.get((user_id, object_id))
+        if row is None:
+            rows[(user_id, object_id)] = [score, score, 1, latest_at]
+        else:
+            row[0] = max(row[0], score)
+            if latest_at >= row[3]:
+                row[1], row[3] = score, latest_at
+            row[2] += 1
+    if not rows:
+        return {}
+
+    connection = connections[router.db_for_write(summary_model)]
+    qn = connection.ops.quote_name
+    table = qn(summary_model._meta.db_table)
+    column = qn(f'{key}_id')
+    # Two-argument MAX() is SQLite's spelling of GREATEST()
+    greatest = 'GREATEST' if connection.vendor == 'postgresql' else 'MAX'
+    latest_at_field = summary_model._meta.get_field('latest_at')
+
+    params = []
+    for (user_id, object_id), (best, latest, count, latest_at) in rows.items():
+        latest_at = latest_at_field.get_db_prep_value(latest_at, connection)
+        params.extend([user_id, object_id, best, latest, count, latest_at])
+    values = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(rows))
+    sql = (
+        f"INSERT INTO {table} (user_id, {column}, best_score, latest_score, attempt_count, latest_at) "
+        f"VALUES {values} "
+        f"ON CONFLICT (user_id, {column}) DO UPDATE SET "
+        f"best_score = {greatest}({table}.best_score, EXCLUDED.best_score), "
+        # A retried submission can arrive after a later one
+        f"latest_score = CASE WHEN EXCLUDED.latest_at >= {table}.latest_at "
+        f"THEN EXCLUDED.latest_score ELSE {table}.latest_score END, "
+        f"attempt_count = {table}.attempt_count + EXCLUDED.attempt_count, "
+        f"latest_at = {greatest}({table}.latest_at, EXCLUDED.latest_at)"
+    )
+    with transaction.atomic(using=connection.alias, savepoint=False):
+        # Previous rows (locked until commit) tell which leaderboards move
+        # and how the latest scores changed
+        previous = _previous_summaries(summary_model, key, rows)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+        leaderboards.record_improvements(key, {
+            pair: (previous[pair][0] if pair in previous else None, best)
+            for pair, (best, _, _, _) in rows.items()
+            if pair not in previous or best > previous[pair][0]
+        })
+    latest_changes = {}
+    for pair, (_, latest, _, latest_at) in rows.items():
+        if pair not in previous:
+            latest_changes[pair] = (None, latest)
+        else:
+            _, previous_latest, previous_at = previous[pair]
+            latest_changes[pair] = (previous_latest, latest if latest_at >= previous_at else previous_latest)
+    return latest_changes
+
+
+def _previous_summaries(summary_model, key, rows):
+    found = summary_model.objects.select_for_update().filter(
+        user_id__in={user_id for user_id, _ in rows}, **{f'{key}_id__in': {object_id for _, object_id in rows}}
+    ).values_list('user_id', f'{key}_id', 'best_score', 'latest_score', 'latest_at')
+    return {
+        (user_id, object_id): (best, latest, latest_at)
+        for user_id, object_id, best, latest, latest_at in found if (user_id, object_id) in rows
+    }
+
+
+def _record(model, summary_model, key, user, scores):
+    # Returns the attempts and the summaries' latest-score changes
+    if not scores:
+        return [], {}
+    # The attempt rows and their summary commit together or not at all; the
+    # views open the transaction, so this adds no savepoint of its own
+    with transaction.atomic(savepoint=False):
+        if len(scores) == 1:
+            object_id, score = scores[0]
+            attempts = [model.objects.create(user=user, score=score, **{f'{key}_id': object_id})]
+        else:
+            attempts = model.objects.bulk_create(
+                [model(user=user, score=score, **{f'{key}_id': object_id}) for object_id, score in scores]
+            )
+        changes = upsert_score_summaries(
+            summary_model, key, user.id, scores, attempts[-1].timestamp or timezone.now()
+        )
+    return attempts, changes
+
+
+def record_quiz_attempts(user, scores, course_ids):
+    """
+    Also moves the dashboard rollup by the change in each quiz's latest
+    score; `course_ids` maps the quiz ids to their course ids.
+    """
+    with transaction.atomic(savepoint=False):
+        attempts, changes = _record(QuizAttempt, QuizScoreSummary, 'quiz', user, scores)
+        bump_course_stats_many(latest_quiz_score_deltas(changes, course_ids))
+    return attempts
+
+def record_game_attempts(user, scores):
+    return _record(GameAttempt, GameScoreSummary, 'game', user, scores)[0]
+
+
+def _record_game_attempt(user, game_id, score):
+    with transaction.atomic():
+        attempt, = record_game_attempts(user, [(game_id, score)])
+    return attempt
+
+async def arecord_game_attempt(user, game_id, score):
+    # Transactions have no async API (nor does the raw-SQL summary upsert):
+    # the insert and the upsert run as one sync unit
+    return await sync_to_async(_record_game_attempt)(user, game_id, score)
+
+
+# --- Deleted attempts ---
+# The summaries only fold new attempts in. When attempts are deleted
+# (api/signals.py) the summaries of their (user, quiz/game) pairs are
+# recomputed from the attempts left once the deletion commits, and the
+# rollups built on them (course stats, leaderboards) follow.
+MODELS = {'quiz': (QuizAttempt, QuizScoreSummary), 'game': (GameAttempt, GameScoreSummary)}
+
+
+def resummarize(key, pairs):
+    """
+    Rewrites the summaries of (user id, quiz/game id) `pairs` from their
+    attempts; pairs without attempts left lose their summary.
+    """
+    model, summary_model = MODELS[key]
+    column = f'{key}_id'
+    condition = Q()
+    for user_id, object_id in pairs:
+        condition |= Q(user_id=user_id, **{column: object_id})
+    latest = model.objects.filter(user_id=OuterRef('user_id'), **{column: OuterRef(column)}).order_by('-timestamp', '-id')
+    with transaction.atomic():
+        summaries = {
+            (summary.user_id, getattr(summary, column)): summary
+            for summary in summary_model.objects.select_for_update().filter(condition)
+        }
+        found = (
+            model.objects.filter(condition).values('user_id', column)
+            .annotate(
+                best=Max('score'), count=Count('id'), latest_at=Max('timestamp'),
+                latest=Subquery(latest.values('score')[:1]),
+            ).order_by()
+        )
+        changed = []
+        for row in found:
+            summary = summaries.pop((row['user_id'], row[column]), None)
+            if summary is None:
+                continue
+            summary.best_score, summary.latest_score = row['best'], row['latest']
+            summary.attempt_count, summary.latest_at = row['count'], row['latest_at']
+            changed.append(summary)
+        summary_model.objects.bulk_update(changed, ['best_score', 'latest_score', 'attempt_count', 'latest_at'])
+        # Their own delete signals recompute what depends on them
+        summary_model.objects.filter(pk__in=[summary.pk for summary in summaries.values()]).delete()
+        summaries_changed(key, [(summary.user_id, getattr(summary, column)) for summary in changed])
+
+
+def summaries_changed(key, pairs):
+    """
+    Recomputes the rollups built on the summaries of (user id, quiz/game id)
+    `pairs`.
+    """
+    if not pairs:
+        return
+    courses = leaderboards.course_ids_for(key, {object_id for _, object_id in pairs})
+    course_pairs = {(user_id, courses.get(object_id)) for user_id, object_id in pairs}
+    leaderboards.entries_pending.add(course_pairs)
+    if key == 'quiz':
+        course_stats_pending.add(course_pairs)
+
+
+def _resummarize_deleted(keys):
+    by_key = {}
+    for key, user_id, object_id in keys:
+        by_key.setdefault(key, set()).add((user_id, object_id))
+    for key, pairs in by_key.items():
+        resummarize(key, pairs)
+
+
+deleted_attempts_pending = PendingRecompute(_resummarize_deleted)
@@ -0,0 +1,142 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+# --- Cached user resolution ---
+class UserCache:
+    """
+    Users by id for JWT authentication, kept for TTL seconds and at most
+    MAX_ENTRIES of them (least recently used go first). api/signals.py drops
+    a user whenever the row is saved or deleted, which covers deactivation
+    and password changes made in this process; other workers see them once
+    the TTL runs out. Callers get a copy, never the cached instance.
+    """
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # str(user id) -> (expires at, user); token claims carry ids as strings
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(user_id)
+                self.hits += 1
+                return copy.copy(entry[1])
+            if entry is not None:
+                del self._data[user_id]
+            self.misses += 1
+            return None
+
+    def set(self, user_id, user):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        user_id = str(user_id)
+        with self._lock:
+            self._data[user_id] = (time.monotonic() + self.ttl, copy.copy(user))
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._data.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._data)}
+
+
+_config = getattr(settings, 'JWT_USER_CACHE', {})
+user_cache = UserCache(ttl=_config.get('TTL', 30), max_entries=_config.get('MAX_ENTRIES', 10000))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    simplejwt's JWTAuthentication, but the user behind a token comes from
+    `user_cache` when it was loaded in the last few seconds. The is-active
+    and revoked-token checks run on every request, cached or not.
+    """
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            user_cache.set(user_id, user)
+        return self.check_user(user, validated_token)
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    def check_user(self, user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+
+class TokenUserAuthentication(JWTStatelessUserAuthentication):
+    """
+    For endpoints that only need request.user.id: the user is simplejwt's
+    token-backed TokenUser and no lookup happens at all. Such a user is not
+    re-checked for deactivation until the access token expires, so keep it
+    to read-only views of the caller's own data.
+    """
+
+
+# --- Async JWT authentication ---
+class AsyncJWTAuthentication(CachedJWTAuthentication):
+    """
+    CachedJWTAuthentication for the async views in api/views.py. Header
+    parsing and token validation are pure CPU and reused as is; only a
+    user_cache miss goes through the async ORM. Raises the same
+    AuthenticationFailed/InvalidToken errors as the sync class.
+    """
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user = user_cache.get(user_id)
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            user_cache.set(user_id, user)
+        return self.check_user(user, validated_token)
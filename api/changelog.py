@@ -0,0 +1,253 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q, Subquery
+from django.utils import timezone
+
+from .models import (
+    Course, Chapter, Topic,
+    Quiz, Question, Answer,
+    MatchingGame, MatchingPair, ContentChange, PublishedRow,
+)
+
+
+# --- Content change log ---
+# Every save or delete of a row in a course tree appends a ContentChange
+# (api/signals.py), in the same transaction as the content_version bump.
+# That UPDATE locks the course row until commit, so a course's entries
+# become visible in id order and a client that has seen cursor N will never
+# be handed an entry below N later.
+#
+# GET /api/courses/<id>/changes/?since=N returns the rows saved since N in
+# flat form and the ids deleted since N, so clients patch their copy of the
+# tree instead of downloading it again. A tombstone for a row also removes
+# everything below it. Clients without a cursor, or with one below
+# Course.change_floor, are told to resync: download the tree again, then
+# continue from the cursor in that answer (read it first, so no change is
+# lost in between).
+#
+# A published course's clients see its snapshot (api/snapshots.py), not the
+# live rows, so edits to it are drafts and are not logged. Publishing logs
+# how the rows differ from what was published before and keeps the new
+# flat rows (PublishedRow), which are what its entries are served from.
+# Unpublishing logs how the live rows differ from the published ones.
+#
+# compact_change_log() (`manage.py compact_change_log`) drops the entries a
+# newer one for the same row supersedes, and tombstones older than
+# TOMBSTONE_DAYS, raising change_floor past them.
+DEFAULTS = {
+    'TOMBSTONE_DAYS': 30,
+}
+
+
+def change_log_config():
+    return {**DEFAULTS, **getattr(settings, 'CONTENT_CHANGE_LOG', {})}
+
+
+# model: (kind, columns of its flat form)
+KINDS = {
+    Course: ('courses', ('id', 'title', 'description')),
+    Chapter: ('chapters', ('id', 'course_id', 'title', 'order')),
+    Topic: ('topics', (
+        'id', 'chapter_id', 'title', 'video_url', 'article_content', 'word_count', 'reading_minutes', 'order',
+    )),
+    Quiz: ('quizzes', ('id', 'title', 'course_id', 'chapter_id', 'topic_id')),
+    Question: ('questions', ('id', 'quiz_id', 'text')),
+    # is_correct stays on the server, as in AnswerSerializer
+    Answer: ('answers', ('id', 'question_id', 'text')),
+    MatchingGame: ('matching_games', ('id', 'title', 'course_id', 'chapter_id', 'topic_id')),
+    MatchingPair: ('matching_pairs', ('id', 'game_id', 'item_a', 'item_b')),
+}
+MODELS = {kind: model for model, (kind, _) in KINDS.items()}
+# Columns served under another name: the rendered article (api/articles.py),
+# as in the tree
+RENAMED = {'article_content': 'article_html'}
+# Rows with others below them; moving one changes more than one entry shows
+CONTAINERS = (Chapter, Topic, Quiz, MatchingGame)
+
+QUIZ_COURSE = ('course_id', 'chapter__course_id', 'topic__chapter__course_id')
+# model: lookups, any of which is the row's course id
+COURSE_PATHS = {
+    Course: ('id',),
+    Chapter: ('course_id',),
+    Topic: ('chapter__course_id',),
+    Quiz: QUIZ_COURSE,
+    Question: tuple(f'quiz__{path}' for path in QUIZ_COURSE),
+    Answer: tuple(f'question__quiz__{path}' for path in QUIZ_COURSE),
+    MatchingGame: QUIZ_COURSE,
+    MatchingPair: tuple(f'game__{path}' for path in QUIZ_COURSE),
+}
+
+
+# --- Writing ---
+def record_change(model, pk, course_id, deleted=False):
+    if course_id is None:
+        return None  # quizzes and games outside any course
+    if Course.objects.filter(pk=course_id, published_version__isnull=False).exists():
+        return None  # a draft edit; logged when published
+    return ContentChange.objects.create(
+        course_id=course_id, kind=KINDS[model][0], object_id=pk, deleted=deleted,
+    )
+
+
+def record_move(model, pk, previous_course_id, course_id):
+    """
+    A row moved between courses: the old course gets a tombstone for it.
+    When rows below it moved along, clients of the new course resync.
+    """
+    record_change(model, pk, previous_course_id, deleted=True)
+    if model in CONTAINERS and course_id is not None:
+        reset_change_log(course_id)
+
+
+def reset_change_log(course_id):
+    """
+    Makes every client of the course resync once.
+    """
+    latest = latest_cursor(course_id)
+    Course.objects.filter(pk=course_id, change_floor__lt=latest).update(change_floor=latest)
+
+
+def forget_course(course_id):
+    ContentChange.objects.filter(course_id=course_id).delete()
+
+
+# --- Publishing ---
+def course_rows(course_id):
+    """
+    {(kind, id): flat row} of everything in a course's live tree.
+    """
+    rows = {}
+    for model, (kind, columns) in KINDS.items():
+        sources = [RENAMED.get(column, column) for column in columns]
+        condition = Q()
+        for path in COURSE_PATHS[model]:
+            condition |= Q(**{path: course_id})
+        for values in model._default_manager.filter(condition).values_list(*sources):
+            row = dict(zip(columns, values))
+            rows[(kind, row['id'])] = row
+    return rows
+
+
+def _published_rows(course_id):
+    return {
+        (kind, object_id): data for kind, object_id, data in
+        PublishedRow.objects.filter(course_id=course_id).values_list('kind', 'object_id', 'data')
+    }
+
+
+def _log_difference(course_id, before, after):
+    if not before:
+        # Published before published rows were kept: nothing to compare with
+        reset_change_log(course_id)
+        return
+    ContentChange.objects.bulk_create(
+        [
+            ContentChange(course_id=course_id, kind=kind, object_id=object_id)
+            for (kind, object_id), row in after.items() if before.get((kind, object_id)) != row
+        ] + [
+            ContentChange(course_id=course_id, kind=kind, object_id=object_id, deleted=True)
+            for kind, object_id in before.keys() - after.keys()
+        ]
+    )
+
+
+def log_publish(course_id, was_published):
+    """
+    Called by publish_course() with the course row locked: logs what changed
+    since the previous publish and stores the rows now published. A course
+    that was not published had its edits logged already.
+    """
+    rows = course_rows(course_id)
+    if was_published:
+        _log_difference(course_id, _published_rows(course_id), rows)
+    PublishedRow.objects.filter(course_id=course_id).delete()
+    PublishedRow.objects.bulk_create(
+        [PublishedRow(course_id=course_id, kind=kind, object_id=object_id, data=row)
+         for (kind, object_id), row in rows.items()],
+        batch_size=1000,
+    )
+
+
+def log_unpublish(course_id):
+    """
+    Called by unpublish_course() with the course row locked: the live rows
+    replace the published ones for its clients.
+    """
+    _log_difference(course_id, _published_rows(course_id), course_rows(course_id))
+    PublishedRow.objects.filter(course_id=course_id).delete()
+
+
+def latest_cursor(course_id, floor=0):
+    latest = ContentChange.objects.filter(course_id=course_id).aggregate(latest=Max('id'))['latest']
+    return max(latest or 0, floor)
+
+
+# --- Reading ---
+def changes_since(course_id, since, limit, floor=0, published=False):
+    """
+    What a client at cursor `since` needs, at most `limit` log entries'
+    worth; None when it has to resync instead. `cursor` is where to continue
+    from and `more` says whether to ask again right away. Rows of a
+    `published` course come as they were published.
+    """
+    if since is None or since < floor:
+        return None
+    entries = list(
+        ContentChange.objects.filter(course_id=course_id, id__gt=since)
+        .order_by('id').values_list('id', 'kind', 'object_id', 'deleted')[:limit + 1]
+    )
+    more = len(entries) > limit
+    entries = entries[:limit]
+    if not entries and since > latest_cursor(course_id, floor):
+        return None  # a cursor this server never handed out
+    # Only the last entry per row matters
+    last = {}
+    for _, kind, object_id, deleted in entries:
+        last[(kind, object_id)] = deleted
+    upserts, deletes = {}, {}
+    for (kind, object_id), deleted in last.items():
+        (deletes if deleted else upserts).setdefault(kind, []).append(object_id)
+
+    saved = {}
+    for kind, ids in upserts.items():
+        # Rows deleted since are skipped; their tombstones follow
+        if published:
+            saved[kind] = list(
+                PublishedRow.objects.filter(course_id=course_id, kind=kind, object_id__in=ids)
+                .order_by('object_id').values_list('data', flat=True)
+            )
+            continue
+        columns = KINDS[MODELS[kind]][1]
+        sources = [RENAMED.get(column, column) for column in columns]
+        rows = MODELS[kind]._default_manager.filter(pk__in=ids).order_by('id').values_list(*sources)
+        saved[kind] = [dict(zip(columns, row)) for row in rows]
+    return {
+        'cursor': entries[-1][0] if entries else since,
+        'more': more,
+        'upserts': {kind: rows for kind, rows in saved.items() if rows},
+        'deleted': {kind: sorted(ids) for kind, ids in deletes.items()},
+    }
+
+
+# --- Compaction ---
+def compact_change_log(tombstone_days=None, now=None):
+    """
+    Drops superseded entries and expired tombstones. Returns the number of
+    entries of each removed.
+    """
+    if tombstone_days is None:
+        tombstone_days = change_log_config()['TOMBSTONE_DAYS']
+    cutoff = (now or timezone.now()) - timedelta(days=tombstone_days)
+    with transaction.atomic():
+        last = (
+            ContentChange.objects.values('course_id', 'kind', 'object_id')
+            .annotate(last=Max('id')).values('last')
+        )
+        superseded, _ = ContentChange.objects.exclude(id__in=Subquery(last)).delete()
+        expired = ContentChange.objects.filter(deleted=True, created_at__lt=cutoff)
+        for row in expired.values('course_id').annotate(floor=Max('id')).order_by():
+            Course.objects.filter(pk=row['course_id'], change_floor__lt=row['floor']).update(change_floor=row['floor'])
+        pruned, _ = expired.delete()
+    return superseded, pruned
@@ -0,0 +1,136 @@
+import gzip
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+
+# --- Response compression ---
+# gzip, plus brotli when the `brotli` package is installed, negotiated from
+# Accept-Encoding. CompressionMiddleware compresses ordinary responses on the
+# fly at a cheap level; the course detail endpoint instead asks
+# compressed_response() for bytes compressed once per content version (at
+# the strongest level) and kept in course_tree_cache next to the plain ones.
+# Bodies under MIN_SIZE are sent as they are.
+DEFAULTS = {
+    'ENABLED': True,
+    'MIN_SIZE': 1024,                 # bytes; smaller bodies are not worth a frame
+    'ENCODINGS': ('br', 'gzip'),      # server preference, best first
+    'GZIP_LEVEL': 6,                  # per-request compression
+    'BROTLI_QUALITY': 4,
+    'CACHED_GZIP_LEVEL': 9,           # compressed once, served many times
+    'CACHED_BROTLI_QUALITY': 11,
+    # text/html is left out: admin pages carry CSRF tokens (BREACH)
+    'CONTENT_TYPES': ('application/json', 'text/plain', 'text/css', 'text/javascript', 'application/javascript'),
+}
+
+
+def compression_config():
+    return {**DEFAULTS, **getattr(settings, 'RESPONSE_COMPRESSION', {})}
+
+
+def supported(encoding):
+    return encoding == 'gzip' or (encoding == 'br' and brotli is not None)
+
+
+def choose_encoding(accept_encoding, config=None):
+    """
+    The first of ENCODINGS the client accepts (q > 0), or 'identity'.
+    """
+    config = config or compression_config()
+    if not config['ENABLED'] or not accept_encoding:
+        return 'identity'
+    accepted = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding.strip():
+            accepted[coding.strip().lower()] = quality
+    for encoding in config['ENCODINGS']:
+        if supported(encoding) and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return 'identity'
+
+
+def compress(body, encoding, cached=False, config=None):
+    config = config or compression_config()
+    if encoding == 'gzip':
+        level = config['CACHED_GZIP_LEVEL'] if cached else config['GZIP_LEVEL']
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        quality = config['CACHED_BROTLI_QUALITY'] if cached else config['BROTLI_QUALITY']
+        return brotli.compress(body, quality=quality)
+    raise ValueError(f"Unsupported content encoding {encoding!r}")
+
+
+def _weaken_etag(response):
+    # The compressed bytes differ from the plain ones; as in Django's
+    # GZipMiddleware, a weak ETag keeps If-None-Match working for both
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+
+
+def compressed_response(request, body, variant_for, content_type='application/json'):
+    """
+    An HttpResponse for `body`, or for its compressed form in the encoding
+    the client prefers. `variant_for(encoding)` returns those bytes, normally
+    from a cache, so repeated requests never recompress.
+    """
+    config = compression_config()
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'), config)
+    if encoding == 'identity' or len(body) < config['MIN_SIZE']:
+        response = HttpResponse(body, content_type=content_type)
+    else:
+        response = HttpResponse(variant_for(encoding), content_type=content_type)
+        response['Content-Encoding'] = encoding
+    if config['ENABLED']:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses large enough responses of the configured content types that
+    are not already encoded (the precompressed course responses pass through,
+    only getting their ETag weakened).
+    """
+    def process_response(self, request, response):
+        config = compression_config()
+        if not config['ENABLED']:
+            return response
+        if response.has_header('Content-Encoding'):
+            _weaken_etag(response)
+            return response
+        if response.streaming:
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in config['CONTENT_TYPES']:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < config['MIN_SIZE']:
+            return response
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'), config)
+        if encoding == 'identity':
+            return response
+
+        compressed = compress(response.content, encoding, config=config)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        _weaken_etag(response)
+        return response
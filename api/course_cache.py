@@ -0,0 +1,110 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+# --- In-process LRU tier ---
+class LRUCache:
+    """
+    Thread-safe LRU mapping bounded by the total size of its byte values.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.current_bytes -= len(old)
+            self._data[key] = value
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Bump when the serialized shape of the course tree changes, so bytes cached
+# (and ETags handed out) by older code are never served again
+COURSE_TREE_FORMAT = 3
+
+
+# --- Rendered course tree cache ---
+class CourseTreeCache:
+    """
+    Caches rendered course tree JSON bytes keyed by (course id, content_version).
+    Lookups go LRU tier -> Django cache backend -> render(). Because the
+    version is part of the key, a version bump (api/signals.py) is all it
+    takes to invalidate one course; stale entries simply age out.
+    """
+    def __init__(self, max_bytes, timeout, alias):
+        self.local = LRUCache(max_bytes)
+        self.timeout = timeout
+        self.alias = alias
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(course_id, version, variant=''):
+        return f'course-tree:{COURSE_TREE_FORMAT}:{course_id}:{version}:{variant}'
+
+    def get_or_render(self, course_id, version, render, variant=''):
+        key = self.make_key(course_id, version, variant)
+        body = self.local.get(key)
+        if body is not None:
+            self.local_hits += 1
+            return body
+
+        shared = caches[self.alias]
+        body = shared.get(key)
+        if body is not None:
+            self.shared_hits += 1
+        else:
+            self.misses += 1
+            body = render()
+            shared.set(key, body, self.timeout)
+        self.local.set(key, body)
+        return body
+
+    def stats(self):
+        return {
+            'local_hits': self.local_hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'local_entries': len(self.local),
+            'local_bytes': self.local.current_bytes,
+        }
+
+    def clear(self):
+        self.local.clear()
+
+
+_config = getattr(settings, 'COURSE_TREE_CACHE', {})
+course_tree_cache = CourseTreeCache(
+    max_bytes=_config.get('LRU_MAX_BYTES', 32 * 1024 * 1024),
+    timeout=_config.get('TIMEOUT', 24 * 60 * 60),
+    alias=_config.get('CACHE_ALIAS', 'default'),
+)
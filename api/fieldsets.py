@@ -0,0 +1,143 @@
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def _split(value):
+    if not value:
+        return set()
+    return {part.strip() for part in value.split(',') if part.strip()}
+
+def _ancestors(path):
+    # 'chapters.topics.title' -> {'chapters', 'chapters.topics'}
+    parts = path.split('.')
+    return {'.'.join(parts[:i]) for i in range(1, len(parts))}
+
+
+# --- Sparse fieldsets / on-demand expansion ---
+class FieldSelection:
+    """
+    Which parts of a nested serializer tree to render, parsed from the
+    ?fields= and ?expand= query parameters. Paths are dotted serializer field
+    names, e.g. ?fields=id,title,chapters.title,chapters.topics.title
+
+    fields: only the listed fields are rendered; naming a nested field renders
+            its whole subtree, naming one of its sub-fields only that part.
+    expand: which nested branches to inline (only those listed, plus the
+            branches leading to them); 'full' inlines every branch.
+    """
+    def __init__(self, fields=None, expand=None, expand_all=False):
+        self.fields = fields
+        self.expand = expand or set()
+        self.expand_all = expand_all
+        self._field_prefixes = set().union(*map(_ancestors, fields)) if fields else set()
+        self._expand_prefixes = set().union(*map(_ancestors, self.expand))
+
+    @classmethod
+    def from_request(cls, request, expand_all=False):
+        params = request.query_params
+        fields = _split(params.get('fields')) or None
+        expand = _split(params.get('expand'))
+        if 'full' in expand:
+            expand.discard('full')
+            expand_all = True
+        elif expand:
+            expand_all = False
+        return cls(fields, expand, expand_all)
+
+    @property
+    def cache_variant(self):
+        # Canonical form, so equivalent query strings share a cache entry
+        if self.fields is None and self.expand_all:
+            return ''
+        fields = ','.join(sorted(self.fields)) if self.fields is not None else '*'
+        expand = '*' if self.expand_all else ','.join(sorted(self.expand))
+        return f'fields={fields};expand={expand}'
+
+    def _selected(self, path):
+        if self.fields is None:
+            return True
+        if path in self.fields or path in self._field_prefixes:
+            return True
+        return not self.fields.isdisjoint(_ancestors(path))
+
+    def keep(self, path, nested=False):
+        if not self._selected(path):
+            return False
+        if not nested or self.expand_all or self.fields is not None:
+            return True
+        return path in self.expand or path in self._expand_prefixes
+
+
+class SparseFieldsMixin:
+    """
+    Drops the fields that the `field_selection` in the serializer context
+    (a FieldSelection) leaves out, so they are never serialized at all.
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.context.get('field_selection')
+        if selection is None:
+            return fields
+        prefix = self.field_path
+        for name, field in list(fields.items()):
+            path = f'{prefix}.{name}' if prefix else name
+            if not selection.keep(path, nested=isinstance(field, serializers.BaseSerializer)):
+                del fields[name]
+        return fields
+
+    @property
+    def field_path(self):
+        names = []
+        node = self
+        while node is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return '.'.join(reversed(names))
+
+
+# --- Matching ORM work to the selected fields ---
+def deferred_fields(serializer):
+    """
+    Concrete, non-relational model columns that the (pruned) serializer will
+    not read, so they need not be loaded. With a field that reads the whole
+    object (source='*') only the unrendered columns in Meta.fields are.
+    """
+    model = serializer.Meta.model
+    rendered = serializer.fields.values()
+    sources = {field.source_attrs[0] for field in rendered if field.source_attrs}
+    if any(not field.source_attrs for field in rendered):
+        candidates = serializer.Meta.fields
+    else:
+        candidates = [field.name for field in model._meta.concrete_fields]
+    deferred = []
+    for name in candidates:
+        if name in sources or name == model._meta.pk.name:
+            continue
+        try:
+            field = model._meta.get_field(name)
+        except Exception:
+            continue
+        if field.concrete and not field.is_relation:
+            deferred.append(name)
+    return deferred
+
+def tree_prefetches(serializer, prefix=''):
+    """
+    prefetch_related() lookups for the nested serializers left in `serializer`,
+    parents before children, with unrendered columns deferred.
+    """
+    lookups = []
+    for name, field in serializer.fields.items():
+        child = field.child if isinstance(field, serializers.ListSerializer) else field
+        if not isinstance(child, serializers.ModelSerializer):
+            continue
+        source = field.source or name
+        lookup = f'{prefix}__{source}' if prefix else source
+        deferred = deferred_fields(child)
+        if deferred:
+            lookups.append(Prefetch(lookup, queryset=child.Meta.model._default_manager.defer(*deferred)))
+        else:
+            lookups.append(lookup)
+        lookups.extend(tree_prefetches(child, lookup))
+    return lookups
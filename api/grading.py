@@ -0,0 +1,229 @@
+import math
+import threading
+from collections import OrderedDict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import CourseSnapshot, Quiz, Question
+
+
+# --- Answer-key index ---
+class AnswerKeyCache:
+    """
+    In-process cache of {question id: frozenset(correct answer ids)} per quiz.
+    Entries are stamped with answer_key_version(): the owning course's
+    content_version, so an edit made through another worker is picked up on
+    the next lookup, or the published snapshot whose frozen key grades it.
+    Signals in api/signals.py also drop the local entry as soon as an
+    Answer/Question changes here.
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, quiz, version):
+        return self.get_many([(quiz, version)])[quiz.id]
+
+    def get_many(self, quizzes):
+        """
+        `quizzes` is [(quiz, answer_key_version(quiz)), ...]; all missing
+        answer keys are loaded with one query per source.
+        """
+        found, missing = self._lookup(quizzes)
+        if missing:
+            found.update(self._store(missing, build_answer_keys(missing)))
+        return found
+
+    async def aget(self, quiz, version):
+        # Hits never leave the event loop; misses load through the async ORM
+        found, missing = self._lookup([(quiz, version)])
+        if missing:
+            found.update(self._store(missing, await abuild_answer_keys(missing)))
+        return found[quiz.id]
+
+    def _lookup(self, quizzes):
+        found, missing = {}, {}
+        with self._lock:
+            for quiz, version in quizzes:
+                entry = self._data.get(quiz.id)
+                if entry is not None and entry[0] == version:
+                    self._data.move_to_end(quiz.id)
+                    found[quiz.id] = entry[1]
+                else:
+                    missing[quiz.id] = version
+        return found, missing
+
+    def _store(self, missing, built):
+        with self._lock:
+            for quiz_id, version in missing.items():
+                self._data[quiz_id] = (version, built[quiz_id])
+                self._data.move_to_end(quiz_id)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return built
+
+    def invalidate(self, quiz_id):
+        with self._lock:
+            self._data.pop(quiz_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+def _answer_key_rows(quiz_ids):
+    # One LEFT JOIN query; questions without a correct answer still count
+    return Question.objects.filter(quiz_id__in=quiz_ids).values_list(
+        'quiz_id', 'id', 'answers__id', 'answers__is_correct'
+    )
+
+def _index_answer_keys(quiz_ids, rows):
+    indexes = {quiz_id: {} for quiz_id in quiz_ids}
+    for quiz_id, question_id, answer_id, is_correct in rows:
+        correct = indexes[quiz_id].setdefault(question_id, set())
+        if is_correct:
+            correct.add(answer_id)
+    return {
+        quiz_id: {question_id: frozenset(correct) for question_id, correct in index.items()}
+        for quiz_id, index in indexes.items()
+    }
+
+def _frozen_answer_key_rows(quiz_versions):
+    snapshots = {version[1:] for version in quiz_versions.values() if isinstance(version, tuple)}
+    if not snapshots:
+        return CourseSnapshot.objects.none().values_list('course_id', 'version', 'answer_keys')
+    condition = reduce(or_, (Q(course_id=course_id, version=version) for course_id, version in snapshots))
+    return CourseSnapshot.objects.filter(condition).values_list('course_id', 'version', 'answer_keys')
+
+def _index_frozen_answer_keys(quiz_versions, rows):
+    # Quizzes missing from their snapshot (published before answer keys were
+    # frozen) fall back to the live tables
+    snapshots = {(course_id, version): answer_keys for course_id, version, answer_keys in rows}
+    found = {}
+    for quiz_id, version in quiz_versions.items():
+        if isinstance(version, tuple):
+            frozen = snapshots.get(version[1:], {}).get(str(quiz_id))
+            if frozen is not None:
+                found[quiz_id] = {int(question_id): frozenset(ids) for question_id, ids in frozen.items()}
+    return found
+
+def build_answer_keys(quiz_versions):
+    """
+    Answer keys for {quiz id: answer_key_version()}: frozen in the snapshot
+    for quizzes of published courses, from the live tables otherwise.
+    """
+    found = _index_frozen_answer_keys(quiz_versions, _frozen_answer_key_rows(quiz_versions))
+    live = [quiz_id for quiz_id in quiz_versions if quiz_id not in found]
+    found.update(_index_answer_keys(live, _answer_key_rows(live)) if live else {})
+    return found
+
+async def abuild_answer_keys(quiz_versions):
+    found = _index_frozen_answer_keys(
+        quiz_versions, [row async for row in _frozen_answer_key_rows(quiz_versions)]
+    )
+    live = [quiz_id for quiz_id in quiz_versions if quiz_id not in found]
+    if live:
+        found.update(_index_answer_keys(live, [row async for row in _answer_key_rows(live)]))
+    return found
+
+def freeze_answer_keys(course_id):
+    """
+    The answer keys of every quiz in a course, in the JSON form stored with
+    its snapshot at publish time.
+    """
+    quiz_ids = list(Quiz.objects.filter(
+        Q(course_id=course_id) | Q(chapter__course_id=course_id) | Q(topic__chapter__course_id=course_id)
+    ).values_list('id', flat=True))
+    return {
+        str(quiz_id): {str(question_id): sorted(correct) for question_id, correct in answer_key.items()}
+        for quiz_id, answer_key in build_answer_keys(dict.fromkeys(quiz_ids)).items()
+    }
+
+
+answer_key_cache = AnswerKeyCache(getattr(settings, 'ANSWER_KEY_CACHE_SIZE', 10000))
+
+
+# --- Grading ---
+class InvalidSubmission(Exception):
+    pass
+
+
+def _quizzes_for_grading():
+    # Pulls the owning course along so its content_version needs no extra query
+    return Quiz.objects.select_related('course', 'chapter__course', 'topic__chapter__course')
+
+def get_quiz_for_grading(quiz_id):
+    return _quizzes_for_grading().get(id=quiz_id)
+
+async def aget_quiz_for_grading(quiz_id):
+    return await _quizzes_for_grading().aget(id=quiz_id)
+
+def quiz_course(quiz):
+    if quiz.course_id:
+        return quiz.course
+    if quiz.chapter_id:
+        return quiz.chapter.course
+    if quiz.topic_id:
+        return quiz.topic.chapter.course
+    return None
+
+def answer_key_version(quiz):
+    """
+    Which answer key grades `quiz`. Learners of a published course see its
+    snapshot, so they are graded against the key frozen with it:
+    ('published', course id, snapshot version). Otherwise the course's
+    content_version (None outside any course).
+    """
+    course = quiz_course(quiz)
+    if course is None:
+        return None
+    if course.published_version is not None:
+        return ('published', course.id, course.published_version)
+    return course.content_version
+
+def parse_answers(answers):
+    """
+    `answers` is {question id: chosen answer id}, as sent by the clients.
+    """
+    if not isinstance(answers, dict):
+        raise InvalidSubmission("answers must be an object of {question_id: answer_id}.")
+    try:
+        return {int(question_id): int(answer_id) for question_id, answer_id in answers.items()}
+    except (TypeError, ValueError):
+        raise InvalidSubmission("question and answer ids must be integers.")
+
+# Scores are percentages; anything outside would skew summaries, stats and
+# leaderboard points
+MAX_SCORE = 100.0
+
+def clamp_score(score):
+    return min(max(score, 0.0), MAX_SCORE)
+
+def parse_score(score):
+    """
+    A client-reported (game) score as a float within 0..MAX_SCORE.
+    """
+    try:
+        score = float(score)
+    except (TypeError, ValueError):
+        raise InvalidSubmission("score must be a number.")
+    if not math.isfinite(score):
+        raise InvalidSubmission("score must be a finite number.")
+    return clamp_score(score)
+
+def grade_quiz(quiz, answers, answer_key=None):
+    """
+    Returns the percentage of the quiz's questions whose chosen answer is a
+    correct one. Unanswered and unknown questions count as wrong. Pass
+    `answer_key` when it was already loaded with answer_key_cache.get_many().
+    """
+    if answer_key is None:
+        answer_key = answer_key_cache.get(quiz, answer_key_version(quiz))
+    if not answer_key:
+        return 0.0
+    correct = sum(1 for question_id, correct_ids in answer_key.items() if answers.get(question_id) in correct_ids)
+    return correct / len(answer_key) * 100
@@ -0,0 +1,267 @@
+import hashlib
+import html
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import Topic, OptimizedImage, ImageUpload
+
+logger = logging.getLogger(__name__)
+
+
+# --- CKEditor upload optimization ---
+# Images that editors upload through ckeditor_uploader land full size in
+# MEDIA_ROOT/<CKEDITOR_UPLOAD_PATH>. When a topic is saved, the uploads its
+# article references are handed to a small thread pool (Pillow releases the
+# GIL while decoding, resizing and encoding), which:
+#   - hashes the original and reuses the variants of identical content
+#   - writes WebP plus JPEG (PNG for transparent images) copies at each of
+#     WIDTHS not wider than the original, without EXIF/ICC metadata
+#   - rewrites the article's <img> tags into <picture> elements whose srcset
+#     lists the variants, so clients download the size they display; the
+#     plain src is a phone-sized variant (SRC_WIDTH), since the app's
+#     RenderHTML ignores srcset and would otherwise load the largest
+# `manage.py optimize_images` does the same for existing articles.
+DEFAULTS = {
+    'ENABLED': True,
+    'BACKGROUND': True,     # False: optimize during the save (tests, scripts)
+    'WORKERS': 2,
+    'WIDTHS': (320, 640, 1024, 1600),
+    'WEBP_QUALITY': 75,
+    'JPEG_QUALITY': 80,
+    'SIZES': '(max-width: 800px) 100vw, 800px',
+    'SRC_WIDTH': 640,       # widest variant used as <img src>
+    'DIRECTORY': 'optimized',  # under CKEDITOR_UPLOAD_PATH
+}
+
+
+def image_config():
+    return {**DEFAULTS, **getattr(settings, 'IMAGE_OPTIMIZATION', {})}
+
+
+# --- Variants ---
+def _encode(image, image_format, config):
+    buffer = BytesIO()
+    if image_format == 'webp':
+        image.save(buffer, 'WEBP', quality=config['WEBP_QUALITY'], method=4)
+    elif image_format == 'jpeg':
+        image.save(buffer, 'JPEG', quality=config['JPEG_QUALITY'], optimize=True, progressive=True)
+    else:
+        image.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def build_variants(data, config):
+    """
+    (width, height, [(width, height, format, bytes), ...]) for an image, or
+    None for files Pillow cannot read and for animations, which are left as
+    they are. Metadata is dropped simply by never passing it to save().
+    """
+    try:
+        with Image.open(BytesIO(data)) as original:
+            if getattr(original, 'is_animated', False):
+                return None
+            image = ImageOps.exif_transpose(original)
+            transparent = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if transparent else 'RGB')
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return None
+
+    widths = sorted({min(width, image.width) for width in config['WIDTHS']})
+    fallback = 'png' if transparent else 'jpeg'
+    variants = []
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for image_format in ('webp', fallback):
+            variants.append((width, height, image_format, _encode(resized, image_format, config)))
+    return image.width, image.height, variants
+
+
+def optimize_upload(name, config=None):
+    """
+    The OptimizedImage for the uploaded file `name` (a storage name), made
+    on first use and shared by every upload with the same bytes. None when
+    the file is missing or not an image.
+    """
+    config = config or image_config()
+    upload = ImageUpload.objects.select_related('image').filter(name=name).first()
+    if upload is not None:
+        return upload.image
+    if not default_storage.exists(name):
+        return None
+    with default_storage.open(name, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+
+    image = OptimizedImage.objects.filter(sha256=digest).first()
+    if image is None:
+        built = build_variants(data, config)
+        if built is None:
+            return None
+        width, height, variants = built
+        directory = f"{settings.CKEDITOR_UPLOAD_PATH.rstrip('/')}/{config['DIRECTORY']}/{digest[:2]}"
+        stored = []
+        for variant_width, variant_height, image_format, body in variants:
+            extension = 'jpg' if image_format == 'jpeg' else image_format
+            path = f'{directory}/{digest[:16]}-{variant_width}.{extension}'
+            if not default_storage.exists(path):
+                path = default_storage.save(path, ContentFile(body))
+            stored.append({
+                'width': variant_width, 'height': variant_height,
+                'format': image_format, 'name': path, 'size': len(body),
+            })
+        image, _ = OptimizedImage.objects.get_or_create(sha256=digest, defaults={
+            'width': width, 'height': height, 'original_size': len(data), 'variants': stored,
+        })
+    ImageUpload.objects.get_or_create(name=name, defaults={'image': image})
+    return image
+
+
+# --- Article HTML ---
+IMG_TAG = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+ATTRIBUTE = re.compile(r'''([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?''')
+
+
+def _attributes(tag):
+    body = tag[4:].rstrip('>').rstrip('/')
+    return [
+        (match.group(1).lower(), html.unescape(next((g for g in match.group(2, 3, 4) if g is not None), '')))
+        for match in ATTRIBUTE.finditer(body)
+    ]
+
+
+def upload_name(src):
+    """
+    The storage name of an upload referenced by an <img src>, or None when
+    the URL points anywhere else.
+    """
+    path = unquote(urlsplit(src).path)
+    prefix = settings.MEDIA_URL + settings.CKEDITOR_UPLOAD_PATH
+    if not path.startswith(prefix) or f"/{image_config()['DIRECTORY']}/" in path:
+        return None
+    return path[len(settings.MEDIA_URL):]
+
+
+def referenced_uploads(article):
+    names = []
+    for tag in IMG_TAG.findall(article or ''):
+        attributes = dict(_attributes(tag))
+        name = upload_name(attributes.get('src', ''))
+        if name and 'srcset' not in attributes and name not in names:
+            names.append(name)
+    return names
+
+
+def _srcset(variants):
+    return ', '.join(f"{default_storage.url(v['name'])} {v['width']}w" for v in variants)
+
+
+def rewrite_article(article, images, config=None):
+    """
+    Replaces each <img> whose upload has an OptimizedImage in `images`
+    ({storage name: OptimizedImage}) with a <picture>: a WebP <source> and
+    a JPEG/PNG <img>, both with srcset/sizes. Tags that already have a
+    srcset are left alone, so rewriting twice changes nothing.
+    """
+    config = config or image_config()
+
+    def replace(match):
+        tag = match.group(0)
+        attributes = _attributes(tag)
+        values = dict(attributes)
+        image = images.get(upload_name(values.get('src', '')) or '')
+        if image is None or 'srcset' in values or not image.variants:
+            return tag
+        webp = [v for v in image.variants if v['format'] == 'webp']
+        fallback = [v for v in image.variants if v['format'] != 'webp']
+        # Variants are in ascending width; the smallest if none is narrow enough
+        fitting = [v for v in fallback if v['width'] <= config['SRC_WIDTH']]
+        default = fitting[-1] if fitting else fallback[0]
+        kept = [(name, value) for name, value in attributes
+                if name not in ('src', 'srcset', 'sizes', 'width', 'height', 'loading', 'decoding')]
+        img_attributes = kept + [
+            ('src', default_storage.url(default['name'])),
+            ('srcset', _srcset(fallback)),
+            ('sizes', config['SIZES']),
+            ('width', str(image.width)),
+            ('height', str(image.height)),
+            ('loading', 'lazy'),
+            ('decoding', 'async'),
+        ]
+        rendered = ' '.join(f'{name}="{html.escape(value)}"' for name, value in img_attributes)
+        return (
+            f'<picture><source type="image/webp" srcset="{html.escape(_srcset(webp))}" '
+            f'sizes="{html.escape(config["SIZES"])}"><img {rendered}></picture>'
+        )
+
+    return IMG_TAG.sub(replace, article)
+
+
+def optimize_topic(topic_id, config=None):
+    """
+    Optimizes the uploads a topic's article references and rewrites it.
+    The write only lands if the article was not edited meanwhile (that edit
+    schedules its own run). Returns True when the article changed.
+    """
+    config = config or image_config()
+    article = Topic.objects.filter(pk=topic_id).values_list('article_content', flat=True).first()
+    names = referenced_uploads(article)
+    if not names:
+        return False
+    images = {name: image for name in names if (image := optimize_upload(name, config)) is not None}
+    rewritten = rewrite_article(article, images, config)
+    if rewritten == article:
+        return False
+    # Through save(), so content versions and caches follow (api/signals.py)
+    with transaction.atomic():
+        topic = Topic.objects.select_for_update().filter(pk=topic_id).first()
+        if topic is None or topic.article_content != article:
+            return False
+        topic.article_content = rewritten
+        topic._images_optimized = True
+        topic.save()
+    return True
+
+
+# --- Worker pool ---
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _run(topic_id, config):
+    try:
+        optimize_topic(topic_id, config)
+    except Exception:
+        logger.exception("Optimizing images of topic %s failed", topic_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_topic(topic):
+    """
+    Called after a topic is saved (api/signals.py): queues its uploads for
+    optimization once the transaction commits.
+    """
+    global _pool
+    config = image_config()
+    if not config['ENABLED'] or getattr(topic, '_images_optimized', False):
+        return
+    if not referenced_uploads(topic.article_content):
+        return
+    if not config['BACKGROUND']:
+        transaction.on_commit(lambda: optimize_topic(topic.pk, config))
+        return
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(config['WORKERS'], thread_name_prefix='image-optimizer')
+    transaction.on_commit(lambda: _pool.submit(_run, topic.pk, config))
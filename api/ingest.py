@@ -0,0 +1,375 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .attempts import upsert_score_summaries_many
+from .models import QuizAttempt, GameAttempt, QuizScoreSummary, GameScoreSummary
+from .stats import bump_course_stats_many, complete_topics, latest_quiz_score_deltas
+
+logger = logging.getLogger(__name__)
+
+
+# --- Write-behind submission ingestion ---
+# With settings.SUBMISSION_WRITE_BEHIND['ENABLED'], submit-quiz/ and
+# submit-game/ validate and grade a submission, append it to a local SQLite
+# journal and answer 202 straight away. A background thread in each worker
+# drains the journal in batches: one bulk INSERT per attempt table, one
+# summary upsert per table, one progress lookup and one rollup upsert per
+# batch. Entries are deleted only after their batch commits, so a crash
+# replays them (at-least-once); a shutdown drains what is left.
+#
+# When a batch fails, its entries are applied one at a time, so one bad
+# submission cannot hold up the rest. One that still fails is retried once
+# its lease expires, and after MAX_ATTEMPTS failures it is set aside as a dead
+# letter (`manage.py flush_submissions --requeue-dead` puts those back).
+# Attempts keep the time they were submitted, not the time of the flush.
+DEFAULTS = {
+    'ENABLED': False,
+    'PATH': 'submission_queue.sqlite3',
+    'MAX_PENDING': 10000,      # journal entries before enqueue pushes back
+    'ENQUEUE_TIMEOUT': 0.5,    # seconds to wait for room before QueueFull
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 0.5,     # seconds between flushes when below BATCH_SIZE
+    'LEASE_SECONDS': 60,       # a claimed batch not deleted by then is retried
+    'MAX_ATTEMPTS': 10,        # failures before an entry becomes a dead letter
+    'SHUTDOWN_TIMEOUT': 30,    # seconds spent draining at exit
+    'BACKGROUND': True,        # False: only manage.py flush_submissions drains
+}
+
+
+def write_behind_config():
+    config = {**DEFAULTS, **getattr(settings, 'SUBMISSION_WRITE_BEHIND', {})}
+    config['PATH'] = os.path.join(settings.BASE_DIR, config['PATH'])
+    return config
+
+
+class QueueFull(Exception):
+    pass
+
+
+class SubmissionQueue:
+    """
+    Durable FIFO of submissions in a SQLite file, shared by every worker on
+    the host. Entries are claimed with a lease, so several flushers can drain
+    the same file and a batch left behind by a dead process is picked up
+    again once its lease expires. Dead letters (failed_at set) stay in the
+    file but are never claimed.
+    """
+    def __init__(self, path, max_pending, lease_seconds):
+        self.path = str(path)
+        self.max_pending = max_pending
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS submissions ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, "
+                "claim TEXT, claimed_at REAL, failures INTEGER NOT NULL DEFAULT 0, failed_at REAL, error TEXT)"
+            )
+            # Files written before dead letters existed
+            columns = {row[1] for row in db.execute("PRAGMA table_info(submissions)")}
+            for column, definition in (
+                ('failures', 'INTEGER NOT NULL DEFAULT 0'), ('failed_at', 'REAL'), ('error', 'TEXT'),
+            ):
+                if column not in columns:
+                    db.execute(f"ALTER TABLE submissions ADD COLUMN {column} {definition}")
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=FULL')
+            self._local.db = db
+        return _Transaction(db)
+
+    def put(self, payload, timeout=0):
+        """
+        Appends one submission. Waits up to `timeout` seconds while the queue
+        is at MAX_PENDING, then raises QueueFull.
+        """
+        data = json.dumps(payload)
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._connect() as db:
+                (pending,) = db.execute("SELECT COUNT(*) FROM submissions WHERE failed_at IS NULL").fetchone()
+                if pending < self.max_pending:
+                    db.execute("INSERT INTO submissions (payload) VALUES (?)", (data,))
+                    return
+            if time.monotonic() >= deadline:
+                raise QueueFull(f"{pending} submissions are waiting to be written.")
+            time.sleep(0.05)
+
+    def claim(self, limit):
+        """
+        Leases up to `limit` of the oldest unclaimed (or expired) entries.
+        Returns (claim id, [(entry id, payload), ...]).
+        """
+        claim = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id, payload FROM submissions "
+                "WHERE failed_at IS NULL AND (claimed_at IS NULL OR claimed_at < ?) ORDER BY id LIMIT ?", (now - self.lease_seconds, limit),
+            ).fetchall()
+            if rows:
+                db.executemany(
+                    "UPDATE submissions SET claim = ?, claimed_at = ? WHERE id = ?",
+                    [(claim, now, entry_id) for entry_id, _ in rows],
+                )
+        return claim, [(entry_id, json.loads(payload)) for entry_id, payload in rows]
+
+    def ack(self, claim):
+        with self._connect() as db:
+            db.execute("DELETE FROM submissions WHERE claim = ?", (claim,))
+
+    def ack_entry(self, entry_id):
+        with self._connect() as db:
+            db.execute("DELETE FROM submissions WHERE id = ?", (entry_id,))
+
+    def fail(self, entry_id, error, max_attempts):
+        """
+        Counts a failed attempt at one entry. It stays leased, so it is
+        retried once the lease expires, or becomes a dead letter at
+        `max_attempts` failures. Returns whether it did.
+        """
+        with self._connect() as db:
+            db.execute(
+                "UPDATE submissions SET claim = NULL, claimed_at = ?, failures = failures + 1, error = ? "
+                "WHERE id = ?", (time.time(), error, entry_id),
+            )
+            dead = db.execute(
+                "UPDATE submissions SET failed_at = claimed_at WHERE id = ? AND failures >= ?",
+                (entry_id, max_attempts),
+            ).rowcount
+        return bool(dead)
+
+    def requeue_dead(self):
+        with self._connect() as db:
+            return db.execute(
+                "UPDATE submissions SET claim = NULL, claimed_at = NULL, failures = 0, failed_at = NULL "
+                "WHERE failed_at IS NOT NULL"
+            ).rowcount
+
+    def dead_count(self):
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM submissions WHERE failed_at IS NOT NULL").fetchone()[0]
+
+    def __len__(self):
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM submissions WHERE failed_at IS NULL").fetchone()[0]
+
+
+class _Transaction:
+    # BEGIN IMMEDIATE ... COMMIT/ROLLBACK around a block, like sqlite3's
+    # context manager but taking the write lock up front
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute('BEGIN IMMEDIATE')
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+# --- Applying a batch ---
+def apply_submissions(payloads):
+    """
+    Writes a batch of queued submissions (see submission_payload()) in one
+    transaction, with the same effect as the synchronous submit views at the
+    time each was submitted.
+    """
+    now = timezone.now()
+    quiz_scores, game_scores, topic_pairs, quiz_courses = [], [], {}, {}
+    deltas = defaultdict(lambda: defaultdict(int))
+    for payload in payloads:
+        user_id, object_id, score = payload['user_id'], payload['object_id'], payload['score']
+        # Entries queued before submitted_at was recorded get the flush time
+        at = parse_datetime(payload['submitted_at']) if payload.get('submitted_at') else now
+        if payload['type'] == 'quiz':
+            quiz_scores.append((user_id, object_id, score, at))
+            quiz_courses[object_id] = payload['course_id']
+        else:
+            game_scores.append((user_id, object_id, score, at))
+        if payload['topic_id'] is not None:
+            topic_pairs[(user_id, payload['topic_id'])] = payload['topic_course_id']
+
+    with transaction.atomic():
+        QuizAttempt.objects.bulk_create([
+            QuizAttempt(user_id=user_id, quiz_id=quiz_id, score=score, timestamp=at)
+            for user_id, quiz_id, score, at in quiz_scores
+        ])
+        GameAttempt.objects.bulk_create([
+            GameAttempt(user_id=user_id, game_id=game_id, score=score, timestamp=at)
+            for user_id, game_id, score, at in game_scores
+        ])
+        changes = upsert_score_summaries_many(QuizScoreSummary, 'quiz', quiz_scores, now)
+        latest_quiz_score_deltas(changes, quiz_courses, deltas)
+        upsert_score_summaries_many(GameScoreSummary, 'game', game_scores, now)
+        for user_id, topic_id in complete_topics(topic_pairs):
+            deltas[(user_id, topic_pairs[(user_id, topic_id)])]['completed_topics'] += 1
+        bump_course_stats_many(deltas)
+
+
+def submission_payload(kind, user, obj, score):
+    """
+    The queued form of a graded quiz (`obj` is a Quiz loaded with
+    get_quiz_for_grading()) or game submission: plain ids, so flushing needs
+    no lookups.
+    """
+    topic = obj.topic
+    return {
+        'type': kind,
+        'user_id': user.id,
+        'object_id': obj.id,
+        'score': score,
+        'course_id': obj.get_course_id(),
+        'topic_id': topic.id if topic else None,
+        'topic_course_id': topic.chapter.course_id if topic else None,
+        'submitted_at': timezone.now().isoformat(),
+    }
+
+
+# --- Background flusher ---
+class WriteBehindWriter:
+    """
+    Owns the queue and the per-process flush thread. The thread starts with
+    the first enqueue; atexit stops it and drains the queue.
+    """
+    def __init__(self, config):
+        self.config = config
+        self.queue = SubmissionQueue(config['PATH'], config['MAX_PENDING'], config['LEASE_SECONDS'])
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def enqueue(self, payload):
+        self.queue.put(payload, timeout=self.config['ENQUEUE_TIMEOUT'])
+        if self.config['BACKGROUND']:
+            self._ensure_started()
+            self._wake.set()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='submission-flusher', daemon=True)
+                self._thread.start()
+                atexit.register(self.shutdown)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.config['FLUSH_INTERVAL'])
+            self._wake.clear()
+            try:
+                while self.flush_once() >= self.config['BATCH_SIZE'] and not self._stop.is_set():
+                    pass
+            except Exception:
+                logger.exception("Flushing queued submissions failed")
+                time.sleep(self.config['FLUSH_INTERVAL'])
+            finally:
+                close_old_connections()
+
+    def flush_once(self):
+        """
+        Applies one batch; returns how many submissions it wrote. If the
+        batch fails, its entries are applied one by one.
+        """
+        claim, entries = self.queue.claim(self.config['BATCH_SIZE'])
+        if not entries:
+            return 0
+        try:
+            apply_submissions([payload for _, payload in entries])
+        except Exception:
+            if len(entries) > 1:
+                logger.warning("Writing %s queued submissions failed; retrying one by one", len(entries), exc_info=True)
+            return self._apply_each(entries)
+        self.queue.ack(claim)
+        return len(entries)
+
+    def _apply_each(self, entries):
+        written = 0
+        for entry_id, payload in entries:
+            try:
+                apply_submissions([payload])
+            except Exception as e:
+                if self.queue.fail(entry_id, repr(e), self.config['MAX_ATTEMPTS']):
+                    logger.error(
+                        "Queued submission %s failed %s times; set aside as a dead letter in %s",
+                        entry_id, self.config['MAX_ATTEMPTS'], self.queue.path, exc_info=True,
+                    )
+                else:
+                    logger.warning("Writing queued submission %s failed; will retry", entry_id, exc_info=True)
+            else:
+                self.queue.ack_entry(entry_id)
+                written += 1
+        return written
+
+    def drain(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        written = 0
+        while deadline is None or time.monotonic() < deadline:
+            count = self.flush_once()
+            if not count:
+                break
+            written += count
+        return written
+
+    def shutdown(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(self.config['FLUSH_INTERVAL'] + 5)
+        try:
+            left = len(self.queue)
+            written = self.drain(self.config['SHUTDOWN_TIMEOUT'])
+            if left:
+                logger.info("Flushed %s queued submissions on shutdown", written)
+        except Exception:
+            logger.exception("Flushing queued submissions on shutdown failed; they stay in %s", self.queue.path)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """
+    The process-wide writer, or None when write-behind is off.
+    """
+    global _writer
+    config = write_behind_config()
+    if not config['ENABLED']:
+        return None
+    with _writer_lock:
+        if _writer is None or _writer.config != config:
+            _writer = WriteBehindWriter(config)
+        return _writer
+
+
+def queue_submission(writer, kind, user, obj, score):
+    """
+    Enqueues a graded submission for the submit views. Returns
+    (status code, body, headers): 202 once it is journaled, or 503 with
+    Retry-After when the queue stays full (backpressure).
+    """
+    try:
+        writer.enqueue(submission_payload(kind, user, obj, score))
+    except QueueFull:
+        return 503, {"error": "Too many submissions are waiting to be saved; please retry."}, {'Retry-After': '1'}
+    return 202, {kind: obj.id, 'score': score, 'status': 'queued'}, {}
@@ -0,0 +1,250 @@
+import math
+from collections import defaultdict
+
+from django.db import connections, router, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .grading import clamp_score
+from .stats import PendingRecompute
+from .models import (
+    Quiz, MatchingGame, QuizScoreSummary, GameScoreSummary,
+    LeaderboardEntry, LeaderboardScoreCount,
+)
+
+
+# --- Per-course leaderboards ---
+# LeaderboardEntry holds each learner's points per course and
+# LeaderboardScoreCount how many learners sit at each points value. Both are
+# updated only when a best score improves (api/attempts.py), so:
+#   top N      one index range scan on (course, -points, updated_at) LIMIT N
+#   my rank    1 + SUM(learners) over the count rows above my points; their
+#              number is bounded by the course's possible points, not by how
+#              many learners it has
+# Both writes are single upserts, so concurrent submissions need no locks.
+# Deletions are handled apart, below.
+OWNER_MODELS = {'quiz': Quiz, 'game': MatchingGame}
+
+
+def item_points(score):
+    # A best score counts as a whole percent (half rounds up, as in the
+    # rebuild), never more than MAX_SCORE whatever was stored
+    if not math.isfinite(score):
+        return 0
+    return int(clamp_score(score) + 0.5)
+
+
+def course_ids_for(key, object_ids):
+    """
+    {quiz/game id: course id} for the given ids, in one query.
+    """
+    rows = OWNER_MODELS[key].objects.filter(id__in=object_ids).values_list(
+        'id', 'course_id', 'chapter__course_id', 'topic__chapter__course_id'
+    )
+    return {object_id: course or chapter_course or topic_course for object_id, course, chapter_course, topic_course in rows}
+
+
+def record_improvements(key, improvements):
+    """
+    `improvements` maps (user id, quiz/game id) to (previous best or None,
+    new best) as written by upsert_score_summaries_many(); moves the affected
+    learners up their course leaderboards.
+    """
+    changed = {
+        pair: item_points(new) - (item_points(old) if old is not None else 0)
+        for pair, (old, new) in improvements.items()
+    }
+    changed = {pair: delta for pair, delta in changed.items() if delta > 0}
+    if not changed:
+        return
+    courses = course_ids_for(key, {object_id for _, object_id in changed})
+    deltas = defaultdict(int)
+    for (user_id, object_id), delta in changed.items():
+        if courses.get(object_id) is not None:
+            deltas[(user_id, courses[object_id])] += delta
+    apply_points_deltas(deltas)
+
+
+def apply_points_deltas(deltas):
+    """
+    Adds points (all positive) to (user id, course id) entries with one
+    upsert, then moves each learner between LeaderboardScoreCount rows.
+    Existing entries always hold points, so a returned total equal to the
+    delta means the entry is new.
+    """
+    deltas = {pair: delta for pair, delta in deltas.items() if delta > 0}
+    if not deltas:
+        return
+    connection = connections[router.db_for_write(LeaderboardEntry)]
+    table = connection.ops.quote_name(LeaderboardEntry._meta.db_table)
+    updated_at = LeaderboardEntry._meta.get_field('updated_at').get_db_prep_value(timezone.now(), connection)
+    params = []
+    for (user_id, course_id), delta in deltas.items():
+        params.extend([user_id, course_id, delta, updated_at])
+    values = ', '.join(['(%s, %s, %s, %s)'] * len(deltas))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, course_id, points, updated_at) VALUES {values} "
+            f"ON CONFLICT (user_id, course_id) DO UPDATE SET "
+            f"points = {table}.points + EXCLUDED.points, updated_at = EXCLUDED.updated_at "
+            f"RETURNING user_id, course_id, points",
+            params,
+        )
+        rows = cursor.fetchall()
+
+    counts = defaultdict(int)
+    for user_id, course_id, points in rows:
+        previous = points - deltas[(user_id, course_id)]
+        if previous:
+            counts[(course_id, previous)] -= 1
+        counts[(course_id, points)] += 1
+    _bump_score_counts(connection, counts)
+
+
+def _bump_score_counts(connection, counts):
+    counts = {key: n for key, n in counts.items() if n}
+    if not counts:
+        return
+    table = connection.ops.quote_name(LeaderboardScoreCount._meta.db_table)
+    params = []
+    for (course_id, points), n in counts.items():
+        params.extend([course_id, points, n])
+    values = ', '.join(['(%s, %s, %s)'] * len(counts))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (course_id, points, learners) VALUES {values} "
+            f"ON CONFLICT (course_id, points) DO UPDATE SET learners = {table}.learners + EXCLUDED.learners",
+            params,
+        )
+
+
+# --- Recomputing after deletions ---
+# Points only ever go up on the write path. When score summaries are deleted
+# (by cascade from a quiz, game or user, or after deleted attempts were
+# re-summarized; api/signals.py, api/attempts.py) the affected learners'
+# entries are recomputed from the summaries left once the deletion commits,
+# and moved between LeaderboardScoreCount rows.
+def recompute_entries(pairs):
+    """
+    Rewrites the LeaderboardEntry rows of (user id, course id) `pairs`;
+    learners left without points leave the leaderboard.
+    """
+    pairs = {(user_id, course_id) for user_id, course_id in pairs if course_id is not None}
+    if not pairs:
+        return
+    condition = Q()
+    for user_id, course_id in pairs:
+        condition |= Q(user_id=user_id, course_id=course_id)
+    with transaction.atomic():
+        previous = dict.fromkeys(pairs, 0)
+        for user_id, course_id, points in (
+            LeaderboardEntry.objects.select_for_update().filter(condition).values_list('user_id', 'course_id', 'points')
+        ):
+            previous[(user_id, course_id)] = points
+        points = leaderboard_points(
+            user_ids={user_id for user_id, _ in pairs}, course_ids={course_id for _, course_id in pairs},
+        )
+        counts = defaultdict(int)
+        changed, emptied = [], Q()
+        for pair in pairs:
+            old, new = previous[pair], points.get(pair, 0)
+            if old == new:
+                continue
+            if old:
+                counts[(pair[1], old)] -= 1
+            if new:
+                counts[(pair[1], new)] += 1
+                changed.append(LeaderboardEntry(user_id=pair[0], course_id=pair[1], points=new))
+            else:
+                emptied |= Q(user_id=pair[0], course_id=pair[1])
+        if emptied:
+            LeaderboardEntry.objects.filter(emptied).delete()
+        # Keeps updated_at: a learner who lost points keeps their place among equals
+        LeaderboardEntry.objects.bulk_create(
+            changed, update_conflicts=True, unique_fields=['user', 'course'], update_fields=['points'],
+        )
+        _bump_score_counts(connections[router.db_for_write(LeaderboardScoreCount)], counts)
+
+
+entries_pending = PendingRecompute(recompute_entries)
+
+
+# --- Full rebuild ---
+# A quiz/game hangs off exactly one of topic, chapter or course
+COURSE_PATHS = ('topic__chapter__course_id', 'chapter__course_id', 'course_id')
+
+
+def leaderboard_points(user_ids=None, course_ids=None):
+    """
+    {(user id, course id): points} recomputed from the score summaries, for
+    everyone or for the given users and courses.
+    """
+    points = defaultdict(int)
+    for summary_model, key in ((QuizScoreSummary, 'quiz'), (GameScoreSummary, 'game')):
+        for course_path in COURSE_PATHS:
+            path = f'{key}__{course_path}'
+            rows = summary_model.objects.filter(**{f'{path}__isnull': False})
+            if user_ids is not None:
+                rows = rows.filter(user_id__in=user_ids)
+            if course_ids is not None:
+                rows = rows.filter(**{f'{path}__in': course_ids})
+            rows = rows.values_list('user_id', path, 'best_score')
+            for user_id, course_id, best in rows.iterator():
+                points[(user_id, course_id)] += item_points(best)
+    return points
+
+
+def rebuild_leaderboards(batch_size=1000):
+    """
+    Replaces both leaderboard tables with values recomputed from the score
+    summaries; returns the number of entries written.
+    """
+    points = {pair: value for pair, value in leaderboard_points().items() if value > 0}
+    counts = defaultdict(int)
+    for (_, course_id), value in points.items():
+        counts[(course_id, value)] += 1
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardScoreCount.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(
+            (LeaderboardEntry(user_id=user_id, course_id=course_id, points=value)
+             for (user_id, course_id), value in points.items()),
+            batch_size=batch_size,
+        )
+        LeaderboardScoreCount.objects.bulk_create(
+            (LeaderboardScoreCount(course_id=course_id, points=value, learners=n)
+             for (course_id, value), n in counts.items()),
+            batch_size=batch_size,
+        )
+    return len(points)
+
+
+# --- Reads ---
+def top_learners(course_id, limit):
+    """
+    The first `limit` learners of a course with competition ranks (equal
+    points share a rank; earlier arrivals are listed first).
+    """
+    entries = (
+        LeaderboardEntry.objects.filter(course_id=course_id)
+        .select_related('user').order_by('-points', 'updated_at')[:limit]
+    )
+    rows, rank, previous = [], 0, None
+    for position, entry in enumerate(entries, start=1):
+        if entry.points != previous:
+            rank, previous = position, entry.points
+        rows.append({'rank': rank, 'user': entry.user.username, 'points': entry.points})
+    return rows
+
+
+def learner_rank(user, course_id):
+    """
+    {'rank', 'points', 'learners'} for `user` in a course; learners without
+    points yet rank after everyone who has some.
+    """
+    entry = LeaderboardEntry.objects.filter(user_id=user.id, course_id=course_id).values_list('points', flat=True).first()
+    points = entry or 0
+    totals = LeaderboardScoreCount.objects.filter(course_id=course_id).aggregate(
+        above=Sum('learners', filter=Q(points__gt=points)), learners=Sum('learners'),
+    )
+    return {'rank': (totals['above'] or 0) + 1, 'points': points, 'learners': totals['learners'] or 0}
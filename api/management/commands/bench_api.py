@@ -0,0 +1,410 @@
+import json
+import random
+import socket
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.parse import urljoin, urlsplit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+# --- Traffic mix ---
+# One scenario per screen/action of the web app and the apiService.js calls
+# it makes, so the relative weights read like a page-view mix:
+#   home        HomePage          getCourses()             -> courses/ (every page)
+#   course      CourseDetailPage  axios.get(courses/<id>/) -> course detail (anonymous)
+#                                 getCourseProgress()      -> courses/<id>/my-progress/ (every page)
+#   dashboard   DashboardPage     getDashboardStats()      -> dashboard-stats/
+#   quiz        QuizComponent     submitQuizScore()        -> submit-quiz/
+#   game        MatchingGame...   submitGameScore()        -> submit-game/
+#   topic       CourseDetailPage  markTopicComplete()      -> topics/<id>/mark-complete/
+#   refresh     request interceptor, expired access token  -> token/refresh/
+DEFAULT_MIX = {
+    'home': 20,
+    'course': 30,
+    'dashboard': 15,
+    'quiz': 15,
+    'game': 10,
+    'topic': 7,
+    'refresh': 3,
+}
+
+
+def parse_mix(value):
+    mix = dict(DEFAULT_MIX)
+    if not value:
+        return mix
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise CommandError(f"Unknown scenario {name!r}; choose from {', '.join(DEFAULT_MIX)}.")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f"Weight for {name!r} must be a number.")
+    if not any(mix.values()):
+        raise CommandError("At least one scenario needs a positive weight.")
+    return mix
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+# --- HTTP client ---
+class Client:
+    """
+    One keep-alive connection per worker thread, speaking JSON.
+    """
+    def __init__(self, base_url, timeout):
+        parts = urlsplit(base_url)
+        connection_class = HTTPSConnection if parts.scheme == 'https' else HTTPConnection
+        self.base_url = base_url
+        self.host = parts.netloc
+        self.connection_class = connection_class
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, method, url, body=None, token=None):
+        if self.connection is None:
+            self.connection = self.connection_class(self.host, timeout=self.timeout)
+            self.connection.connect()
+            # Headers and body go out in separate writes; without this,
+            # delayed ACKs add ~40ms to every request
+            self.connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        parts = urlsplit(urljoin(self.base_url, url))
+        path = parts.path + (f'?{parts.query}' if parts.query else '')
+        headers = {'Accept': 'application/json'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except Exception:
+            # Drop the broken connection; the next request reconnects
+            self.connection.close()
+            self.connection = None
+            raise
+        if response.getheader('Connection', '').lower() == 'close':
+            self.connection.close()
+            self.connection = None
+        return response.status, data
+
+
+class Account:
+    def __init__(self, username, access, refresh):
+        self.username = username
+        self.access = access
+        self.refresh = refresh
+        self.lock = threading.Lock()
+
+
+class Catalog:
+    """
+    Course ids plus the quizzes, games and topics found in their trees,
+    collected once before the run so scenarios can submit real ids.
+    """
+    def __init__(self):
+        self.course_ids = []
+        self.topic_ids = []
+        self.game_ids = []
+        # [(quiz id, {question id: [answer ids]})]
+        self.quizzes = []
+
+    def add_tree(self, course):
+        self.course_ids.append(course['id'])
+
+        def add_owner(owner):
+            quiz = owner.get('course_quiz') or owner.get('chapter_quiz') or owner.get('topic_quiz')
+            if quiz:
+                self.quizzes.append((quiz['id'], {
+                    question['id']: [answer['id'] for answer in question.get('answers', [])]
+                    for question in quiz.get('questions', [])
+                }))
+            game = owner.get('matching_game')
+            if game:
+                self.game_ids.append(game['id'])
+
+        add_owner(course)
+        for chapter in course.get('chapters', []):
+            add_owner(chapter)
+            for topic in chapter.get('topics', []):
+                self.topic_ids.append(topic['id'])
+                add_owner(topic)
+
+
+# --- Runner ---
+class LoadTest:
+    def __init__(self, base_url, accounts, catalog, mix, timeout, seed):
+        self.base_url = base_url
+        self.accounts = accounts
+        self.catalog = catalog
+        self.names = [name for name, weight in mix.items() if weight > 0]
+        self.weights = [mix[name] for name in self.names]
+        self.timeout = timeout
+        self.seed = seed
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.first_errors = {}
+        self.lock = threading.Lock()
+
+    def timed(self, client, endpoint, method, url, body=None, token=None):
+        started = time.perf_counter()
+        try:
+            status, data = client.request(method, url, body, token)
+        except Exception as e:
+            status, data = None, repr(e).encode()
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.samples[endpoint].append(elapsed)
+            if status is None or status >= 400:
+                self.errors[endpoint] += 1
+                self.first_errors.setdefault(endpoint, f"{status}: {data[:300].decode(errors='replace')}")
+        return status, data
+
+    def get_all_pages(self, client, endpoint, url, token=None):
+        # Mirrors getAllPages() in apiService.js
+        while url:
+            status, data = self.timed(client, endpoint, 'GET', url, token=token)
+            if status != 200:
+                return
+            url = json.loads(data).get('next')
+
+    # Scenarios
+    def home(self, client, rng, account):
+        self.get_all_pages(client, 'course-list', 'courses/', account.access)
+
+    def course(self, client, rng, account):
+        course_id = rng.choice(self.catalog.course_ids)
+        self.timed(client, 'course-detail', 'GET', f'courses/{course_id}/')
+        self.get_all_pages(client, 'course-progress', f'courses/{course_id}/my-progress/', account.access)
+
+    def dashboard(self, client, rng, account):
+        self.timed(client, 'dashboard-stats', 'GET', 'dashboard-stats/', token=account.access)
+
+    def quiz(self, client, rng, account):
+        quiz_id, questions = rng.choice(self.catalog.quizzes)
+        answers = {question_id: rng.choice(ids) for question_id, ids in questions.items() if ids}
+        self.timed(client, 'submit-quiz', 'POST', 'submit-quiz/',
+                   {'quiz_id': quiz_id, 'answers': answers}, account.access)
+
+    def game(self, client, rng, account):
+        self.timed(client, 'submit-game', 'POST', 'submit-game/',
+                   {'game_id': rng.choice(self.catalog.game_ids), 'score': 100}, account.access)
+
+    def topic(self, client, rng, account):
+        topic_id = rng.choice(self.catalog.topic_ids)
+        self.timed(client, 'mark-topic-complete', 'POST', f'topics/{topic_id}/mark-complete/', token=account.access)
+
+    def refresh(self, client, rng, account):
+        with account.lock:
+            status, data = self.timed(client, 'token-refresh', 'POST', 'token/refresh/', {'refresh': account.refresh})
+            if status == 200:
+                tokens = json.loads(data)
+                account.access = tokens['access']
+                account.refresh = tokens.get('refresh', account.refresh)
+
+    def usable(self):
+        # Scenarios that need ids the catalog does not have are left out
+        needs = {
+            'course': self.catalog.course_ids, 'quiz': self.catalog.quizzes,
+            'game': self.catalog.game_ids, 'topic': self.catalog.topic_ids,
+        }
+        return [name for name in self.names if needs.get(name, True)]
+
+    def worker(self, index, deadline, max_actions):
+        rng = random.Random(f'{self.seed}:{index}')
+        client = Client(self.base_url, self.timeout)
+        usable = set(self.usable())
+        names = [name for name in self.names if name in usable]
+        weights = [weight for name, weight in zip(self.names, self.weights) if name in usable]
+        actions = 0
+        while time.monotonic() < deadline and (not max_actions or actions < max_actions):
+            name = rng.choices(names, weights)[0]
+            account = self.accounts[(index + actions) % len(self.accounts)]
+            getattr(self, name)(client, rng, account)
+            actions += 1
+
+    def run(self, concurrency, duration, max_actions):
+        deadline = time.monotonic() + duration
+        per_worker = -(-max_actions // concurrency) if max_actions else 0
+        threads = [
+            threading.Thread(target=self.worker, args=(index, deadline, per_worker), daemon=True)
+            for index in range(concurrency)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    def report(self, elapsed):
+        endpoints = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            endpoints[endpoint] = {
+                'requests': len(ordered),
+                'errors': self.errors[endpoint],
+                'rps': len(ordered) / elapsed if elapsed else 0,
+                'mean_ms': sum(ordered) / len(ordered) * 1000,
+                'p50_ms': percentile(ordered, 50) * 1000,
+                'p95_ms': percentile(ordered, 95) * 1000,
+                'p99_ms': percentile(ordered, 99) * 1000,
+                'max_ms': ordered[-1] * 1000,
+            }
+            if endpoint in self.first_errors:
+                endpoints[endpoint]['first_error'] = self.first_errors[endpoint]
+        everything = sorted(sample for samples in self.samples.values() for sample in samples)
+        total = {
+            'requests': len(everything),
+            'errors': sum(self.errors.values()),
+            'rps': len(everything) / elapsed if elapsed else 0,
+        }
+        if everything:
+            total.update({
+                'p50_ms': percentile(everything, 50) * 1000,
+                'p95_ms': percentile(everything, 95) * 1000,
+                'p99_ms': percentile(everything, 99) * 1000,
+            })
+        return {'elapsed_s': elapsed, 'total': total, 'endpoints': endpoints}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays a weighted mix of API traffic against a running server with real JWTs "
+        "and reports throughput and p50/p95/p99 latency per endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8001/api/',
+                            help="API root of the server under test (as baseURL in apiService.js).")
+        parser.add_argument('--concurrency', type=int, default=8, help="Simulated clients (threads).")
+        parser.add_argument('--duration', type=float, default=30, help="Seconds to run.")
+        parser.add_argument('--requests', type=int, default=0,
+                            help="Stop after this many scenario runs in total (0: run for --duration).")
+        parser.add_argument('--mix', default='',
+                            help="Scenario weights, e.g. home=20,course=30,quiz=0 "
+                                 f"(scenarios: {', '.join(DEFAULT_MIX)}).")
+        parser.add_argument('--username-prefix', default='seed',
+                            help="Log in as existing users whose username starts with this "
+                                 "(see seed_elearning).")
+        parser.add_argument('--password', default='seed-pass-123')
+        parser.add_argument('--accounts', type=int, default=50, help="Distinct users to log in as.")
+        parser.add_argument('--courses', type=int, default=20, help="Course trees to sample ids from.")
+        parser.add_argument('--timeout', type=float, default=30, help="Per-request timeout in seconds.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        base_url = options['url'].rstrip('/') + '/'
+        mix = parse_mix(options['mix'])
+        if options['concurrency'] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+
+        client = Client(base_url, options['timeout'])
+        accounts = self.login(client, options)
+        catalog = self.load_catalog(client, accounts[0], options['courses'])
+        self.stdout.write(
+            f"{len(accounts)} accounts, {len(catalog.course_ids)} courses, {len(catalog.quizzes)} quizzes, "
+            f"{len(catalog.game_ids)} games, {len(catalog.topic_ids)} topics"
+        )
+
+        test = LoadTest(base_url, accounts, catalog, mix, options['timeout'], options['seed'])
+        skipped = set(test.names) - set(test.usable())
+        if skipped:
+            self.stderr.write(f"Skipping scenarios without data: {', '.join(sorted(skipped))}")
+        if not test.usable():
+            raise CommandError("No scenario can run against this server's data.")
+        elapsed = test.run(options['concurrency'], options['duration'], options['requests'])
+        report = test.report(elapsed)
+        self.print_report(report)
+
+        if options['output']:
+            result = {
+                'started_at': timezone.now().isoformat(),
+                'revision': git_revision(),
+                'url': base_url,
+                'concurrency': options['concurrency'],
+                'mix': mix,
+                **report,
+            }
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def login(self, client, options):
+        usernames = list(
+            User.objects.filter(username__startswith=options['username_prefix'], is_active=True)
+            .order_by('id').values_list('username', flat=True)[:options['accounts']]
+        )
+        if not usernames:
+            raise CommandError(
+                f"No users named {options['username_prefix']}*; run seed_elearning first "
+                "or pass --username-prefix/--password."
+            )
+        accounts = []
+        for username in usernames:
+            # Same call as loginUser() in apiService.js
+            status, data = client.request('POST', 'token/', {'username': username, 'password': options['password']})
+            if status != 200:
+                raise CommandError(f"Could not obtain a token for {username} (HTTP {status}).")
+            tokens = json.loads(data)
+            accounts.append(Account(username, tokens['access'], tokens['refresh']))
+        return accounts
+
+    def load_catalog(self, client, account, limit):
+        catalog = Catalog()
+        url = 'courses/'
+        course_ids = []
+        while url and len(course_ids) < limit:
+            status, data = client.request('GET', url, token=account.access)
+            if status != 200:
+                raise CommandError(f"GET {url} failed (HTTP {status}).")
+            page = json.loads(data)
+            course_ids.extend(course['id'] for course in page['results'])
+            url = page.get('next')
+        for course_id in course_ids[:limit]:
+            status, data = client.request('GET', f'courses/{course_id}/', token=account.access)
+            if status == 200:
+                catalog.add_tree(json.loads(data))
+        return catalog
+
+    def print_report(self, report):
+        header = f"{'endpoint':<22}{'requests':>9}{'errors':>8}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for endpoint, row in report['endpoints'].items():
+            self.stdout.write(
+                f"{endpoint:<22}{row['requests']:>9}{row['errors']:>8}{row['rps']:>9.1f}"
+                f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}"
+            )
+        total = report['total']
+        line = f"{total['requests']} requests, {total['errors']} errors, {total['rps']:.1f} req/s in {report['elapsed_s']:.1f}s"
+        if total['requests']:
+            line += f" (p50 {total['p50_ms']:.1f} ms, p95 {total['p95_ms']:.1f} ms, p99 {total['p99_ms']:.1f} ms)"
+        self.stdout.write(self.style.SUCCESS(line))
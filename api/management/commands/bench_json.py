@@ -0,0 +1,60 @@
+import io
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Course
+from api.renderers import FastJSONParser, FastJSONRenderer, orjson
+from api.snapshots import render_course_tree
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares DRF's stdlib JSON renderer/parser with the orjson-backed ones "
+        "(api/renderers.py) on a real course tree."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, help="Course id (default: the one with the most topics).")
+        parser.add_argument('--repeat', type=int, default=200, help="Renders/parses per measurement.")
+        parser.add_argument('--rounds', type=int, default=5, help="Measurements per codec; the best one is reported.")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or options['rounds'] < 1:
+            raise CommandError("--repeat and --rounds must be at least 1.")
+        course_id = options['course']
+        if course_id is None:
+            course_id = (
+                Course.objects.annotate(topics=Count('chapters__topics'))
+                .order_by('-topics', 'id').values_list('id', flat=True).first()
+            )
+        if course_id is None or not Course.objects.filter(pk=course_id).exists():
+            raise CommandError("No such course; seed some with `manage.py seed_elearning`.")
+
+        # The serializer output the detail endpoint renders, as Python data
+        data = FastJSONParser().parse(io.BytesIO(render_course_tree(course_id)))
+        body = JSONRenderer().render(data)
+        self.stdout.write(f"course {course_id}: {len(body)} bytes (orjson {'installed' if orjson else 'missing'})")
+
+        def best(func, arg):
+            timings = []
+            for _ in range(options['rounds']):
+                started = time.perf_counter()
+                for _ in range(options['repeat']):
+                    func(arg)
+                timings.append((time.perf_counter() - started) / options['repeat'])
+            return min(timings)
+
+        for label, stdlib, fast, arg in (
+            ('render', JSONRenderer().render, FastJSONRenderer().render, data),
+            ('parse', lambda raw: JSONParser().parse(io.BytesIO(raw)),
+             lambda raw: FastJSONParser().parse(io.BytesIO(raw)), body),
+        ):
+            slow_time, fast_time = best(stdlib, arg), best(fast, arg)
+            self.stdout.write(
+                f"{label:<7} stdlib {slow_time * 1e6:9.1f} us   fast {fast_time * 1e6:9.1f} us   "
+                f"x{slow_time / fast_time:.1f}"
+            )
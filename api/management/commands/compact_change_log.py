@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.changelog import change_log_config, compact_change_log
+
+
+class Command(BaseCommand):
+    help = (
+        "Compacts the content change log: drops entries superseded by a newer one for the same row, "
+        "and tombstones older than --tombstone-days (clients behind those resync)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tombstone-days', type=int, default=change_log_config()['TOMBSTONE_DAYS'])
+
+    def handle(self, *args, **options):
+        superseded, pruned = compact_change_log(options['tombstone_days'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {superseded} superseded entries and {pruned} expired tombstones."
+        ))
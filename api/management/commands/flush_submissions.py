@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ingest import WriteBehindWriter, write_behind_config
+
+
+class Command(BaseCommand):
+    help = "Writes every submission waiting in the write-behind queue (api/ingest.py) to the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=float, default=None, help="Stop after this many seconds.")
+        parser.add_argument(
+            '--requeue-dead', action='store_true',
+            help="Retry the submissions set aside after failing MAX_ATTEMPTS times.",
+        )
+
+    def handle(self, *args, **options):
+        config = write_behind_config()
+        writer = WriteBehindWriter(config)
+        if options['requeue_dead']:
+            self.stdout.write(f"Requeued {writer.queue.requeue_dead()} dead letters.")
+        pending = len(writer.queue)
+        try:
+            written = writer.drain(options['timeout'])
+        except Exception as e:
+            raise CommandError(f"Flushing failed; the batch stays queued: {e}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} of {pending} queued submissions; {len(writer.queue)} left."
+        ))
+        dead = writer.queue.dead_count()
+        if dead:
+            self.stdout.write(self.style.WARNING(
+                f"{dead} dead letters in {writer.queue.path}; see their error column, then --requeue-dead."
+            ))
@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from api.images import image_config, optimize_topic
+from api.models import Topic, OptimizedImage
+
+
+class Command(BaseCommand):
+    help = "Optimizes the CKEditor uploads referenced by topic articles and rewrites the articles (api/images.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Threads (default: IMAGE_OPTIMIZATION['WORKERS']).")
+
+    def handle(self, *args, **options):
+        config = image_config()
+        workers = options['workers'] or config['WORKERS']
+        if workers < 1:
+            raise CommandError("--workers must be at least 1.")
+        topic_ids = list(
+            Topic.objects.filter(article_content__contains=settings.CKEDITOR_UPLOAD_PATH)
+            .order_by('id').values_list('id', flat=True)
+        )
+
+        def run(topic_id):
+            try:
+                return optimize_topic(topic_id, config)
+            finally:
+                close_old_connections()
+
+        if workers == 1:
+            changed = sum(map(run, topic_ids))
+        else:
+            with ThreadPoolExecutor(workers) as pool:
+                changed = sum(pool.map(run, topic_ids))
+
+        original = optimized = 0
+        for image in OptimizedImage.objects.all().iterator():
+            original += image.original_size
+            # What a phone-sized screen downloads: the smallest WebP variant
+            optimized += min((v['size'] for v in image.variants if v['format'] == 'webp'), default=image.original_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rewrote {changed} of {len(topic_ids)} articles; originals {original} bytes, "
+            f"smallest WebP variants {optimized} bytes."
+        ))
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.sync import prune_applied_events
+
+
+class Command(BaseCommand):
+    help = (
+        "Forgets the ids of offline sync events applied more than --days ago; "
+        "an upload retried after that is applied again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'SYNC_EVENT_ID_DAYS', 30))
+
+    def handle(self, *args, **options):
+        pruned = prune_applied_events(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"Forgot {pruned} applied event ids."))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, OuterRef, Q, Subquery
+
+from api.models import Course, CourseSnapshot
+from api.snapshots import publish_course
+
+
+class Command(BaseCommand):
+    help = "Renders and publishes course snapshots (api/snapshots.py) for the given course ids."
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_ids', nargs='*', type=int)
+        parser.add_argument('--all', action='store_true', help="Publish every course.")
+        parser.add_argument('--changed', action='store_true',
+                            help="Skip courses not edited since their published snapshot.")
+
+    def handle(self, *args, **options):
+        if not options['course_ids'] and not options['all']:
+            raise CommandError("Give course ids or --all.")
+        courses = Course.objects.order_by('id')
+        if options['course_ids']:
+            courses = courses.filter(pk__in=options['course_ids'])
+        if options['changed']:
+            published_from = CourseSnapshot.objects.filter(
+                course=OuterRef('pk'), version=OuterRef('published_version'),
+            ).values('content_version')
+            courses = courses.annotate(published_from=Subquery(published_from)).filter(
+                Q(published_from__isnull=True) | ~Q(published_from=F('content_version'))
+            )
+
+        published = 0
+        for course_id in courses.values_list('id', flat=True):
+            snapshot = publish_course(course_id)
+            published += 1
+            self.stdout.write(f"{course_id}: v{snapshot.version} ({len(snapshot.body)} bytes)")
+        self.stdout.write(self.style.SUCCESS(f"Published {published} course(s)."))
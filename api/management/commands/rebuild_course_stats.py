@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import UserCourseStats
+from api.stats import course_stats_values
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the UserCourseStats rollup table from UserProgress and QuizScoreSummary rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rows = course_stats_values()
+
+        with transaction.atomic():
+            UserCourseStats.objects.all().delete()
+            UserCourseStats.objects.bulk_create(
+                (
+                    UserCourseStats(user_id=user_id, course_id=course_id, **values)
+                    for (user_id, course_id), values in rows.items()
+                ),
+                batch_size=options['batch_size'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(rows)} course stats rows."))
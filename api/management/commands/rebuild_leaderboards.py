@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.leaderboards import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the per-course leaderboard tables from QuizScoreSummary and GameScoreSummary rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        entries = rebuild_leaderboards(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {entries} leaderboard entries."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search documents from courses, topics, questions and matching pairs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        documents = rebuild_search_index(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {documents} search documents."))
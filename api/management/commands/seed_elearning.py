@@ -0,0 +1,372 @@
+import multiprocessing
+import random
+import time
+from collections import defaultdict
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from api.models import (
+    Course, Chapter, Topic,
+    Quiz, Question, Answer,
+    MatchingGame, MatchingPair,
+    UserProgress, QuizAttempt, GameAttempt,
+    UserCourseStats, QuizScoreSummary, GameScoreSummary,
+)
+from api.articles import apply_rendered_article
+from api.leaderboards import rebuild_leaderboards
+from api.search import rebuild_search_index
+
+
+WORDS = (
+    'learn', 'practice', 'lesson', 'grammar', 'vocabulary', 'reading', 'writing', 'number',
+    'science', 'history', 'river', 'village', 'market', 'school', 'teacher', 'student',
+    'শিক্ষা', 'পাঠ', 'অনুশীলন', 'ব্যাকরণ', 'শব্দ', 'গণিত', 'বিজ্ঞান', 'ইতিহাস',
+    'নদী', 'গ্রাম', 'বাজার', 'বিদ্যালয়', 'শিক্ষক', 'ছাত্র', 'বই', 'প্রশ্ন',
+)
+
+# Models whose primary keys the seeder assigns itself, in insert order
+CONTENT_MODELS = (Course, Chapter, Topic, Quiz, Question, Answer, MatchingGame, MatchingPair)
+ACTIVITY_MODELS = (
+    UserProgress, QuizAttempt, GameAttempt,
+    QuizScoreSummary, GameScoreSummary, UserCourseStats,
+)
+
+
+# --- Id layout ---
+class Layout:
+    """
+    Maps (course, chapter, topic, ...) indexes to primary keys. Every id is
+    computed from the starting id of its table and the configured shape, so
+    any process can build any slice of the tree without coordination and the
+    same seed always yields the same rows.
+    """
+    def __init__(self, options, bases):
+        self.chapters = options['chapters']
+        self.topics = options['topics']
+        self.questions = options['questions']
+        self.answers = options['answers']
+        self.pairs = options['pairs']
+        self.bases = bases
+        # A quiz and a game for every topic, every chapter and the course
+        self.per_course = self.chapters * self.topics + self.chapters + 1
+
+    def course(self, i):
+        return self.bases['course'] + i
+
+    def chapter(self, i, c):
+        return self.bases['chapter'] + i * self.chapters + c
+
+    def topic(self, i, c, t):
+        return self.bases['topic'] + (i * self.chapters + c) * self.topics + t
+
+    def topic_slot(self, c, t):
+        return c * self.topics + t
+
+    def chapter_slot(self, c):
+        return self.chapters * self.topics + c
+
+    def course_slot(self):
+        return self.per_course - 1
+
+    def quiz(self, i, slot):
+        return self.bases['quiz'] + i * self.per_course + slot
+
+    def game(self, i, slot):
+        return self.bases['matchinggame'] + i * self.per_course + slot
+
+    def question(self, quiz_id, q):
+        return self.bases['question'] + (quiz_id - self.bases['quiz']) * self.questions + q
+
+    def answer(self, question_id, a):
+        return self.bases['answer'] + (question_id - self.bases['question']) * self.answers + a
+
+    def pair(self, game_id, p):
+        return self.bases['matchingpair'] + (game_id - self.bases['matchinggame']) * self.pairs + p
+
+    def user(self, u):
+        return self.bases['user'] + u
+
+
+def table_bases():
+    bases = {}
+    for model in CONTENT_MODELS + (User,):
+        bases[model._meta.model_name] = (model.objects.aggregate(m=Max('id'))['m'] or 0) + 1
+    return bases
+
+
+def reset_sequences(models):
+    # Explicit ids leave PostgreSQL sequences behind; SQLite keeps up on its own
+    connection = connections['default']
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+# --- Chunked writer ---
+class BulkWriter:
+    """
+    Buffers unsaved model instances and writes them with bulk_create,
+    `batch_size` rows per statement, parents before children.
+    """
+    def __init__(self, models, batch_size):
+        self.batch_size = batch_size
+        self.pending = {model: [] for model in models}
+        self.counts = defaultdict(int)
+
+    def add(self, obj):
+        rows = self.pending[type(obj)]
+        rows.append(obj)
+        if len(rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for model, rows in self.pending.items():
+            if rows:
+                model.objects.bulk_create(rows, batch_size=self.batch_size)
+                self.counts[model._meta.label] += len(rows)
+                rows.clear()
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+# --- Content ---
+def build_courses(options, bases, start, stop):
+    layout = Layout(options, bases)
+    writer = BulkWriter(CONTENT_MODELS, options['batch_size'])
+
+    def add_quiz(rng, quiz_id, **owner):
+        writer.add(Quiz(id=quiz_id, title=sentence(rng, 3).title(), **owner))
+        for q in range(layout.questions):
+            question_id = layout.question(quiz_id, q)
+            writer.add(Question(id=question_id, quiz_id=quiz_id, text=sentence(rng, 8) + '?'))
+            correct = rng.randrange(layout.answers)
+            for a in range(layout.answers):
+                writer.add(Answer(
+                    id=layout.answer(question_id, a), question_id=question_id,
+                    text=sentence(rng, 3), is_correct=(a == correct),
+                ))
+
+    def add_game(rng, game_id, **owner):
+        writer.add(MatchingGame(id=game_id, title=sentence(rng, 3).title(), **owner))
+        for p in range(layout.pairs):
+            writer.add(MatchingPair(
+                id=layout.pair(game_id, p), game_id=game_id,
+                item_a=rng.choice(WORDS[:16]), item_b=rng.choice(WORDS[16:]),
+            ))
+
+    with transaction.atomic():
+        for i in range(start, stop):
+            rng = random.Random(f"{options['seed']}:course:{i}")
+            course_id = layout.course(i)
+            writer.add(Course(id=course_id, title=f"Course {i}: {sentence(rng, 3)}", description=sentence(rng, 40)))
+            for c in range(layout.chapters):
+                chapter_id = layout.chapter(i, c)
+                writer.add(Chapter(id=chapter_id, course_id=course_id, title=sentence(rng, 4), order=c))
+                for t in range(layout.topics):
+                    topic_id = layout.topic(i, c, t)
+                    topic = Topic(
+                        id=topic_id, chapter_id=chapter_id, title=sentence(rng, 4), order=t,
+                        video_url=f'https://www.youtube.com/watch?v=seed{topic_id}' if rng.random() < 0.5 else None,
+                        article_content=''.join(
+                            f'<p>{sentence(rng, rng.randint(40, 120))}</p>' for _ in range(options['paragraphs'])
+                        ),
+                    )
+                    # bulk_create() skips the pre_save render (api/signals.py)
+                    apply_rendered_article(topic)
+                    writer.add(topic)
+                    add_quiz(rng, layout.quiz(i, layout.topic_slot(c, t)), topic_id=topic_id)
+                    add_game(rng, layout.game(i, layout.topic_slot(c, t)), topic_id=topic_id)
+                add_quiz(rng, layout.quiz(i, layout.chapter_slot(c)), chapter_id=chapter_id)
+                add_game(rng, layout.game(i, layout.chapter_slot(c)), chapter_id=chapter_id)
+            add_quiz(rng, layout.quiz(i, layout.course_slot()), course_id=course_id)
+            add_game(rng, layout.game(i, layout.course_slot()), course_id=course_id)
+        writer.flush()
+    return dict(writer.counts)
+
+
+# --- Users ---
+def build_users(options, bases, start, stop, password_hash):
+    layout = Layout(options, bases)
+    writer = BulkWriter((User,), options['batch_size'])
+    joined = timezone.now()
+    with transaction.atomic():
+        for u in range(start, stop):
+            user_id = layout.user(u)
+            writer.add(User(
+                id=user_id, username=f"{options['username_prefix']}{user_id}",
+                password=password_hash, email=f"{options['username_prefix']}{user_id}@example.com",
+                date_joined=joined,
+            ))
+        writer.flush()
+    return dict(writer.counts)
+
+
+# --- Learner activity ---
+def build_activity(options, bases, start, stop):
+    """
+    Each user enrolls in a few courses and works through part of each:
+    completed topics get progress rows, quiz and game attempts, and the
+    summary/rollup rows those attempts would have produced.
+    """
+    layout = Layout(options, bases)
+    writer = BulkWriter(ACTIVITY_MODELS, options['batch_size'])
+    courses = options['courses']
+    now = timezone.now()
+    with transaction.atomic():
+        for u in range(start, stop):
+            rng = random.Random(f"{options['seed']}:user:{u}")
+            user_id = layout.user(u)
+            for i in rng.sample(range(courses), min(options['enrollments'], courses)):
+                slots = [(c, t) for c in range(layout.chapters) for t in range(layout.topics)]
+                share = min(1.0, options['completion'] * rng.uniform(0.5, 1.5))
+                done = slots[:round(len(slots) * share)]
+                quiz_sum, quiz_count = 0.0, 0
+                for c, t in done:
+                    writer.add(UserProgress(user_id=user_id, topic_id=layout.topic(i, c, t), completed=True))
+                    quiz_id = layout.quiz(i, layout.topic_slot(c, t))
+                    scores = [
+                        rng.randint(0, layout.questions) * 100 / max(layout.questions, 1)
+                        for _ in range(rng.randint(1, options['attempts']))
+                    ]
+                    for score in scores:
+                        writer.add(QuizAttempt(user_id=user_id, quiz_id=quiz_id, score=score))
+                    writer.add(QuizScoreSummary(
+                        user_id=user_id, quiz_id=quiz_id, best_score=max(scores),
+                        latest_score=scores[-1], attempt_count=len(scores), latest_at=now,
+                    ))
+                    quiz_sum += scores[-1]
+                    quiz_count += 1
+
+                    game_id = layout.game(i, layout.topic_slot(c, t))
+                    writer.add(GameAttempt(user_id=user_id, game_id=game_id, score=100.0))
+                    writer.add(GameScoreSummary(
+                        user_id=user_id, game_id=game_id, best_score=100.0,
+                        latest_score=100.0, attempt_count=1, latest_at=now,
+                    ))
+                if done:
+                    writer.add(UserCourseStats(
+                        user_id=user_id, course_id=layout.course(i), completed_topics=len(done),
+                        quiz_score_sum=quiz_sum, quiz_attempt_count=quiz_count,
+                    ))
+        writer.flush()
+    return dict(writer.counts)
+
+
+# --- Process pool ---
+def _init_worker():
+    # A no-op after fork; sets Django up when workers are spawned
+    django.setup()
+
+
+def _run(job):
+    func, args = job
+    return func(*args)
+
+
+def _run_in_worker(job):
+    try:
+        return _run(job)
+    finally:
+        connections.close_all()
+
+
+def shards(total, size):
+    return [(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a deterministic synthetic dataset (courses, quizzes, games, users "
+        "and their progress/attempts) for load testing. The same --seed and shape "
+        "options always produce the same content, users and primary keys."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--courses', type=int, default=20)
+        parser.add_argument('--chapters', type=int, default=5, help="Chapters per course.")
+        parser.add_argument('--topics', type=int, default=8, help="Topics per chapter.")
+        parser.add_argument('--questions', type=int, default=5, help="Questions per quiz.")
+        parser.add_argument('--answers', type=int, default=4, help="Answers per question.")
+        parser.add_argument('--pairs', type=int, default=6, help="Pairs per matching game.")
+        parser.add_argument('--paragraphs', type=int, default=3, help="Article paragraphs per topic.")
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--enrollments', type=int, default=3, help="Courses each user has started.")
+        parser.add_argument('--completion', type=float, default=0.5,
+                            help="Average fraction of an enrolled course's topics a user has completed.")
+        parser.add_argument('--attempts', type=int, default=3, help="Most attempts per quiz and user.")
+        parser.add_argument('--password', default='seed-pass-123',
+                            help="Password for every generated user (hashed once).")
+        parser.add_argument('--username-prefix', default='seed')
+        parser.add_argument('--batch-size', type=int, default=2000, help="Rows per INSERT.")
+        parser.add_argument('--chunk', type=int, default=0,
+                            help="Courses/users per unit of work (default: spread evenly over the workers).")
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Processes to generate with. SQLite serializes writes, so keep 1 there.")
+
+    def handle(self, *args, **options):
+        for name in ('chapters', 'topics', 'questions', 'answers', 'batch_size', 'workers', 'attempts'):
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be at least 1.")
+        if not 0 <= options['completion'] <= 1:
+            raise CommandError("--completion must be between 0 and 1.")
+
+        started = time.monotonic()
+        bases = table_bases()
+        password_hash = make_password(options['password'])
+        workers = options['workers']
+
+        def chunk_size(total):
+            return options['chunk'] or max(1, -(-total // (workers * 4)))
+
+        phases = [
+            ('courses', [(build_courses, (options, bases, a, b))
+                         for a, b in shards(options['courses'], chunk_size(options['courses']))]),
+            ('users', [(build_users, (options, bases, a, b, password_hash))
+                       for a, b in shards(options['users'], chunk_size(options['users']))]),
+        ]
+        if options['courses']:
+            phases.append(('activity', [(build_activity, (options, bases, a, b))
+                                        for a, b in shards(options['users'], chunk_size(options['users']))]))
+
+        totals = defaultdict(int)
+        if workers == 1:
+            for name, jobs in phases:
+                self._run_phase(name, map(_run, jobs), totals)
+        else:
+            # Children must open their own connections
+            connections.close_all()
+            with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+                for name, jobs in phases:
+                    self._run_phase(name, pool.imap_unordered(_run_in_worker, jobs), totals)
+
+        reset_sequences(CONTENT_MODELS + (User,))
+        if options['courses']:
+            totals['leaderboard entries'] = rebuild_leaderboards(options['batch_size'])
+            totals['search documents'] = rebuild_search_index(options['batch_size'])
+
+        for label, count in sorted(totals.items()):
+            self.stdout.write(f"  {label}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {sum(totals.values())} rows in {time.monotonic() - started:.1f}s."
+        ))
+
+    def _run_phase(self, name, results, totals):
+        started = time.monotonic()
+        rows = 0
+        for counts in results:
+            for label, count in counts.items():
+                totals[label] += count
+                rows += count
+        self.stdout.write(f"{name}: {rows} rows in {time.monotonic() - started:.1f}s")
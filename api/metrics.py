@@ -0,0 +1,293 @@
+import contextvars
+import hmac
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+
+# Upper bounds (seconds) of the request latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def metrics_config():
+    return getattr(settings, 'PERF_METRICS', {})
+
+
+# --- Registry ---
+class ViewMetrics:
+    __slots__ = ('requests', 'buckets', 'duration', 'queries', 'db_time', 'render_time')
+
+    def __init__(self, bucket_count):
+        self.requests = defaultdict(int)  # (method, status) -> count
+        self.buckets = [0] * bucket_count
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+
+
+class MetricsRegistry:
+    """
+    Per-process request metrics keyed by resolved view name. Each request
+    costs one lock acquisition; exposition walks the dict under the same lock.
+    Every worker process keeps its own numbers, so scrape each worker (or
+    aggregate by instance label) when running several.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.views = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, method, status, duration, queries, db_time, render_time):
+        with self._lock:
+            metrics = self.views.get(view)
+            if metrics is None:
+                metrics = self.views[view] = ViewMetrics(len(self.buckets))
+            metrics.requests[(method, status)] += 1
+            for index, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    metrics.buckets[index] += 1
+                    break
+            metrics.duration += duration
+            metrics.queries += queries
+            metrics.db_time += db_time
+            metrics.render_time += render_time
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: {
+                    'requests': dict(metrics.requests),
+                    'buckets': list(metrics.buckets),
+                    'duration': metrics.duration,
+                    'queries': metrics.queries,
+                    'db_time': metrics.db_time,
+                    'render_time': metrics.render_time,
+                }
+                for view, metrics in self.views.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self.views.clear()
+
+    def render(self):
+        """
+        Prometheus text exposition format (version 0.0.4).
+        """
+        views = self.snapshot()
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        family('http_requests_total', 'counter', 'Requests by view, method and status.')
+        for view, data in sorted(views.items()):
+            for (method, status), count in sorted(data['requests'].items()):
+                lines.append(f'http_requests_total{{view="{_escape(view)}",method="{method}",status="{status}"}} {count}')
+
+        family('http_request_duration_seconds', 'histogram', 'Time spent handling requests, by view.')
+        for view, data in sorted(views.items()):
+            label = _escape(view)
+            cumulative = 0
+            for bound, count in zip(self.buckets, data['buckets']):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+            total = sum(data['requests'].values())
+            lines.append(f'http_request_duration_seconds_bucket{{view="{label}",le="+Inf"}} {total}')
+            lines.append(f'http_request_duration_seconds_sum{{view="{label}"}} {data["duration"]:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{view="{label}"}} {total}')
+
+        for name, key, help_text in (
+            ('http_request_db_queries_total', 'queries', 'SQL queries run while handling requests, by view.'),
+            ('http_request_db_seconds_total', 'db_time', 'Time spent in SQL while handling requests, by view.'),
+            ('http_request_render_seconds_total', 'render_time', 'Time spent serializing/rendering responses, by view.'),
+        ):
+            family(name, 'counter', help_text)
+            for view, data in sorted(views.items()):
+                value = data[key]
+                value = f'{value:.6f}' if isinstance(value, float) else value
+                lines.append(f'{name}{{view="{_escape(view)}"}} {value}')
+
+        # In-process caches keep their own hit/miss counters
+        from .authentication import user_cache
+        from .course_cache import course_tree_cache
+        for prefix, label, cache in (
+            ('course_tree_cache', 'Course tree cache', course_tree_cache),   # api/course_cache.py
+            ('jwt_user_cache', 'JWT user cache', user_cache),                # api/authentication.py
+        ):
+            for key, value in cache.stats().items():
+                name = f'{prefix}_{key}'
+                family(name, 'counter' if key.endswith(('hits', 'misses')) else 'gauge', f'{label} {key.replace("_", " ")}.')
+                lines.append(f'{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry(metrics_config().get('BUCKETS', DEFAULT_BUCKETS))
+
+
+# --- Per-request timing ---
+class RequestTimer:
+    __slots__ = ('started', 'queries', 'db_time', 'render_time')
+
+    def __init__(self):
+        self.started = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper() hook: counts and times every query
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+_current_timer = contextvars.ContextVar('request_timer', default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    # Installed on every connection, in whichever thread opens it (under ASGI
+    # the ORM runs in sync_to_async threads with their own connections); the
+    # context variable, which follows the request into those threads, says
+    # which request to charge
+    timer = _current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install_query_timer(connection):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+@contextmanager
+def time_render():
+    """
+    Adds the enclosed block to the current request's render time; for views
+    that serialize outside DRF's Response rendering (e.g. cached bytes).
+    """
+    timer = _current_timer.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timer is not None:
+            timer.render_time += time.perf_counter() - started
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match._func_path
+
+
+class PerformanceMiddleware:
+    """
+    Records count, latency, SQL queries/time and render time per resolved
+    view into `registry`, and optionally describes the same numbers in a
+    Server-Timing header (PERF_METRICS['SERVER_TIMING']).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Under ASGI stay async, so async views are not forced through a thread
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not metrics_config().get('ENABLED', True):
+            return self.get_response(request)
+        timer, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_timer.reset(token)
+        return self.finish(request, response, timer)
+
+    async def __acall__(self, request):
+        if not metrics_config().get('ENABLED', True):
+            return await self.get_response(request)
+        timer, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_timer.reset(token)
+        return self.finish(request, response, timer)
+
+    def start(self, request):
+        timer = RequestTimer()
+        timer.started = time.perf_counter()
+        request._request_timer = timer
+        token = _current_timer.set(timer)
+        # Connections opened before api/signals.py was loaded lack the hook
+        for alias in connections:
+            install_query_timer(connections[alias])
+        return timer, token
+
+    def finish(self, request, response, timer):
+        duration = time.perf_counter() - timer.started
+        registry.observe(
+            view_name(request), request.method, response.status_code,
+            duration, timer.queries, timer.db_time, timer.render_time,
+        )
+        if metrics_config().get('SERVER_TIMING', False):
+            response['Server-Timing'] = (
+                f'db;dur={timer.db_time * 1000:.1f};desc="{timer.queries} queries", '
+                f'render;dur={timer.render_time * 1000:.1f}, '
+                f'total;dur={duration * 1000:.1f}'
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF Responses render after the view returns; time that step too
+        timer = getattr(request, '_request_timer', None)
+        if timer is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                timer.render_time += time.perf_counter() - started
+            response.add_post_render_callback(rendered)
+        return response
+
+
+# --- Exposition endpoint ---
+# With TOKEN set, scrapers authenticate with it. Without one the numbers
+# (view names, traffic, latencies) are only shown in DEBUG, to INTERNAL_IPS
+# and to staff sessions.
+def metrics_allowed(request):
+    token = metrics_config().get('TOKEN')
+    if token:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if settings.DEBUG or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS:
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_staff)
+
+
+def metrics_view(request):
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_usercoursestats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='content_updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='content_version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
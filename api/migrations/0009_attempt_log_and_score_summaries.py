@@ -0,0 +1,98 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_summaries(apps, schema_editor):
+    # Existing attempts (one per user and quiz/game so far) seed the summaries
+    for attempt_name, summary_name, key in (
+        ('QuizAttempt', 'QuizScoreSummary', 'quiz'),
+        ('GameAttempt', 'GameScoreSummary', 'game'),
+    ):
+        Attempt = apps.get_model('api', attempt_name)
+        Summary = apps.get_model('api', summary_name)
+        summaries = {}
+        for attempt in Attempt.objects.order_by('timestamp', 'id').iterator():
+            pair = (attempt.user_id, getattr(attempt, f'{key}_id'))
+            summary = summaries.get(pair)
+            if summary is None:
+                summaries[pair] = Summary(
+                    user_id=pair[0], best_score=attempt.score, latest_score=attempt.score,
+                    attempt_count=1, latest_at=attempt.timestamp, **{f'{key}_id': pair[1]}
+                )
+            else:
+                summary.best_score = max(summary.best_score, attempt.score)
+                summary.latest_score = attempt.score
+                summary.attempt_count += 1
+                summary.latest_at = attempt.timestamp
+        Summary.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_course_content_updated_at_course_content_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameScoreSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('best_score', models.FloatField()),
+                ('latest_score', models.FloatField()),
+                ('attempt_count', models.PositiveIntegerField(default=1)),
+                ('latest_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuizScoreSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('best_score', models.FloatField()),
+                ('latest_score', models.FloatField()),
+                ('attempt_count', models.PositiveIntegerField(default=1)),
+                ('latest_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='gameattempt',
+            index=models.Index(fields=['user', 'game', 'timestamp'], name='api_gameatt_user_id_9c8b07_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['user', 'quiz', 'timestamp'], name='api_quizatt_user_id_2eb302_idx'),
+        ),
+        migrations.AddField(
+            model_name='gamescoresummary',
+            name='game',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_summaries', to='api.matchinggame'),
+        ),
+        migrations.AddField(
+            model_name='gamescoresummary',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='quizscoresummary',
+            name='quiz',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_summaries', to='api.quiz'),
+        ),
+        migrations.AddField(
+            model_name='quizscoresummary',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='gamescoresummary',
+            unique_together={('user', 'game')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='quizscoresummary',
+            unique_together={('user', 'quiz')},
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
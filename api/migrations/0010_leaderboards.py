@@ -0,0 +1,73 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:30
+
+from collections import defaultdict
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_leaderboards(apps, schema_editor):
+    # Points per course are the summed best scores (rounded, as in
+    # api/leaderboards.item_points) of its quizzes and games
+    Entry = apps.get_model('api', 'LeaderboardEntry')
+    ScoreCount = apps.get_model('api', 'LeaderboardScoreCount')
+    points = defaultdict(int)
+    for summary_name, key in (('QuizScoreSummary', 'quiz'), ('GameScoreSummary', 'game')):
+        Summary = apps.get_model('api', summary_name)
+        for course_path in ('topic__chapter__course_id', 'chapter__course_id', 'course_id'):
+            path = f'{key}__{course_path}'
+            rows = Summary.objects.filter(**{f'{path}__isnull': False}).values_list('user_id', path, 'best_score')
+            for user_id, course_id, best in rows.iterator():
+                points[(user_id, course_id)] += int(max(best, 0) + 0.5)
+    points = {pair: value for pair, value in points.items() if value > 0}
+    counts = defaultdict(int)
+    for (_, course_id), value in points.items():
+        counts[(course_id, value)] += 1
+    Entry.objects.bulk_create(
+        [Entry(user_id=user_id, course_id=course_id, points=value) for (user_id, course_id), value in points.items()],
+        batch_size=1000,
+    )
+    ScoreCount.objects.bulk_create(
+        [ScoreCount(course_id=course_id, points=value, learners=n) for (course_id, value), n in counts.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_attempt_log_and_score_summaries'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='api.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['course', '-points', 'updated_at'], name='api_leaderb_course__aa73de_idx')],
+                'unique_together': {('user', 'course')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaderboardScoreCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.PositiveIntegerField()),
+                ('learners', models.IntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_counts', to='api.course')),
+            ],
+            options={
+                'unique_together': {('course', 'points')},
+            },
+        ),
+        migrations.RunPython(backfill_leaderboards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_leaderboards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='published_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='published_version',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='CourseSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('content_version', models.PositiveIntegerField()),
+                ('tree_format', models.PositiveIntegerField()),
+                ('body', models.BinaryField()),
+                ('body_gzip', models.BinaryField(blank=True, null=True)),
+                ('body_br', models.BinaryField(blank=True, null=True)),
+                ('sha256', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='api.course')),
+            ],
+            options={
+                'unique_together': {('course', 'version')},
+            },
+        ),
+    ]
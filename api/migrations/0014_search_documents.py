@@ -0,0 +1,148 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:52
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Full-text index over SearchDocument's normalized terms (api/search.py)
+INDEX_SQL = {
+    'postgresql': [
+        """
+        ALTER TABLE api_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(array_to_tsvector(string_to_array(title_terms, ' ')), 'A')
+            || setweight(array_to_tsvector(string_to_array(body_terms, ' ')), 'B')
+        ) STORED
+        """,
+        'CREATE INDEX api_searchdocument_vector ON api_searchdocument USING gin (search_vector)',
+    ],
+    'sqlite': [
+        """
+        CREATE VIRTUAL TABLE api_searchdocument_fts USING fts5(
+            title_terms, body_terms, content='api_searchdocument', content_rowid='id',
+            tokenize='ascii', prefix='3 4'
+        )
+        """,
+        """
+        CREATE TRIGGER api_searchdocument_fts_insert AFTER INSERT ON api_searchdocument BEGIN
+            INSERT INTO api_searchdocument_fts (rowid, title_terms, body_terms)
+            VALUES (new.id, new.title_terms, new.body_terms);
+        END
+        """,
+        """
+        CREATE TRIGGER api_searchdocument_fts_delete AFTER DELETE ON api_searchdocument BEGIN
+            INSERT INTO api_searchdocument_fts (api_searchdocument_fts, rowid, title_terms, body_terms)
+            VALUES ('delete', old.id, old.title_terms, old.body_terms);
+        END
+        """,
+        """
+        CREATE TRIGGER api_searchdocument_fts_update AFTER UPDATE ON api_searchdocument BEGIN
+            INSERT INTO api_searchdocument_fts (api_searchdocument_fts, rowid, title_terms, body_terms)
+            VALUES ('delete', old.id, old.title_terms, old.body_terms);
+            INSERT INTO api_searchdocument_fts (rowid, title_terms, body_terms)
+            VALUES (new.id, new.title_terms, new.body_terms);
+        END
+        """,
+    ],
+}
+
+DROP_INDEX_SQL = {
+    'postgresql': ['ALTER TABLE api_searchdocument DROP COLUMN search_vector'],
+    'sqlite': [
+        'DROP TRIGGER api_searchdocument_fts_insert',
+        'DROP TRIGGER api_searchdocument_fts_delete',
+        'DROP TRIGGER api_searchdocument_fts_update',
+        'DROP TABLE api_searchdocument_fts',
+    ],
+}
+
+
+def create_search_index(apps, schema_editor):
+    for statement in INDEX_SQL.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    for statement in DROP_INDEX_SQL.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(statement)
+
+
+# A copy of the tokenizer in api/search.py as it was when this migration was
+# written, so later changes there cannot change what it does
+TOKEN = re.compile(r'(?:[^\W_]|[̀-ͯঁ-ঃ়া-্ৗৢৣ])+')
+JOINERS = dict.fromkeys(map(ord, '‌‍'))
+MAX_TOKEN_LENGTH = 64
+
+
+def terms(text):
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFC', text.translate(JOINERS)).casefold()
+    return ' '.join(token[:MAX_TOKEN_LENGTH] for token in TOKEN.findall(text))
+
+
+def _first(row, paths):
+    return next((row[path] for path in paths if row[path] is not None), None)
+
+
+QUIZ_COURSE = ('quiz__topic__chapter__course_id', 'quiz__chapter__course_id', 'quiz__course_id')
+GAME_COURSE = ('game__topic__chapter__course_id', 'game__chapter__course_id', 'game__course_id')
+
+# kind: (model name, columns, row -> (course id, title, title text, body text))
+SOURCES = {
+    'course': ('Course', ('title', 'description'),
+               lambda row: (row['id'], row['title'], row['title'], row['description'])),
+    'topic': ('Topic', ('title', 'article_text', 'chapter__course_id'),
+              lambda row: (row['chapter__course_id'], row['title'], row['title'], row['article_text'])),
+    'question': ('Question', ('text',) + QUIZ_COURSE,
+                 lambda row: (_first(row, QUIZ_COURSE), row['text'], row['text'], '')),
+    'pair': ('MatchingPair', ('item_a', 'item_b') + GAME_COURSE,
+             lambda row: (_first(row, GAME_COURSE), f"{row['item_a']} - {row['item_b']}",
+                          f"{row['item_a']} {row['item_b']}", '')),
+}
+
+
+def index_existing_content(apps, schema_editor):
+    SearchDocument = apps.get_model('api', 'SearchDocument')
+    for kind, (model_name, columns, build) in SOURCES.items():
+        batch = []
+        rows = apps.get_model('api', model_name).objects.values('id', *columns).iterator(chunk_size=2000)
+        for row in rows:
+            course_id, title, title_text, body_text = build(row)
+            batch.append(SearchDocument(
+                kind=kind, object_id=row['id'], course_id=course_id, title=title[:255],
+                title_terms=terms(title_text), body_terms=terms(body_text),
+            ))
+            if len(batch) == 1000:
+                SearchDocument.objects.bulk_create(batch)
+                batch = []
+        SearchDocument.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_rendered_articles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('course', 'Course'), ('topic', 'Topic'), ('question', 'Question'), ('pair', 'Matching pair')], max_length=16)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('title_terms', models.TextField(blank=True, default='')),
+                ('body_terms', models.TextField(blank=True, default='')),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.course')),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(index_existing_content, migrations.RunPython.noop),
+    ]
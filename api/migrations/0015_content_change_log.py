@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_search_documents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='change_floor',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ContentChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=16)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('course', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.course')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['course', 'id'], name='api_content_course__63c02d_idx')],
+            },
+        ),
+    ]
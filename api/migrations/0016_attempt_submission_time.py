@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:13
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_content_change_log'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gameattempt',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='quizattempt',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
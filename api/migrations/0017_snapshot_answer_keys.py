@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_attempt_submission_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursesnapshot',
+            name='answer_keys',
+            field=models.JSONField(default=dict),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def resync_published_courses(apps, schema_editor):
+    # The log of a course published so far also holds its draft edits, and
+    # there are no published rows to serve yet: its clients start over
+    Course = apps.get_model('api', 'Course')
+    ContentChange = apps.get_model('api', 'ContentChange')
+    for course_id in Course.objects.filter(published_version__isnull=False).values_list('id', flat=True):
+        latest = ContentChange.objects.filter(course_id=course_id).aggregate(latest=Max('id'))['latest']
+        if latest:
+            Course.objects.filter(pk=course_id, change_floor__lt=latest).update(change_floor=latest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_snapshot_answer_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PublishedRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=16)),
+                ('object_id', models.BigIntegerField()),
+                ('data', models.JSONField()),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.course')),
+            ],
+            options={
+                'unique_together': {('course', 'kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(resync_published_courses, migrations.RunPython.noop),
+    ]
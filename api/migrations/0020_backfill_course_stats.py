@@ -0,0 +1,54 @@
+from collections import defaultdict
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def rebuild_course_stats(apps, schema_editor):
+    # What `manage.py rebuild_course_stats` does, against the migration
+    # state: fills UserCourseStats for progress and attempts written before
+    # it was maintained, and recomputes the quiz columns as the sum/count of
+    # each attempted quiz's latest score (api/stats.py)
+    UserCourseStats = apps.get_model('api', 'UserCourseStats')
+    UserProgress = apps.get_model('api', 'UserProgress')
+    QuizScoreSummary = apps.get_model('api', 'QuizScoreSummary')
+    rows = defaultdict(lambda: {'completed_topics': 0, 'quiz_score_sum': 0.0, 'quiz_attempt_count': 0})
+
+    completed = (
+        UserProgress.objects.filter(completed=True)
+        .values('user_id', 'topic__chapter__course_id')
+        .annotate(n=Count('id'))
+    )
+    for row in completed.iterator():
+        rows[(row['user_id'], row['topic__chapter__course_id'])]['completed_topics'] = row['n']
+
+    for course_path in ('quiz__topic__chapter__course_id', 'quiz__chapter__course_id', 'quiz__course_id'):
+        summaries = (
+            QuizScoreSummary.objects.filter(**{f'{course_path}__isnull': False})
+            .values('user_id', course_path)
+            .annotate(total=Sum('latest_score'), n=Count('id'))
+        )
+        for row in summaries.iterator():
+            entry = rows[(row['user_id'], row[course_path])]
+            entry['quiz_score_sum'] += row['total']
+            entry['quiz_attempt_count'] += row['n']
+
+    UserCourseStats.objects.all().delete()
+    UserCourseStats.objects.bulk_create(
+        (
+            UserCourseStats(user_id=user_id, course_id=course_id, **values)
+            for (user_id, course_id), values in rows.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_applied_sync_events'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_course_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+import re
+
+from django.db import migrations
+from django.db.models import F
+from django.utils import timezone
+
+
+# Rendered markup quotes every attribute value with html.escape(), so a style
+# attribute is exactly ` style="..."` with no '"' inside
+ESCAPED_STYLE = re.compile(r' style="[^"]*\\[^"]*"')
+
+
+def strip_escaped_styles(apps, schema_editor):
+    # Articles rendered before api/articles.py refused CSS escapes in style
+    # attributes (\75rl( spells url()
+    Topic = apps.get_model('api', 'Topic')
+    Course = apps.get_model('api', 'Course')
+    changed, course_ids = [], set()
+    topics = Topic.objects.filter(article_html__contains=' style="').select_related('chapter')
+    for topic in topics.only('id', 'article_html', 'chapter__course_id').iterator(chunk_size=500):
+        html = ESCAPED_STYLE.sub('', topic.article_html)
+        if html != topic.article_html:
+            topic.article_html = html
+            changed.append(topic)
+            course_ids.add(topic.chapter.course_id)
+    Topic.objects.bulk_update(changed, ['article_html'], batch_size=500)
+    # New versions, so cached trees and ETags from before are not served again
+    Course.objects.filter(pk__in=course_ids).update(
+        content_version=F('content_version') + 1, content_updated_at=timezone.now(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_backfill_course_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(strip_escaped_styles, migrations.RunPython.noop),
+    ]
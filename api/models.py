@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from ckeditor.fields import RichTextField # <-- নতুন ইমপোর্ট
 
 # Create your models here.
@@ -7,6 +8,28 @@ from ckeditor.fields import RichTextField # <-- নতুন ইমপোর্
 class Course(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
+    # Bumped by api/signals.py whenever anything in the course tree changes
+    content_version = models.PositiveIntegerField(default=1, editable=False)
+    content_updated_at = models.DateTimeField(default=timezone.now, editable=False)
+    # The CourseSnapshot served by the detail endpoint (api/snapshots.py);
+    # None serves the live tree. Set only by publishing, never by edits.
+    published_version = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    published_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Oldest change-log cursor still served (api/changelog.py); older
+    # clients must download the whole tree again
+    change_floor = models.BigIntegerField(default=0, editable=False)
+
+    # Only ever changed with UPDATEs (api/signals.py, api/snapshots.py,
+    # api/changelog.py); a stale instance must not write its copy back
+    MANAGED_FIELDS = ('content_version', 'content_updated_at', 'published_version', 'published_at', 'change_floor')
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+            kwargs['update_fields'] = [name for name in update_fields if name not in self.MANAGED_FIELDS]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -28,6 +51,11 @@ class Topic(models.Model):
     video_url = models.URLField(blank=True, null=True)
 
     article_content = RichTextField(blank=True, null=True)
+    # Rendered from article_content on every save (api/articles.py)
+    article_html = models.TextField(blank=True, null=True, editable=False)
+    article_text = models.TextField(blank=True, default='', editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_minutes = models.PositiveIntegerField(default=0, editable=False)
     order = models.IntegerField()
     class Meta:
         ordering = ['order']
@@ -64,6 +92,16 @@ class Quiz(models.Model):
             return f"Final Quiz for Course: {self.course.title}"
         return self.title
 
+    def get_course_id(self):
+        # The course this quiz belongs to (via its topic, chapter or directly)
+        if self.course_id:
+            return self.course_id
+        if self.chapter_id:
+            return self.chapter.course_id
+        if self.topic_id:
+            return self.topic.chapter.course_id
+        return None
+
 
 
 
@@ -108,7 +146,11 @@ class QuizAttempt(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE)
     score = models.FloatField() # কুইজের স্কোর (শতাংশ) সেভ করার জন্য
-    timestamp = models.DateTimeField(auto_now_add=True) # কখন কুইজ দিয়েছে
+    timestamp = models.DateTimeField(default=timezone.now, editable=False) # কখন কুইজ দিয়েছে (write-behind sets the submission time)
+
+    class Meta:
+        # Append-only log: every submission is a new row (see api/attempts.py)
+        indexes = [models.Index(fields=['user', 'quiz', 'timestamp'])]
 
     def __str__(self):
         return f"{self.user.username}'s attempt on {self.quiz.title} - Score: {self.score}%"    
@@ -141,6 +183,16 @@ class MatchingGame(models.Model):
             return f"Final Game for Course: {self.course.title}"
         return self.title
 
+    def get_course_id(self):
+        # The course this game belongs to (via its topic, chapter or directly)
+        if self.course_id:
+            return self.course_id
+        if self.chapter_id:
+            return self.chapter.course_id
+        if self.topic_id:
+            return self.topic.chapter.course_id
+        return None
+
 
 
 
@@ -161,7 +213,11 @@ class GameAttempt(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     game = models.ForeignKey(MatchingGame, on_delete=models.CASCADE)
     score = models.FloatField() # গেমের স্কোর (সাধারণত ১০০%)
-    timestamp = models.DateTimeField(auto_now_add=True) # কখন গেম খেলেছে
+    timestamp = models.DateTimeField(default=timezone.now, editable=False) # কখন গেম খেলেছে (write-behind sets the submission time)
+
+    class Meta:
+        # Append-only log: every submission is a new row (see api/attempts.py)
+        indexes = [models.Index(fields=['user', 'game', 'timestamp'])]
 
     def __str__(self):
         return f"{self.user.username}'s attempt on {self.game.title} - Score: {self.score}%"
@@ -174,3 +230,246 @@ class GameAttempt(models.Model):
 
 
 
+
+
+# --- Denormalized per-user, per-course rollup used by the dashboard ---
+# Kept up to date by api/stats.py whenever progress or quiz attempts are written;
+# `manage.py rebuild_course_stats` recomputes it from the source rows. The quiz
+# fields cover each attempted quiz's latest score, not every attempt.
+class UserCourseStats(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='course_stats')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='user_stats')
+    completed_topics = models.PositiveIntegerField(default=0)
+    quiz_score_sum = models.FloatField(default=0)
+    quiz_attempt_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'course')
+
+    @property
+    def average_quiz_score(self):
+        if not self.quiz_attempt_count:
+            return None
+        return self.quiz_score_sum / self.quiz_attempt_count
+
+    def __str__(self):
+        return f"{self.user.username}'s stats for {self.course.title}"
+
+
+# --- Best/latest score per user and quiz/game ---
+# Maintained with INSERT ... ON CONFLICT upserts next to the append-only
+# attempt logs (api/attempts.py).
+class QuizScoreSummary(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='score_summaries')
+    best_score = models.FloatField()
+    latest_score = models.FloatField()
+    attempt_count = models.PositiveIntegerField(default=1)
+    latest_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'quiz')
+
+    def __str__(self):
+        return f"{self.user.username} on {self.quiz.title} - Best: {self.best_score}%"
+
+
+class GameScoreSummary(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    game = models.ForeignKey(MatchingGame, on_delete=models.CASCADE, related_name='score_summaries')
+    best_score = models.FloatField()
+    latest_score = models.FloatField()
+    attempt_count = models.PositiveIntegerField(default=1)
+    latest_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'game')
+
+    def __str__(self):
+        return f"{self.user.username} on {self.game.title} - Best: {self.best_score}%"
+
+
+# --- Per-course leaderboards ---
+# A learner's points in a course are the sum of their best quiz and game
+# scores there, each rounded to a whole percent. Both tables are maintained
+# by api/leaderboards.py when a best score improves;
+# `manage.py rebuild_leaderboards` recomputes them from the score summaries.
+class LeaderboardEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    points = models.PositiveIntegerField(default=0)
+    # Earlier arrivals win ties in the top-N listing
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('user', 'course')
+        indexes = [models.Index(fields=['course', '-points', 'updated_at'])]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.points} points in {self.course.title}"
+
+
+class LeaderboardScoreCount(models.Model):
+    """
+    How many learners of a course have exactly `points` points. A rank is
+    1 + the learners counted above one's own points, read from this table
+    instead of counting LeaderboardEntry rows.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='leaderboard_counts')
+    points = models.PositiveIntegerField()
+    learners = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('course', 'points')
+
+    def __str__(self):
+        return f"{self.course.title}: {self.learners} learners at {self.points} points"
+
+
+class CourseSnapshot(models.Model):
+    """
+    A published course tree rendered once to JSON bytes, plus optional
+    precompressed copies. Rows are never changed after they are written;
+    publishing again adds the next version.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='snapshots')
+    version = models.PositiveIntegerField()
+    # Course.content_version and COURSE_TREE_FORMAT the bytes were rendered from
+    content_version = models.PositiveIntegerField()
+    tree_format = models.PositiveIntegerField()
+    body = models.BinaryField()
+    body_gzip = models.BinaryField(null=True, blank=True)
+    body_br = models.BinaryField(null=True, blank=True)
+    sha256 = models.CharField(max_length=64)
+    # {quiz id: {question id: [correct answer ids]}} as published; learners
+    # who see this snapshot are graded against it (api/grading.py)
+    answer_keys = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ('course', 'version')
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Course snapshots are immutable; publish the course again instead.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.course.title} v{self.version}"
+
+
+class OptimizedImage(models.Model):
+    """
+    Resized, re-encoded copies of one uploaded image (api/images.py), keyed
+    by the SHA-256 of the original bytes so identical uploads share them.
+    `variants` lists {'width', 'height', 'format', 'name', 'size'} dicts;
+    names are storage paths under MEDIA_ROOT.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    original_size = models.PositiveIntegerField()
+    variants = models.JSONField(default=list)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.width}x{self.height}, {len(self.variants)} variants)"
+
+
+class ImageUpload(models.Model):
+    """
+    An uploaded file (storage name, e.g. 'uploads/2026/10/18/photo.jpg') and
+    the OptimizedImage its content maps to.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    image = models.ForeignKey(OptimizedImage, on_delete=models.CASCADE, related_name='uploads')
+
+    def __str__(self):
+        return self.name
+
+
+class SearchDocument(models.Model):
+    """
+    One searchable course, topic, question or matching pair (api/search.py).
+    The *_terms columns hold the normalized tokens the full-text index is
+    built from: a generated tsvector column with a GIN index on PostgreSQL,
+    an FTS5 table kept in sync by triggers on SQLite (migration 0014).
+    """
+    KIND_CHOICES = [
+        ('course', 'Course'),
+        ('topic', 'Topic'),
+        ('question', 'Question'),
+        ('pair', 'Matching pair'),
+    ]
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    # Null for quizzes and games not attached to any course
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    title = models.CharField(max_length=255)
+    title_terms = models.TextField(blank=True, default='')
+    body_terms = models.TextField(blank=True, default='')
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.title}"
+
+
+class ContentChange(models.Model):
+    """
+    One entry of a course's content change log (api/changelog.py): a row of
+    `kind` was saved, or deleted when `deleted` is set. The id is the
+    cursor clients sync from. `course` is not a database constraint, so
+    deletes can still be logged while the course itself is being deleted.
+    """
+    course = models.ForeignKey(
+        Course, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+',
+    )
+    kind = models.CharField(max_length=16)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['course', 'id'])]
+
+    def __str__(self):
+        action = 'deleted' if self.deleted else 'saved'
+        return f"#{self.id} {self.kind} {self.object_id} {action}"
+
+
+class AppliedSyncEvent(models.Model):
+    """
+    An offline event (api/sync.py) applied under the id its client gave
+    it, with the result sent back, so a retried upload is not applied
+    twice.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    event_id = models.CharField(max_length=64)
+    result = models.JSONField()
+    applied_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'event_id')
+
+    def __str__(self):
+        return f"{self.user_id}:{self.event_id}"
+
+
+class PublishedRow(models.Model):
+    """
+    The flat form (api/changelog.py) of one row of a published course as it
+    was last published. The change log serves these instead of the live
+    rows, which may hold unpublished draft edits.
+    """
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    kind = models.CharField(max_length=16)
+    object_id = models.BigIntegerField()
+    data = models.JSONField()
+
+    class Meta:
+        unique_together = ('course', 'kind', 'object_id')
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} of course {self.course_id}"
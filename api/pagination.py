@@ -0,0 +1,58 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+# --- Keyset (cursor) pagination ---
+# Pages are fetched with `WHERE key > last_seen ORDER BY key LIMIT n`, so deep
+# pages cost the same as the first one, unlike offset pagination.
+class IdCursorPagination(CursorPagination):
+    ordering = 'id'
+    page_size = getattr(settings, 'API_PAGE_SIZE', 20)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 100)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() for async views: the page is read with async
+        iteration; cursors and links are the same as the sync version's.
+        `request` must be a DRF Request (for query_params).
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        queryset = queryset.order_by(*(_reverse_ordering(self.ordering) if reverse else self.ordering))
+        if current_position is not None:
+            order = self.ordering[0]
+            lookup = 'lt' if self.cursor.reverse != order.startswith('-') else 'gt'
+            queryset = queryset.filter(**{f"{order.lstrip('-')}__{lookup}": current_position})
+
+        results = [obj async for obj in queryset[offset:offset + self.page_size + 1]]
+        self.page = results[:self.page_size]
+        has_following = len(results) > len(self.page)
+        following_position = self._get_position_from_instance(results[-1], self.ordering) if has_following else None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position
+            self.previous_position = current_position
+        return self.page
+
+    def get_paginated_data(self, data):
+        # The body of get_paginated_response(), for views that build their own response
+        return {'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data}
+
+
+class TimestampCursorPagination(IdCursorPagination):
+    # Newest first; id breaks ties between rows written in the same instant
+    ordering = ('-timestamp', '-id')
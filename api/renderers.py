@@ -0,0 +1,78 @@
+import codecs
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # optional: without it both classes behave like DRF's
+    orjson = None
+
+
+# --- orjson-backed JSON renderer/parser ---
+# Drop-in replacements for DRF's JSONRenderer/JSONParser (the project
+# defaults in settings.REST_FRAMEWORK). orjson serializes dicts, lists,
+# strings, numbers, datetimes and UUIDs natively; everything else (Decimal,
+# lazy translation strings, timedelta, querysets, ...) goes through DRF's own
+# JSONEncoder.default(), so the output matches the stdlib renderer. Requests
+# orjson cannot honour (indent other than 2, ASCII-only output, integers past
+# 64 bits) fall back to the stdlib path.
+_default = encoders.JSONEncoder().default
+
+# U+2028/U+2029 are escaped, as DRF does, so the output stays a JavaScript subset
+_LINE_SEPARATORS = ('\u2028'.encode(), '\u2029'.encode())
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed.
+    NaN and infinities render as null rather than raising (STRICT_JSON).
+    """
+    options = (orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        options = self.options
+        if indent == 2:
+            options |= orjson.OPT_INDENT_2
+        elif indent is not None or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_default, option=options)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits; the stdlib handles or reports them
+            return super().render(data, accepted_media_type, renderer_context)
+        if _LINE_SEPARATORS[0] in ret or _LINE_SEPARATORS[1] in ret:
+            ret = ret.replace(_LINE_SEPARATORS[0], b'\\u2028').replace(_LINE_SEPARATORS[1], b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser that decodes with orjson when it is installed. orjson rejects
+    NaN/Infinity like STRICT_JSON does; bodies it refuses are re-parsed by
+    the stdlib, which accepts what it can and reports the error otherwise.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        raw = stream.read()
+        try:
+            body = raw if codecs.lookup(encoding).name == 'utf-8' else raw.decode(encoding)
+            return orjson.loads(body)
+        except (orjson.JSONDecodeError, UnicodeDecodeError):
+            pass
+        return super().parse(io.BytesIO(raw), media_type, parser_context)
@@ -0,0 +1,218 @@
+import contextvars
+import hashlib
+import logging
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+
+# --- Read replicas ---
+# With DATABASE_REPLICAS['ALIASES'] set, reads of the api app's models
+# (course content, progress, stats, leaderboards) made while serving a
+# request go to a replica whose lag is under MAX_LAG; everything else reads
+# from the primary:
+#   - writes, and reads inside a transaction on the primary
+#   - reads later in a request that has written (read-your-writes)
+#   - every request from the same client for STICKY_SECONDS after a write,
+#     so a learner's next page shows the progress they just made
+#   - reads outside a request (management commands, the write-behind flusher)
+# Replicas that are down or lag behind are skipped; with none left, reads
+# fall back to the primary. The pins live in the default cache, which has to
+# be shared by every worker (CACHES in backend/settings.py): with a
+# per-process one a worker that did not take the write would read stale
+# rows, so ReplicaPinningMiddleware refuses to start.
+DEFAULTS = {
+    'ALIASES': (),
+    'APPS': ('api',),
+    'MAX_LAG': 5.0,          # seconds a replica may trail the primary
+    'CHECK_INTERVAL': 5.0,   # seconds between lag checks per replica and worker
+    'STICKY_SECONDS': 10,    # primary-only window after a client's write
+}
+
+
+def replica_config():
+    return {**DEFAULTS, **getattr(settings, 'DATABASE_REPLICAS', {})}
+
+
+# Backends whose entries only the process that wrote them sees
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared_cache(alias=DEFAULT_CACHE_ALIAS):
+    return settings.CACHES.get(alias, {}).get('BACKEND') not in PER_PROCESS_CACHES
+
+
+class RequestState:
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+_request_state = contextvars.ContextVar('replica_request_state', default=None)
+
+
+# --- Replica health ---
+_health = {}  # alias -> (checked at, healthy)
+_health_lock = threading.Lock()
+
+
+def replica_lag(alias):
+    """
+    Seconds `alias` trails its primary. Backends without replication
+    (SQLite) report 0.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        # Caught up when everything received has been replayed; otherwise the
+        # age of the last replayed transaction
+        cursor.execute(
+            "SELECT CASE WHEN NOT pg_is_in_recovery() "
+            "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+        )
+        return float(cursor.fetchone()[0])
+
+
+def is_healthy(alias, config):
+    now = time.monotonic()
+    checked = _health.get(alias)
+    if checked is not None and now - checked[0] < config['CHECK_INTERVAL']:
+        return checked[1]
+    try:
+        healthy = replica_lag(alias) <= config['MAX_LAG']
+    except Exception:
+        logger.warning("Replica %s is unavailable; reading from the primary", alias, exc_info=True)
+        healthy = False
+    with _health_lock:
+        _health[alias] = (now, healthy)
+    return healthy
+
+
+def reset_health():
+    with _health_lock:
+        _health.clear()
+
+
+# --- Router ---
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        config = replica_config()
+        if not config['ALIASES'] or model._meta.app_label not in config['APPS']:
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related lookups follow the object they start from
+            return instance._state.db
+        state = _request_state.get()
+        if state is None or state.pinned or state.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        healthy = [alias for alias in config['ALIASES'] if is_healthy(alias, config)]
+        return random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the primary's rows, so objects from either may mix
+        databases = {DEFAULT_DB_ALIAS, *replica_config()['ALIASES']}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db in replica_config()['ALIASES']:
+            return False
+        return None
+
+
+def pin_to_primary():
+    """
+    Sends the rest of the current request's reads to the primary, e.g.
+    after a row the client expects was missing on the replica.
+    """
+    state = _request_state.get()
+    if state is None or state.pinned:
+        return False
+    state.pinned = True
+    return bool(replica_config()['ALIASES'])
+
+
+# --- Per-request stickiness ---
+def _pin_key(request):
+    # Clients are told apart by their credentials; anonymous ones never write
+    credential = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credential:
+        return None
+    return 'db-pin:' + hashlib.sha1(credential.encode()).hexdigest()
+
+
+class ReplicaPinningMiddleware:
+    """
+    Gives each request the RequestState the router reads. A request that
+    wrote pins its client to the primary for STICKY_SECONDS (in the shared
+    cache, so every worker honours it).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if replica_config()['ALIASES'] and not is_shared_cache():
+            raise ImproperlyConfigured(
+                "DATABASE_REPLICAS needs a default cache shared by every worker "
+                "(e.g. set DJANGO_REDIS_URL), not a per-process one."
+            )
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        config = replica_config()
+        if not config['ALIASES']:
+            return self.get_response(request)
+        key = _pin_key(request)
+        state = RequestState(pinned=bool(key and cache.get(key)))
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state.wrote and key:
+            cache.set(key, 1, config['STICKY_SECONDS'])
+        return response
+
+    async def __acall__(self, request):
+        config = replica_config()
+        if not config['ALIASES']:
+            return await self.get_response(request)
+        key = _pin_key(request)
+        state = RequestState(pinned=bool(key and await cache.aget(key)))
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        if state.wrote and key:
+            await cache.aset(key, 1, config['STICKY_SECONDS'])
+        return response
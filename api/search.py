@@ -0,0 +1,239 @@
+import re
+import unicodedata
+from itertools import islice
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Q
+
+from .models import SearchDocument
+
+
+# --- Full-text search ---
+# Courses, topics (title + the plain article text from api/articles.py),
+# quiz questions and matching pairs each get a SearchDocument row, upserted
+# from signals when they change (api/signals.py). The full-text index over
+# it lives in the database: a generated tsvector column with a GIN index on
+# PostgreSQL, an FTS5 table fed by triggers on SQLite (migration 0014).
+#
+# Neither database's own word splitter keeps Bengali words whole (vowel
+# signs and the virama are not "letters" to them), so text is tokenized here
+# and stored as space-separated terms; PostgreSQL indexes them verbatim via
+# array_to_tsvector() and FTS5 through its `ascii` tokenizer, which leaves
+# non-ASCII characters alone. Queries are tokenized the same way, every term
+# must match, and terms of MIN_PREFIX characters or more also match as
+# prefixes. Titles weigh more than bodies in the ranking.
+DEFAULTS = {
+    'MAX_TERMS': 8,         # further query terms are ignored
+    'MIN_PREFIX': 3,        # shorter terms only match whole words (a 2-letter
+                            # prefix matches most of the index)
+    'TITLE_WEIGHT': 10.0,
+    'BODY_WEIGHT': 1.0,
+}
+
+
+def search_config():
+    return {**DEFAULTS, **getattr(settings, 'FULL_TEXT_SEARCH', {})}
+
+
+# --- Tokenizing ---
+# Letters and digits plus the combining marks words are spelled with, which
+# str.isalnum() (and so \w) rejects: Bengali vowel signs, candrabindu,
+# anusvara, visarga, nukta, virama, and Latin diacritics
+TOKEN = re.compile(r'(?:[^\W_]|[̀-ͯঁ-ঃ়া-্ৗৢৣ])+')
+# ZWNJ/ZWJ only change how conjuncts are drawn
+JOINERS = dict.fromkeys(map(ord, '‌‍'))
+MAX_TOKEN_LENGTH = 64
+
+
+def tokenize(text):
+    if not text:
+        return []
+    text = unicodedata.normalize('NFC', text.translate(JOINERS)).casefold()
+    return [token[:MAX_TOKEN_LENGTH] for token in TOKEN.findall(text)]
+
+
+def terms(text):
+    return ' '.join(tokenize(text))
+
+
+# --- Documents ---
+QUIZ_COURSE = ('quiz__topic__chapter__course_id', 'quiz__chapter__course_id', 'quiz__course_id')
+GAME_COURSE = ('game__topic__chapter__course_id', 'game__chapter__course_id', 'game__course_id')
+
+
+def _first(row, paths):
+    return next((row[path] for path in paths if row[path] is not None), None)
+
+
+# kind: (model name, columns, row -> (course id, title, title text, body text))
+SOURCES = {
+    'course': ('Course', ('title', 'description'),
+               lambda row: (row['id'], row['title'], row['title'], row['description'])),
+    'topic': ('Topic', ('title', 'article_text', 'chapter__course_id'),
+              lambda row: (row['chapter__course_id'], row['title'], row['title'], row['article_text'])),
+    'question': ('Question', ('text',) + QUIZ_COURSE,
+                 lambda row: (_first(row, QUIZ_COURSE), row['text'], row['text'], '')),
+    'pair': ('MatchingPair', ('item_a', 'item_b') + GAME_COURSE,
+             lambda row: (_first(row, GAME_COURSE), f"{row['item_a']} - {row['item_b']}",
+                          f"{row['item_a']} {row['item_b']}", '')),
+}
+KIND_FOR_MODEL = {model_name: kind for kind, (model_name, _, _) in SOURCES.items()}
+
+# The documents below a container whose course can change
+CONTENTS = {
+    'Chapter': (
+        ('topic', lambda pk: Q(chapter_id=pk)),
+        ('question', lambda pk: Q(quiz__chapter_id=pk) | Q(quiz__topic__chapter_id=pk)),
+        ('pair', lambda pk: Q(game__chapter_id=pk) | Q(game__topic__chapter_id=pk)),
+    ),
+    'Topic': (
+        ('question', lambda pk: Q(quiz__topic_id=pk)),
+        ('pair', lambda pk: Q(game__topic_id=pk)),
+    ),
+    'Quiz': (('question', lambda pk: Q(quiz_id=pk)),),
+    'MatchingGame': (('pair', lambda pk: Q(game_id=pk)),),
+}
+
+
+def documents(kind, queryset):
+    """
+    Unsaved SearchDocuments for the rows of `queryset` (of the model behind
+    `kind`).
+    """
+    _, columns, build = SOURCES[kind]
+    for row in queryset.values('id', *columns).iterator(chunk_size=2000):
+        course_id, title, title_text, body_text = build(row)
+        yield SearchDocument(
+            kind=kind, object_id=row['id'], course_id=course_id, title=title[:255],
+            title_terms=terms(title_text), body_terms=terms(body_text),
+        )
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _upsert(batch):
+    SearchDocument.objects.bulk_create(
+        batch, update_conflicts=True, unique_fields=['kind', 'object_id'],
+        update_fields=['course', 'title', 'title_terms', 'body_terms'],
+    )
+
+
+def index_object(kind, pk):
+    """
+    Upserts the document of one row, or drops it if the row is gone.
+    """
+    model = django_apps.get_model('api', SOURCES[kind][0])
+    batch = list(documents(kind, model._default_manager.filter(pk=pk)))
+    if batch:
+        _upsert(batch)
+    else:
+        remove_object(kind, pk)
+
+
+def remove_object(kind, pk):
+    SearchDocument.objects.filter(kind=kind, object_id=pk).delete()
+
+
+def reindex_contents(model_name, pk, batch_size=1000):
+    """
+    Re-indexes the documents below a chapter, topic, quiz or game, after it
+    moved to another course.
+    """
+    for kind, condition in CONTENTS.get(model_name, ()):
+        model = django_apps.get_model('api', SOURCES[kind][0])
+        for batch in _batches(documents(kind, model._default_manager.filter(condition(pk))), batch_size):
+            _upsert(batch)
+
+
+def rebuild_search_index(batch_size=1000):
+    """
+    Replaces every SearchDocument with ones built from the content tables
+    (for rows written with bulk_create()/update(), which send no signals).
+    Returns the number of documents written.
+    """
+    written = 0
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        for kind, (model_name, _, _) in SOURCES.items():
+            queryset = django_apps.get_model('api', model_name)._default_manager.all()
+            for batch in _batches(documents(kind, queryset), batch_size):
+                SearchDocument.objects.bulk_create(batch)
+                written += len(batch)
+    return written
+
+
+# --- Queries ---
+class SearchUnavailable(Exception):
+    pass
+
+
+def _query_terms(query, config):
+    tokens = list(dict.fromkeys(tokenize(query)))[:config['MAX_TERMS']]
+    return [(token, len(token) >= config['MIN_PREFIX']) for token in tokens]
+
+
+def _postgres_sql(query_terms, config, filters):
+    # Quoted tsquery lexemes are taken as they are, without re-parsing
+    tsquery = ' & '.join(f"'{token}'" + (':*' if prefix else '') for token, prefix in query_terms)
+    # ts_rank weights are {D, C, B, A}; titles are A, bodies B
+    weights = [0.0, 0.0, config['BODY_WEIGHT'] / config['TITLE_WEIGHT'], 1.0]
+    sql = (
+        'SELECT d.kind, d.object_id, d.course_id, d.title, ts_rank(%s::float4[], d.search_vector, q.query) AS score '
+        'FROM api_searchdocument d, (SELECT %s::tsquery AS query) q '
+        f'WHERE d.search_vector @@ q.query{filters} '
+    )
+    return sql, [weights, tsquery]
+
+
+def _sqlite_sql(query_terms, config, filters):
+    match = ' '.join(f'"{token}"' + ('*' if prefix else '') for token, prefix in query_terms)
+    sql = (
+        'SELECT d.kind, d.object_id, d.course_id, d.title, '
+        '-bm25(api_searchdocument_fts, %s, %s) AS score '
+        'FROM api_searchdocument_fts JOIN api_searchdocument d ON d.id = api_searchdocument_fts.rowid '
+        f'WHERE api_searchdocument_fts MATCH %s{filters} '
+    )
+    return sql, [config['TITLE_WEIGHT'], config['BODY_WEIGHT'], match]
+
+
+QUERY_BUILDERS = {'postgresql': _postgres_sql, 'sqlite': _sqlite_sql}
+
+
+def search(query, kinds=None, course_id=None, limit=20, offset=0, config=None):
+    """
+    The documents matching every term of `query`, best first, as dicts with
+    type, id, course_id, title and score. `kinds` narrows the document types,
+    `course_id` the course. Raises SearchUnavailable on databases without a
+    full-text index (migration 0014).
+    """
+    config = config or search_config()
+    query_terms = _query_terms(query, config)
+    if not query_terms:
+        return []
+    connection = connections[router.db_for_read(SearchDocument)]
+    builder = QUERY_BUILDERS.get(connection.vendor)
+    if builder is None:
+        raise SearchUnavailable(f"Full-text search is not available on {connection.vendor}.")
+
+    filters, filter_params = '', []
+    if kinds:
+        filters += ' AND d.kind IN (' + ', '.join(['%s'] * len(kinds)) + ')'
+        filter_params.extend(kinds)
+    if course_id is not None:
+        filters += ' AND d.course_id = %s'
+        filter_params.append(course_id)
+    sql, params = builder(query_terms, config, filters)
+    sql += 'ORDER BY score DESC, d.id LIMIT %s OFFSET %s'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + filter_params + [limit, offset])
+        rows = cursor.fetchall()
+    return [
+        {'type': kind, 'id': object_id, 'course_id': course, 'title': title, 'score': round(score, 6)}
+        for kind, object_id, course, title, score in rows
+    ]
@@ -6,22 +6,24 @@ from .models import (
     UserProgress, QuizAttempt,
     MatchingGame, MatchingPair, GameAttempt
 )
+from .fieldsets import SparseFieldsMixin
 
 # -------------------------
 # কুইজ সিস্টেমের সিরিয়ালাইজার
 # -------------------------
-class AnswerSerializer(serializers.ModelSerializer):
+class AnswerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Answer
-        fields = ['id', 'text', 'is_correct']
+        # is_correct stays on the server; submissions are graded in api/grading.py
+        fields = ['id', 'text']
 
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     answers = AnswerSerializer(many=True, read_only=True)
     class Meta:
         model = Question
         fields = ['id', 'text', 'answers']
 
-class QuizSerializer(serializers.ModelSerializer):
+class QuizSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     questions = QuestionSerializer(many=True, read_only=True)
     class Meta:
         model = Quiz
@@ -30,12 +32,12 @@ class QuizSerializer(serializers.ModelSerializer):
 # -------------------------
 # ম্যাচিং গেমের সিরিয়ালাইজার
 # -------------------------
-class MatchingPairSerializer(serializers.ModelSerializer):
+class MatchingPairSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = MatchingPair
         fields = ['id', 'item_a', 'item_b']
 
-class MatchingGameSerializer(serializers.ModelSerializer):
+class MatchingGameSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     pairs = MatchingPairSerializer(many=True, read_only=True)
     
     class Meta:
@@ -45,18 +47,20 @@ class MatchingGameSerializer(serializers.ModelSerializer):
 # -------------------------
 # মূল কনটেন্ট সিরিয়ালাইজার (আপডেটেড)
 # -------------------------
-class TopicSerializer(serializers.ModelSerializer):
+class TopicSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     topic_quiz = QuizSerializer(read_only=True)
     matching_game = MatchingGameSerializer(read_only=True)
+    # The cleaned, minified HTML rendered on save (api/articles.py)
+    article_content = serializers.CharField(source='article_html', read_only=True)
 
     class Meta:
         model = Topic
         fields = [
-            'id', 'title', 'video_url', 'article_content', 'order', 
+            'id', 'title', 'video_url', 'article_content', 'word_count', 'reading_minutes', 'order', 
             'topic_quiz', 'matching_game'
         ]
 
-class ChapterSerializer(serializers.ModelSerializer):
+class ChapterSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     topics = TopicSerializer(many=True, read_only=True)
     chapter_quiz = QuizSerializer(read_only=True)
     matching_game = MatchingGameSerializer(read_only=True)
@@ -69,7 +73,7 @@ class ChapterSerializer(serializers.ModelSerializer):
         ]
 
 # ----- এটিই সেই সমাধান -----
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     chapters = ChapterSerializer(many=True, read_only=True)
     # --- এই দুটি লাইন নতুন যোগ করা হয়েছে ---
     course_quiz = QuizSerializer(read_only=True)
@@ -83,6 +87,16 @@ class CourseSerializer(serializers.ModelSerializer):
             'course_quiz', 'matching_game'
         ]
 
+# --- Lightweight course summary for the list endpoint (no nested tree) ---
+class CourseSummarySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # annotated in CourseViewSet.get_queryset()
+    chapter_count = serializers.IntegerField(read_only=True)
+    topic_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Course
+        fields = ['id', 'title', 'description', 'chapter_count', 'topic_count']
+
 # -------------------------
 # ইউজার সম্পর্কিত সিরিয়ালাইজার
 # -------------------------
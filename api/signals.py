@@ -0,0 +1,199 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.utils import timezone
+
+from .articles import apply_rendered_article
+from .attempts import deleted_attempts_pending
+from .authentication import user_cache
+from .changelog import forget_course, record_change, record_move
+from .grading import answer_key_cache
+from .images import schedule_topic
+from .leaderboards import entries_pending
+from .metrics import install_query_timer
+from .search import KIND_FOR_MODEL, index_object, reindex_contents, remove_object
+from .stats import course_stats_pending
+from .models import (
+    Course, Chapter, Topic,
+    Quiz, Question, Answer,
+    MatchingGame, MatchingPair,
+    UserProgress, QuizAttempt, GameAttempt, QuizScoreSummary, GameScoreSummary,
+)
+
+
+# --- Which course does a content row belong to? ---
+def _course_id_for_quiz(quiz_id):
+    quiz = Quiz.objects.select_related('topic__chapter', 'chapter').filter(pk=quiz_id).first()
+    return quiz.get_course_id() if quiz else None
+
+def _course_id_for_game(game_id):
+    game = MatchingGame.objects.select_related('topic__chapter', 'chapter').filter(pk=game_id).first()
+    return game.get_course_id() if game else None
+
+COURSE_ID_RESOLVERS = {
+    Course: lambda obj: obj.pk,
+    Chapter: lambda obj: obj.course_id,
+    Topic: lambda obj: Chapter.objects.filter(pk=obj.chapter_id).values_list('course_id', flat=True).first(),
+    Quiz: lambda obj: obj.get_course_id(),
+    Question: lambda obj: _course_id_for_quiz(obj.quiz_id),
+    Answer: lambda obj: _course_id_for_quiz(
+        Question.objects.filter(pk=obj.question_id).values_list('quiz_id', flat=True).first()
+    ),
+    MatchingGame: lambda obj: obj.get_course_id(),
+    MatchingPair: lambda obj: _course_id_for_game(obj.game_id),
+}
+
+
+def bump_course_version(*course_ids):
+    course_ids = {course_id for course_id in course_ids if course_id is not None}
+    if course_ids:
+        Course.objects.filter(pk__in=course_ids).update(
+            content_version=F('content_version') + 1,
+            content_updated_at=timezone.now(),
+        )
+
+
+# --- Content version bumps ---
+# Every save/delete in a course tree bumps that course's content_version, which
+# is part of the cache key (api/course_cache.py), so only the edited course is
+# evicted, and is logged for delta sync (api/changelog.py).
+# Queryset.update()/bulk_create() don't send signals; callers using those
+# must call bump_course_version() (and reset_change_log()) themselves.
+def _remember_previous_course(sender, instance, **kwargs):
+    # If a row is moved to another course, both courses need a new version
+    instance._previous_course_id = None
+    if sender is not Course and instance.pk is not None:
+        previous = sender._default_manager.filter(pk=instance.pk).first()
+        if previous is not None:
+            instance._previous_course_id = COURSE_ID_RESOLVERS[sender](previous)
+
+def _content_saved(sender, instance, **kwargs):
+    instance._course_id = COURSE_ID_RESOLVERS[sender](instance)
+    previous = getattr(instance, '_previous_course_id', None)
+    # One transaction: the bump locks the course row, which keeps the change
+    # log (api/changelog.py) committing in cursor order
+    with transaction.atomic():
+        bump_course_version(instance._course_id, previous)
+        record_change(sender, instance.pk, instance._course_id)
+        if previous is not None and previous != instance._course_id:
+            record_move(sender, instance.pk, previous, instance._course_id)
+
+def _content_deleted(sender, instance, **kwargs):
+    # pre_delete: during a cascade the parent rows still exist here
+    if sender is not Course:
+        course_id = COURSE_ID_RESOLVERS[sender](instance)
+        with transaction.atomic():
+            bump_course_version(course_id)
+            record_change(sender, instance.pk, course_id, deleted=True)
+
+def _course_deleted(sender, instance, **kwargs):
+    forget_course(instance.pk)
+
+for _model in COURSE_ID_RESOLVERS:
+    pre_save.connect(_remember_previous_course, sender=_model, dispatch_uid=f'course-version-pre-save-{_model.__name__}')
+    post_save.connect(_content_saved, sender=_model, dispatch_uid=f'course-version-save-{_model.__name__}')
+    pre_delete.connect(_content_deleted, sender=_model, dispatch_uid=f'course-version-delete-{_model.__name__}')
+post_delete.connect(_course_deleted, sender=Course, dispatch_uid='change-log-course-delete')
+
+
+# --- Answer-key invalidation (api/grading.py) ---
+def _answer_key_changed(sender, instance, **kwargs):
+    if sender is Question:
+        quiz_id = instance.quiz_id
+    else:
+        quiz_id = Question.objects.filter(pk=instance.question_id).values_list('quiz_id', flat=True).first()
+    answer_key_cache.invalidate(quiz_id)
+
+for _model in (Question, Answer):
+    post_save.connect(_answer_key_changed, sender=_model, dispatch_uid=f'answer-key-save-{_model.__name__}')
+    pre_delete.connect(_answer_key_changed, sender=_model, dispatch_uid=f'answer-key-delete-{_model.__name__}')
+
+
+# --- Cached JWT users (api/authentication.py) ---
+# Any change to the row (deactivation, new password, ...) drops the cached
+# copy; QuerySet.update() bypasses this, so the TTL bounds what it misses.
+def _user_changed(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+post_save.connect(_user_changed, sender=User, dispatch_uid='jwt-user-cache-save')
+post_delete.connect(_user_changed, sender=User, dispatch_uid='jwt-user-cache-delete')
+
+
+# --- Rendered articles (api/articles.py) ---
+# Rendered before the row is written, so the cleaned HTML, text and counts
+# always match the stored article; bulk_create()/update() callers render
+# themselves (seed_elearning does).
+def _render_topic_article(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'article_content' not in update_fields:
+        return
+    apply_rendered_article(instance)
+
+pre_save.connect(_render_topic_article, sender=Topic, dispatch_uid='topic-render-article')
+
+
+# --- Search index (api/search.py) ---
+# Connected after the content-version receivers, which record the course a
+# row belongs to now; rows moved to another course take the documents below
+# them along.
+def _search_saved(sender, instance, created=False, **kwargs):
+    kind = KIND_FOR_MODEL.get(sender.__name__)
+    if kind is not None:
+        index_object(kind, instance.pk)
+    previous = getattr(instance, '_previous_course_id', None)
+    if not created and previous is not None and previous != getattr(instance, '_course_id', previous):
+        reindex_contents(sender.__name__, instance.pk)
+
+def _search_deleted(sender, instance, **kwargs):
+    remove_object(KIND_FOR_MODEL[sender.__name__], instance.pk)
+
+for _model in (Course, Chapter, Topic, Quiz, Question, MatchingGame, MatchingPair):
+    post_save.connect(_search_saved, sender=_model, dispatch_uid=f'search-index-save-{_model.__name__}')
+for _model in (Course, Topic, Question, MatchingPair):
+    post_delete.connect(_search_deleted, sender=_model, dispatch_uid=f'search-index-delete-{_model.__name__}')
+
+
+# --- Uploaded image optimization (api/images.py) ---
+def _topic_saved(sender, instance, **kwargs):
+    schedule_topic(instance)
+
+post_save.connect(_topic_saved, sender=Topic, dispatch_uid='topic-image-optimization')
+
+
+# --- Rollups after deletions (api/stats.py, api/leaderboards.py, api/attempts.py) ---
+# pre_delete, so a cascade's parent rows can still be resolved to a course;
+# the recomputes run once the deletion commits.
+def _topic_course_id(topic_id):
+    return Topic.objects.filter(pk=topic_id).values_list('chapter__course_id', flat=True).first()
+
+def _progress_deleted(sender, instance, **kwargs):
+    if instance.completed:
+        course_id = course_stats_pending.course_id('topic', instance.topic_id, _topic_course_id)
+        course_stats_pending.add([(instance.user_id, course_id)])
+
+def _summary_deleted(sender, instance, **kwargs):
+    if sender is QuizScoreSummary:
+        course_id = course_stats_pending.course_id('quiz', instance.quiz_id, _course_id_for_quiz)
+        course_stats_pending.add([(instance.user_id, course_id)])
+    else:
+        course_id = course_stats_pending.course_id('game', instance.game_id, _course_id_for_game)
+    entries_pending.add([(instance.user_id, course_id)])
+
+def _attempt_deleted(sender, instance, **kwargs):
+    key = 'quiz' if sender is QuizAttempt else 'game'
+    deleted_attempts_pending.add([(key, instance.user_id, getattr(instance, f'{key}_id'))])
+
+pre_delete.connect(_progress_deleted, sender=UserProgress, dispatch_uid='course-stats-progress-delete')
+for _model in (QuizScoreSummary, GameScoreSummary):
+    pre_delete.connect(_summary_deleted, sender=_model, dispatch_uid=f'rollups-summary-delete-{_model.__name__}')
+for _model in (QuizAttempt, GameAttempt):
+    pre_delete.connect(_attempt_deleted, sender=_model, dispatch_uid=f'summaries-attempt-delete-{_model.__name__}')
+
+
+# --- Request metrics ---
+def _connection_created(sender, connection, **kwargs):
+    # Query counts/time for PerformanceMiddleware (api/metrics.py)
+    install_query_timer(connection)
+
+connection_created.connect(_connection_created, dispatch_uid='request-metrics-query-timer')
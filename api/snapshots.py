@@ -0,0 +1,120 @@
+import hashlib
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .changelog import log_publish, log_unpublish
+from .compression import compress, supported
+from .course_cache import course_tree_cache, COURSE_TREE_FORMAT
+from .fieldsets import FieldSelection, deferred_fields, tree_prefetches
+from .grading import freeze_answer_keys
+from .models import Course, CourseSnapshot
+from .renderers import FastJSONRenderer
+from .serializers import CourseSerializer
+
+
+# --- Publish-time course snapshots ---
+# Publishing renders a course's full tree once, in the CourseSerializer shape
+# the detail endpoint returns, into an immutable CourseSnapshot row and points
+# Course.published_version at it. CourseViewSet.retrieve then serves those
+# bytes (through course_tree_cache) without serializing anything, and admin
+# edits only change the live tables until the course is published again.
+# The snapshot also freezes the course's answer keys, so quizzes are graded
+# against the answers learners were shown.
+# Snapshots keep the tree shape they were rendered with, so a bump of
+# COURSE_TREE_FORMAT calls for `manage.py publish_courses --all`.
+DEFAULTS = {
+    'PRECOMPRESS': ('gzip', 'br'),  # copies stored next to the plain bytes
+}
+
+# Snapshot column for each stored Content-Encoding
+ENCODING_FIELDS = {'identity': 'body', 'gzip': 'body_gzip', 'br': 'body_br'}
+
+
+def snapshot_config():
+    return {**DEFAULTS, **getattr(settings, 'COURSE_SNAPSHOTS', {})}
+
+
+def render_course_tree(course_id):
+    """
+    The full tree of one course as JSON bytes, exactly as the detail
+    endpoint renders it live.
+    """
+    context = {'field_selection': FieldSelection(expand_all=True)}
+    shape = CourseSerializer(context=context)
+    course = (
+        Course.objects.defer(*deferred_fields(shape))
+        .prefetch_related(*tree_prefetches(shape)).get(pk=course_id)
+    )
+    return FastJSONRenderer().render(CourseSerializer(course, context=context).data)
+
+
+def publish_course(course_id):
+    """
+    Renders and stores the next snapshot of a course and makes it the
+    published one. Returns the new CourseSnapshot.
+    """
+    config = snapshot_config()
+    with transaction.atomic():
+        # Serializes concurrent publishes of the same course
+        content_version, published_version = (
+            Course.objects.select_for_update().filter(pk=course_id)
+            .values_list('content_version', 'published_version').get()
+        )
+        body = render_course_tree(course_id)
+        latest = CourseSnapshot.objects.filter(course_id=course_id).aggregate(latest=Max('version'))['latest']
+        snapshot = CourseSnapshot.objects.create(
+            course_id=course_id,
+            version=(latest or 0) + 1,
+            content_version=content_version,
+            tree_format=COURSE_TREE_FORMAT,
+            body=body,
+            sha256=hashlib.sha256(body).hexdigest(),
+            answer_keys=freeze_answer_keys(course_id),
+            **{
+                ENCODING_FIELDS[encoding]: compress(body, encoding, cached=True)
+                for encoding in config['PRECOMPRESS'] if encoding in ENCODING_FIELDS and supported(encoding)
+            },
+        )
+        # The change log moves with what clients are served (api/changelog.py)
+        log_publish(course_id, was_published=published_version is not None)
+        # update(), not save(): publishing is not a content edit (api/signals.py)
+        Course.objects.filter(pk=course_id).update(
+            published_version=snapshot.version, published_at=snapshot.created_at,
+        )
+    return snapshot
+
+
+def unpublish_course(course_id):
+    # Back to serving the live tree; the snapshots themselves are kept
+    with transaction.atomic():
+        published = (
+            Course.objects.select_for_update().filter(pk=course_id, published_version__isnull=False).exists()
+        )
+        if published:
+            log_unpublish(course_id)
+        Course.objects.filter(pk=course_id).update(published_version=None, published_at=None)
+
+
+# --- Serving ---
+def snapshot_body(course_id, version, encoding='identity'):
+    """
+    Bytes of one snapshot in `encoding` ('identity', 'gzip' or 'br'), cached
+    per (course, version, encoding) like rendered trees. A compressed copy
+    that was not stored at publish time is compressed once here. Returns b''
+    when the snapshot does not exist.
+    """
+    def load():
+        data = (
+            CourseSnapshot.objects.filter(course_id=course_id, version=version)
+            .values_list(ENCODING_FIELDS[encoding], flat=True).first()
+        )
+        if data is not None:
+            return bytes(data)
+        if encoding == 'identity':
+            return b''
+        plain = snapshot_body(course_id, version)
+        return compress(plain, encoding, cached=True) if plain else b''
+
+    return course_tree_cache.get_or_render(course_id, f'published-{version}', load, variant=encoding)
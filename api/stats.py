@@ -0,0 +1,250 @@
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.db import connections, router, transaction
+from django.db.models import Count, Q, Sum
+
+from .models import UserCourseStats, UserProgress, QuizScoreSummary
+
+
+# --- UserCourseStats incremental maintenance ---
+# quiz_score_sum/quiz_attempt_count are the sum and number of the latest
+# scores of the quizzes attempted (QuizScoreSummary.latest_score), so the
+# dashboard average weighs every quiz once however often it was retaken.
+STAT_FIELDS = ('completed_topics', 'quiz_score_sum', 'quiz_attempt_count')
+
+
+def bump_course_stats_many(deltas):
+    """
+    Applies rollup increments for many (user, course) pairs with one
+    INSERT ... ON CONFLICT DO UPDATE, so concurrent bumps for a new pair never
+    race on creating the row. `deltas` maps (user id, course id) to a dict of
+    field -> increment.
+    """
+    rows = [
+        (user_id, course_id, fields) for (user_id, course_id), fields in deltas.items()
+        if course_id is not None and any(fields.values())
+    ]
+    if not rows:
+        return
+    connection = connections[router.db_for_write(UserCourseStats)]
+    table = connection.ops.quote_name(UserCourseStats._meta.db_table)
+    params = []
+    for user_id, course_id, fields in rows:
+        params.extend([user_id, course_id] + [fields.get(field, 0) for field in STAT_FIELDS])
+    values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))
+    updates = ', '.join(f"{field} = {table}.{field} + EXCLUDED.{field}" for field in STAT_FIELDS)
+    sql = (
+        f"INSERT INTO {table} (user_id, course_id, {', '.join(STAT_FIELDS)}) "
+        f"VALUES {values} "
+        f"ON CONFLICT (user_id, course_id) DO UPDATE SET {updates}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _bump_course_stats(user, course_id, **deltas):
+    bump_course_stats_many({(user.id, course_id): deltas})
+
+
+def apply_course_stats_deltas(user, deltas):
+    """
+    Applies several rollup changes at once; `deltas` maps course id to a dict
+    of field -> increment (used by the batch sync in api/sync.py).
+    """
+    bump_course_stats_many({(user.id, course_id): fields for course_id, fields in deltas.items()})
+
+
+def complete_topics(pairs):
+    """
+    Marks every (user id, topic id) in `pairs` completed with one SELECT plus
+    bulk writes; returns the pairs that were not completed before.
+    """
+    if not pairs:
+        return []
+    pairs = set(pairs)
+    existing = {
+        (progress.user_id, progress.topic_id): progress
+        for progress in UserProgress.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs}, topic_id__in={topic_id for _, topic_id in pairs}
+        )
+    }
+    newly_completed, to_update, to_create = [], [], []
+    for user_id, topic_id in pairs:
+        progress = existing.get((user_id, topic_id))
+        if progress is None:
+            to_create.append(UserProgress(user_id=user_id, topic_id=topic_id, completed=True))
+        elif not progress.completed:
+            progress.completed = True
+            to_update.append(progress)
+        else:
+            continue
+        newly_completed.append((user_id, topic_id))
+    UserProgress.objects.bulk_update(to_update, ['completed'])
+    UserProgress.objects.bulk_create(to_create)
+    return newly_completed
+
+
+def mark_topic_completed(user, topic):
+    """
+    Marks `topic` completed for `user` and bumps the course rollup the first
+    time it happens. Returns the UserProgress row.
+    """
+    with transaction.atomic():
+        progress, created = UserProgress.objects.get_or_create(
+            user=user, topic=topic, defaults={'completed': True}
+        )
+        newly_completed = created
+        if not created and not progress.completed:
+            progress.completed = True
+            progress.save(update_fields=['completed'])
+            newly_completed = True
+        if newly_completed:
+            _bump_course_stats(user, topic.chapter.course_id, completed_topics=1)
+    return progress
+
+
+def latest_quiz_score_deltas(changes, course_ids, deltas=None):
+    """
+    Rollup increments for the latest-score changes returned by
+    upsert_score_summaries_many() ({(user id, quiz id): (previous latest or
+    None, latest)}), added to `deltas` when given. `course_ids` maps quiz id
+    to course id. A retake replaces its quiz's share of the sum; only a
+    first attempt adds to the count.
+    """
+    if deltas is None:
+        deltas = defaultdict(lambda: defaultdict(int))
+    for (user_id, quiz_id), (previous, latest) in changes.items():
+        fields = deltas[(user_id, course_ids.get(quiz_id))]
+        fields['quiz_score_sum'] += latest - (previous or 0)
+        if previous is None:
+            fields['quiz_attempt_count'] += 1
+    return deltas
+
+
+# --- Recomputing after deletions ---
+# The writes above only ever add. Deleting progress, quiz score summaries or
+# attempts (directly, or by cascade from a topic, quiz, course or user)
+# instead recomputes the affected (user, course) rows from what is left,
+# once the deleting transaction commits (signals in api/signals.py). A
+# cascade over many rows recomputes each pair once; `manage.py
+# rebuild_course_stats` recomputes every row.
+QUIZ_COURSE_PATHS = ('quiz__topic__chapter__course_id', 'quiz__chapter__course_id', 'quiz__course_id')
+
+
+class PendingRecompute:
+    """
+    Keys collected while rows are deleted, handed to `recompute` in one call
+    after the transaction commits. Keys left over from a rolled back
+    transaction go with the next one; recomputing is always correct.
+    """
+    def __init__(self, recompute):
+        self.recompute = recompute
+        self._local = threading.local()
+
+    def add(self, keys):
+        self._local.__dict__.setdefault('keys', set()).update(keys)
+        transaction.on_commit(self.flush, robust=True)
+
+    def flush(self):
+        # Later callbacks of the same transaction find nothing left
+        keys = self._local.__dict__.pop('keys', None)
+        self._local.__dict__.pop('courses', None)
+        if keys:
+            self.recompute(keys)
+
+    def course_id(self, kind, object_id, resolve):
+        """
+        resolve(object_id), remembered until the next flush: a cascade
+        deletes many rows below the same topic or quiz.
+        """
+        courses = self._local.__dict__.setdefault('courses', {})
+        if (kind, object_id) not in courses:
+            courses[(kind, object_id)] = resolve(object_id)
+        return courses[(kind, object_id)]
+
+
+def course_stats_values(user_ids=None, course_ids=None):
+    """
+    {(user id, course id): {field: value}} computed from UserProgress and
+    QuizScoreSummary, for everyone or for the given users and courses.
+    """
+    rows = defaultdict(lambda: {'completed_topics': 0, 'quiz_score_sum': 0.0, 'quiz_attempt_count': 0})
+
+    completed = UserProgress.objects.filter(completed=True)
+    if user_ids is not None:
+        completed = completed.filter(user_id__in=user_ids)
+    if course_ids is not None:
+        completed = completed.filter(topic__chapter__course_id__in=course_ids)
+    completed = completed.values('user_id', 'topic__chapter__course_id').annotate(n=Count('id')).order_by()
+    for row in completed.iterator():
+        rows[(row['user_id'], row['topic__chapter__course_id'])]['completed_topics'] = row['n']
+
+    # The latest score of every quiz attempted. A quiz hangs off exactly one
+    # of topic, chapter or course
+    for course_path in QUIZ_COURSE_PATHS:
+        summaries = QuizScoreSummary.objects.filter(**{f'{course_path}__isnull': False})
+        if user_ids is not None:
+            summaries = summaries.filter(user_id__in=user_ids)
+        if course_ids is not None:
+            summaries = summaries.filter(**{f'{course_path}__in': course_ids})
+        summaries = (
+            summaries.values('user_id', course_path)
+            .annotate(total=Sum('latest_score'), n=Count('id')).order_by()
+        )
+        for row in summaries.iterator():
+            entry = rows[(row['user_id'], row[course_path])]
+            entry['quiz_score_sum'] += row['total']
+            entry['quiz_attempt_count'] += row['n']
+    return rows
+
+
+def recompute_course_stats(pairs):
+    """
+    Rewrites the UserCourseStats rows of (user id, course id) `pairs` from
+    their sources; rows left with nothing to count are deleted.
+    """
+    pairs = {(user_id, course_id) for user_id, course_id in pairs if course_id is not None}
+    if not pairs:
+        return
+    condition = Q()
+    for user_id, course_id in pairs:
+        condition |= Q(user_id=user_id, course_id=course_id)
+    with transaction.atomic():
+        # Concurrent bumps wait for the rewrite instead of being overwritten
+        list(UserCourseStats.objects.select_for_update().filter(condition).values_list('id'))
+        values = course_stats_values({user_id for user_id, _ in pairs}, {course_id for _, course_id in pairs})
+        emptied = Q()
+        for user_id, course_id in pairs - values.keys():
+            emptied |= Q(user_id=user_id, course_id=course_id)
+        if emptied:
+            UserCourseStats.objects.filter(emptied).delete()
+        UserCourseStats.objects.bulk_create(
+            [UserCourseStats(user_id=user_id, course_id=course_id, **values[(user_id, course_id)])
+             for user_id, course_id in pairs & values.keys()],
+            update_conflicts=True, unique_fields=['user', 'course'], update_fields=list(STAT_FIELDS),
+        )
+
+
+course_stats_pending = PendingRecompute(recompute_course_stats)
+
+
+# --- Async counterparts (api/views.py async views) ---
+async def amark_topic_completed(user, topic):
+    """
+    mark_topic_completed() on the async ORM. Instead of a transaction, the
+    completed=False -> True transition is a conditional UPDATE, so only one
+    concurrent request bumps the rollup.
+    """
+    progress, created = await UserProgress.objects.aget_or_create(
+        user=user, topic=topic, defaults={'completed': True}
+    )
+    newly_completed = created
+    if not created and not progress.completed:
+        updated = await UserProgress.objects.filter(pk=progress.pk, completed=False).aupdate(completed=True)
+        progress.completed = True
+        newly_completed = updated == 1
+    if newly_completed:
+        await sync_to_async(_bump_course_stats)(user, topic.chapter.course_id, completed_topics=1)
+    return progress
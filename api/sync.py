@@ -0,0 +1,184 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Topic, Quiz, MatchingGame, AppliedSyncEvent
+from .attempts import record_quiz_attempts, record_game_attempts
+from .grading import InvalidSubmission, answer_key_cache, answer_key_version, grade_quiz, parse_answers, parse_score
+from .stats import apply_course_stats_deltas, complete_topics
+
+
+# --- Batch offline sync ---
+# Each event is one of
+#   {"type": "quiz", "quiz_id": 1, "answers": {"<question_id>": <answer_id>}}
+#   {"type": "game", "game_id": 2, "score": 100}
+#   {"type": "topic_complete", "topic_id": 3}
+# with the same effect as submit-quiz/, submit-game/ and
+# topics/<id>/mark-complete/ respectively. An event may carry an
+# "event_id" (any string up to 64 characters, unique per user, e.g. a UUID
+# made when it was recorded). Applied ids are remembered with their result
+# (AppliedSyncEvent), so an upload retried after a lost response is not
+# applied twice: those events come back with their first result and
+# "duplicate": true. `manage.py prune_sync_events` forgets old ids.
+MAX_EVENT_ID_LENGTH = 64
+EVENT_ID_FIELDS = {
+    'quiz': 'quiz_id',
+    'game': 'game_id',
+    'topic_complete': 'topic_id',
+}
+
+
+class SyncEventError(Exception):
+    pass
+
+
+def _event_id(event):
+    event_id = event.get('event_id') if isinstance(event, dict) else None
+    if event_id is None:
+        return None
+    if isinstance(event_id, bool) or not isinstance(event_id, (str, int)):
+        raise SyncEventError("event_id must be a string.")
+    event_id = str(event_id)
+    if not event_id or len(event_id) > MAX_EVENT_ID_LENGTH:
+        raise SyncEventError(f"event_id must be 1 to {MAX_EVENT_ID_LENGTH} characters.")
+    return event_id
+
+
+def _parse_event(event):
+    if not isinstance(event, dict):
+        raise SyncEventError("Event must be an object.")
+    event_type = event.get('type')
+    if event_type not in EVENT_ID_FIELDS:
+        raise SyncEventError(f"Unknown event type: {event_type!r}.")
+    id_field = EVENT_ID_FIELDS[event_type]
+    try:
+        object_id = int(event[id_field])
+    except (KeyError, TypeError, ValueError):
+        raise SyncEventError(f"{id_field} is required.")
+    # Quizzes carry the chosen answers (graded later), games a score
+    payload = None
+    if event_type == 'quiz':
+        if 'answers' not in event:
+            raise SyncEventError("answers is required.")
+        try:
+            payload = parse_answers(event['answers'])
+        except InvalidSubmission as e:
+            raise SyncEventError(str(e))
+    elif event_type == 'game':
+        if 'score' not in event:
+            raise SyncEventError("score is required.")
+        try:
+            payload = parse_score(event['score'])
+        except InvalidSubmission as e:
+            raise SyncEventError(str(e))
+    return event_type, object_id, payload
+
+
+def prune_applied_events(days, now=None):
+    """
+    Forgets event ids applied more than `days` ago; returns how many.
+    """
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    deleted, _ = AppliedSyncEvent.objects.filter(applied_at__lt=cutoff).delete()
+    return deleted
+
+
+def apply_sync_events(user, events, retry=True):
+    """
+    Validates and applies a batch of offline events for `user`. Referenced
+    ids are checked with one IN query per type and all writes happen in one
+    transaction. Returns one result dict per event, in order. Every quiz and
+    game event is appended to the attempt log as its own attempt, unless
+    its event_id was applied before.
+    """
+    results = [None] * len(events)
+    parsed = []
+    event_ids, first_index, repeats = {}, {}, {}
+    for index, event in enumerate(events):
+        try:
+            event_id = _event_id(event)
+            parsed_event = _parse_event(event)
+        except SyncEventError as e:
+            results[index] = {'index': index, 'status': 'error', 'error': str(e)}
+            continue
+        if event_id is not None:
+            if event_id in first_index:
+                repeats[index] = first_index[event_id]
+                continue
+            first_index[event_id] = index
+            event_ids[index] = event_id
+        parsed.append((index,) + parsed_event)
+
+    if event_ids:
+        applied = dict(
+            AppliedSyncEvent.objects.filter(user=user, event_id__in=event_ids.values())
+            .values_list('event_id', 'result')
+        )
+        for index, event_id in list(event_ids.items()):
+            if event_id in applied:
+                results[index] = {'index': index, **applied[event_id], 'duplicate': True}
+                del event_ids[index]
+        parsed = [event for event in parsed if results[event[0]] is None]
+
+    ids = defaultdict(set)
+    for _, event_type, object_id, _ in parsed:
+        ids[event_type].add(object_id)
+    quizzes = Quiz.objects.select_related(
+        'course', 'chapter__course', 'topic__chapter__course'
+    ).in_bulk(ids['quiz'])
+    games = MatchingGame.objects.select_related('topic__chapter', 'chapter').in_bulk(ids['game'])
+    topics = Topic.objects.select_related('chapter').in_bulk(ids['topic_complete'])
+    lookups = {'quiz': quizzes, 'game': games, 'topic_complete': topics}
+    answer_keys = answer_key_cache.get_many([(quiz, answer_key_version(quiz)) for quiz in quizzes.values()])
+
+    quiz_scores, game_scores, topics_to_complete = [], [], {}
+    for index, event_type, object_id, payload in parsed:
+        obj = lookups[event_type].get(object_id)
+        if obj is None:
+            results[index] = {'index': index, 'status': 'error', 'error': f"{event_type} {object_id} not found"}
+            continue
+        result = {'index': index, 'status': 'ok'}
+        if event_type == 'quiz':
+            result['score'] = grade_quiz(obj, payload, answer_keys[object_id])
+            quiz_scores.append((object_id, result['score']))
+        elif event_type == 'game':
+            game_scores.append((object_id, payload))
+        # Quizzes and games attached to a topic complete it, as in the single endpoints
+        topic = obj if event_type == 'topic_complete' else obj.topic
+        if topic is not None:
+            topics_to_complete[topic.id] = topic
+        results[index] = result
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    try:
+        with transaction.atomic():
+            # First, so a concurrent upload of the same ids waits here and
+            # then fails instead of applying them again
+            AppliedSyncEvent.objects.bulk_create([
+                AppliedSyncEvent(user=user, event_id=event_id, result={
+                    key: value for key, value in results[index].items() if key != 'index'
+                })
+                for index, event_id in event_ids.items() if results[index]['status'] == 'ok'
+            ])
+            record_quiz_attempts(user, quiz_scores, {quiz_id: quizzes[quiz_id].get_course_id() for quiz_id, _ in quiz_scores})
+            record_game_attempts(user, game_scores)
+            newly_completed = [
+                topics_to_complete[topic_id] for _, topic_id in complete_topics([(user.id, topic_id) for topic_id in topics_to_complete])
+            ]
+            for topic in newly_completed:
+                deltas[topic.chapter.course_id]['completed_topics'] += 1
+            apply_course_stats_deltas(user, deltas)
+    except IntegrityError:
+        if not retry:
+            raise
+        # That upload committed first; this time its ids count as applied
+        return apply_sync_events(user, events, retry=False)
+
+    # Repeats of an id within the batch share its result
+    for index, first in repeats.items():
+        results[index] = {**results[first], 'index': index}
+        if results[index]['status'] == 'ok':
+            results[index]['duplicate'] = True
+    return results
@@ -1,3 +1,1641 @@
-from django.test import TestCase
+import gzip
+import importlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.urls import path
+from django.db import DatabaseError, connection
+from asgiref.sync import sync_to_async
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .articles import render_article
+from .authentication import UserCache, user_cache
+from .changelog import compact_change_log
+from .compression import brotli as compression_brotli, choose_encoding, compress
+from .course_cache import LRUCache, course_tree_cache
+from .grading import answer_key_cache
+from .images import rewrite_article
+from .ingest import apply_submissions, get_writer
+from .leaderboards import item_points
+from .metrics import registry
+from .models import (
+    Course, Chapter, Topic,
+    Quiz, Question, Answer,
+    UserProgress, QuizAttempt, GameAttempt, MatchingGame, MatchingPair,
+    UserCourseStats, QuizScoreSummary, GameScoreSummary,
+    LeaderboardEntry, LeaderboardScoreCount, CourseSnapshot,
+    OptimizedImage, ImageUpload, SearchDocument, ContentChange,
+)
+from .renderers import FastJSONParser, FastJSONRenderer
+from .routers import reset_health
+from .search import rebuild_search_index, tokenize
+from .snapshots import publish_course, render_course_tree, unpublish_course
+from .stats import amark_topic_completed, mark_topic_completed
+from .views import (
+    AsyncSubmitQuizView, AsyncSubmitGameView, AsyncMarkTopicCompleteView, AsyncCourseProgressView,
+)
+
+
+# -------------------------
+# Test data
+# -------------------------
+def build_quiz(questions=3, answers=4, **owner):
+    quiz = Quiz.objects.create(title='Quiz', **owner)
+    question_objs = Question.objects.bulk_create(
+        [Question(quiz=quiz, text=f'Question {n}') for n in range(questions)]
+    )
+    Answer.objects.bulk_create([
+        Answer(question=question, text=f'Answer {n}', is_correct=(n == 0))
+        for question in question_objs for n in range(answers)
+    ])
+    return quiz
+
+def build_game(pairs=4, **owner):
+    game = MatchingGame.objects.create(title='Game', **owner)
+    MatchingPair.objects.bulk_create(
+        [MatchingPair(game=game, item_a=f'A{n}', item_b=f'B{n}') for n in range(pairs)]
+    )
+    return game
+
+def build_course(index, chapters=3, topics=4):
+    """
+    A course with a quiz and a game at every level: course, chapter, topic.
+    """
+    course = Course.objects.create(title=f'Course {index}', description='Description ' * 20)
+    for chapter_order in range(chapters):
+        chapter = Chapter.objects.create(course=course, title=f'Chapter {chapter_order}', order=chapter_order)
+        for topic_order in range(topics):
+            topic = Topic.objects.create(
+                chapter=chapter, title=f'Topic {topic_order}', order=topic_order,
+                article_content='<p>' + 'Lorem ipsum dolor sit amet. ' * 50 + '</p>',
+            )
+            build_quiz(topic=topic)
+            build_game(topic=topic)
+        build_quiz(chapter=chapter)
+        build_game(chapter=chapter)
+    build_quiz(course=course)
+    build_game(course=course)
+    return course
+
+def seed_catalog(courses, users=3, start=0):
+    """
+    Adds `courses` courses and gives every user progress and attempts in each.
+    """
+    built = [build_course(start + n) for n in range(courses)]
+    learners = [
+        User.objects.get_or_create(username=f'learner{n}')[0] for n in range(users)
+    ]
+    for course in built:
+        topics = list(Topic.objects.filter(chapter__course=course))
+        for learner in learners:
+            for topic in topics[:len(topics) // 2]:
+                mark_topic_completed(learner, topic)
+    return built
+
+
+def newest_course():
+    return Course.objects.order_by('-id').first()
+
+def answers_for(quiz, correct=True):
+    return {
+        question.id: question.answers.filter(is_correct=correct).first().id
+        for question in quiz.questions.all()
+    }
+
+
+# -------------------------
+# Query budgets
+# -------------------------
+# Upper bound on SQL queries per request. None of these may depend on how many
+# courses, topics, users or attempts exist; the growth tests below check that.
+QUERY_BUDGETS = {
+    'course-list': 2,
+    'course-list-full': 19,
+    'course-detail': 19,
+    'course-detail-cached': 1,
+    'course-detail-not-modified': 1,
+    'course-detail-published': 2,
+    'dashboard-stats': 2,
+    'course-progress': 1,
+    'submit-quiz': 18,
+    'submit-game': 16,
+    'mark-topic-complete': 8,
+    'sync': 24,
+}
+
+# Wall-clock time per endpoint, written to $API_TIMINGS_FILE when set
+TIMINGS = defaultdict(list)
+
+
+class CourseCacheTests(APITestCase):
+    """
+    Rendered course trees are cached per content_version, which every edit
+    in the course bumps and nothing else may move.
+    """
+    def setUp(self):
+        cache.clear()
+        course_tree_cache.clear()
+        self.course = build_course(0, chapters=1, topics=1)
+        self.url = f'/api/courses/{self.course.id}/'
+
+    def test_stale_save_keeps_version(self):
+        stale = Course.objects.get(pk=self.course.pk)
+        Chapter.objects.create(course=self.course, title='Added', order=9)
+        bumped = Course.objects.get(pk=self.course.pk).content_version
+        self.assertEqual(len(self.client.get(self.url).json()['chapters']), 2)
+
+        stale.title = 'Renamed'
+        stale.save()
+        course = Course.objects.get(pk=self.course.pk)
+        self.assertEqual(course.content_version, bumped + 1)
+        self.assertEqual(course.title, 'Renamed')
+        data = self.client.get(self.url).json()
+        self.assertEqual((data['title'], len(data['chapters'])), ('Renamed', 2))
+
+
+    def test_edit_invalidates_only_its_course(self):
+        other = build_course(1, chapters=1, topics=1)
+        other_url = f'/api/courses/{other.id}/'
+        # The counters are process-wide
+        before = course_tree_cache.stats()
+        counts = lambda: {
+            name: course_tree_cache.stats()[name] - before[name] for name in ('local_hits', 'shared_hits', 'misses')
+        }
+        self.client.get(self.url)
+        self.client.get(other_url)
+
+        topic = Topic.objects.get(chapter__course=self.course)
+        topic.title = 'Edited'
+        topic.save()
+        self.assertEqual(self.client.get(self.url).json()['chapters'][0]['topics'][0]['title'], 'Edited')
+        with self.assertNumQueries(1):
+            self.client.get(other_url)
+        self.assertEqual(counts(), {'local_hits': 1, 'shared_hits': 0, 'misses': 3})
+
+        # Another process: its LRU is empty, the shared tier has the new bytes
+        course_tree_cache.clear()
+        self.assertEqual(self.client.get(self.url).json()['chapters'][0]['topics'][0]['title'], 'Edited')
+        self.assertEqual(counts(), {'local_hits': 1, 'shared_hits': 1, 'misses': 3})
+
+    def test_lru_evicts_by_bytes(self):
+        lru = LRUCache(max_bytes=10)
+        lru.set('a', b'aaaa')
+        lru.set('b', b'bbbb')
+        lru.get('a')
+        lru.set('c', b'cccc')  # over budget: 'b' was used least recently
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (b'aaaa', None, b'cccc'))
+        self.assertEqual(lru.current_bytes, 8)
+
+        lru.set('a', b'a' * 8)  # replacing an entry counts only its new size
+        self.assertEqual((len(lru), lru.current_bytes), (1, 8))
+        self.assertIsNone(lru.get('c'))
+        lru.set('huge', b'x' * 11)  # never cached, and evicts nothing
+        self.assertEqual((lru.get('huge'), lru.get('a')), (None, b'a' * 8))
+        lru.clear()
+        self.assertEqual((len(lru), lru.current_bytes), (0, 0))
+
+
+class QueryBudgetTests(APITestCase):
+    """
+    Every API endpoint must stay within its query budget, and that number
+    must not change as the dataset grows (no N+1 queries).
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = seed_catalog(courses=4)
+        cls.user = User.objects.create_user('student', password='pass12345!')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        path = os.environ.get('API_TIMINGS_FILE')
+        if path:
+            report = {
+                name: {'runs': len(samples), 'mean_ms': sum(samples) / len(samples) * 1000, 'max_ms': max(samples) * 1000}
+                for name, samples in TIMINGS.items()
+            }
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+
+    def setUp(self):
+        cache.clear()
+        course_tree_cache.clear()
+        answer_key_cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def request(self, name, method, url, data=None, **extra):
+        """
+        Runs one request, checks it against its budget and returns
+        (response, query count).
+        """
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(self.client, method)(url, data, format='json', **extra)
+            TIMINGS[name].append(time.perf_counter() - started)
+        self.assertLess(response.status_code, 400, response.content[:500])
+        self.assertLessEqual(
+            len(queries), QUERY_BUDGETS[name],
+            f"{name} ran {len(queries)} queries:\n" + '\n'.join(q['sql'] for q in queries.captured_queries),
+        )
+        return response, len(queries)
+
+    def grow(self):
+        # Triple the catalog and add more users with their own progress
+        seed_catalog(courses=8, users=6, start=len(self.courses))
+
+    def assertConstantQueries(self, name, method, url_func, data_func=None):
+        data = data_func() if data_func else None
+        _, before = self.request(name, method, url_func(), data)
+        self.grow()
+        cache.clear()
+        course_tree_cache.clear()
+        answer_key_cache.clear()
+        data = data_func() if data_func else None
+        _, after = self.request(name, method, url_func(), data)
+        self.assertEqual(before, after, f"{name} query count grew with the data")
+
+    # --- content ---
+    def test_course_list(self):
+        self.assertConstantQueries('course-list', 'get', lambda: '/api/courses/')
+
+    def test_course_list_full_tree(self):
+        self.assertConstantQueries('course-list-full', 'get', lambda: '/api/courses/?expand=full')
+
+    def test_course_detail(self):
+        url = lambda: f'/api/courses/{self.courses[0].id}/'
+        self.assertConstantQueries('course-detail', 'get', url)
+        response, _ = self.request('course-detail-cached', 'get', url())
+        self.request('course-detail-not-modified', 'get', url(), HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_course_detail_published(self):
+        # Published pointer + stored bytes; no tree queries at all
+        publish_course(self.courses[0].id)
+        course_tree_cache.clear()
+        self.request('course-detail-published', 'get', f'/api/courses/{self.courses[0].id}/')
+
+    # --- progress ---
+    def test_dashboard_stats(self):
+        self.assertConstantQueries('dashboard-stats', 'get', lambda: '/api/dashboard-stats/')
+
+    def test_course_progress(self):
+        self.assertConstantQueries(
+            'course-progress', 'get', lambda: f'/api/courses/{self.courses[0].id}/my-progress/'
+        )
+
+    # Write budgets are compared on the newest course each time, so both
+    # measurements make the same state change (first progress/stats row).
+    def test_mark_topic_complete(self):
+        self.assertConstantQueries(
+            'mark-topic-complete', 'post',
+            lambda: f'/api/topics/{Topic.objects.filter(chapter__course=newest_course()).first().id}/mark-complete/',
+        )
+
+    # --- submissions ---
+    def test_submit_quiz_is_graded_on_server(self):
+        quiz = Quiz.objects.filter(topic__chapter__course=self.courses[0]).first()
+        response, _ = self.request('submit-quiz', 'post', '/api/submit-quiz/', {
+            'quiz_id': quiz.id, 'answers': answers_for(quiz),
+        })
+        self.assertEqual(response.data['score'], 100)
+        response, _ = self.request('submit-quiz', 'post', '/api/submit-quiz/', {
+            'quiz_id': quiz.id, 'answers': answers_for(quiz, correct=False),
+        })
+        self.assertEqual(response.data['score'], 0)
+
+    def test_dashboard_average_uses_latest_scores(self):
+        self.client.force_authenticate(User.objects.create_user('retaker', password='pass12345!'))
+        first, second = Quiz.objects.filter(topic__chapter__course=self.courses[0])[:2]
+        for quiz, correct in ((first, True), (first, False), (second, True), (second, True)):
+            self.request('submit-quiz', 'post', '/api/submit-quiz/', {
+                'quiz_id': quiz.id, 'answers': answers_for(quiz, correct=correct),
+            })
+        row = next(row for row in self.client.get('/api/dashboard-stats/').data if row['course_id'] == self.courses[0].id)
+        # Latest scores 0 and 100; every attempt would average 75
+        self.assertEqual(row['average_quiz_score'], 50)
+        call_command('rebuild_course_stats', stdout=StringIO())
+        stats = UserCourseStats.objects.get(user__username='retaker', course=self.courses[0])
+        self.assertEqual((stats.quiz_score_sum, stats.quiz_attempt_count), (100, 2))
+
+    def test_submit_quiz(self):
+        def submission():
+            quiz = Quiz.objects.filter(topic__chapter__course=newest_course()).first()
+            return {'quiz_id': quiz.id, 'answers': answers_for(quiz)}
+        self.assertConstantQueries('submit-quiz', 'post', lambda: '/api/submit-quiz/', submission)
+
+    def test_submit_game(self):
+        def submission():
+            game = MatchingGame.objects.filter(topic__chapter__course=newest_course()).first()
+            return {'game_id': game.id, 'score': 100}
+        self.assertConstantQueries('submit-game', 'post', lambda: '/api/submit-game/', submission)
+
+    def test_sync(self):
+        def events():
+            course = newest_course()
+            quizzes = Quiz.objects.filter(topic__chapter__course=course)[:5]
+            games = MatchingGame.objects.filter(topic__chapter__course=course)[:5]
+            topics = Topic.objects.filter(chapter__course=course).order_by('-id')[:5]
+            return {'events': [
+                {**event, 'event_id': uuid.uuid4().hex} for event in
+                [{'type': 'quiz', 'quiz_id': quiz.id, 'answers': answers_for(quiz)} for quiz in quizzes]
+                + [{'type': 'game', 'game_id': game.id, 'score': 100} for game in games]
+                + [{'type': 'topic_complete', 'topic_id': topic.id} for topic in topics]
+            ]}
+        self.assertConstantQueries('sync', 'post', lambda: '/api/sync/', events)
+
+    def test_sync_retries_are_idempotent(self):
+        quiz = Quiz.objects.filter(topic__chapter__course=self.courses[0]).first()
+        game = MatchingGame.objects.filter(topic__chapter__course=self.courses[0]).first()
+        events = [
+            {'type': 'quiz', 'quiz_id': quiz.id, 'answers': answers_for(quiz), 'event_id': 'q-1'},
+            {'type': 'game', 'game_id': game.id, 'score': 80, 'event_id': 'g-1'},
+            {'type': 'game', 'game_id': game.id, 'score': 80, 'event_id': 'g-1'},
+            {'type': 'game', 'game_id': game.id, 'score': 80, 'event_id': 'x' * 65},
+        ]
+        first, _ = self.request('sync', 'post', '/api/sync/', {'events': events})
+        self.assertEqual([result['status'] for result in first.data['results']], ['ok', 'ok', 'ok', 'error'])
+        self.assertTrue(first.data['results'][2]['duplicate'])
+        retried, _ = self.request('sync', 'post', '/api/sync/', {'events': events[:2]})
+        self.assertEqual(retried.data['results'], [
+            {'index': 0, 'status': 'ok', 'score': 100.0, 'duplicate': True},
+            {'index': 1, 'status': 'ok', 'duplicate': True},
+        ])
+        self.assertEqual(QuizAttempt.objects.filter(user=self.user, quiz=quiz).count(), 1)
+        self.assertEqual(GameAttempt.objects.filter(user=self.user, game=game).count(), 1)
+
+        call_command('prune_sync_events', days=0, stdout=StringIO())
+        self.request('sync', 'post', '/api/sync/', {'events': events[1:2]})
+        self.assertEqual(GameAttempt.objects.filter(user=self.user, game=game).count(), 2)
+
+
+class PaginationTests(APITestCase):
+    """
+    Listings are keyset-paginated: pages follow 'next' links, never repeat
+    or skip a row, and cost the same however deep they are.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        Course.objects.bulk_create([Course(title=f'Course {n}', description='') for n in range(105)])
+        cls.user = User.objects.create_user('student', password='pass12345!')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url):
+        ids, queries = [], []
+        while url:
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.json()['results']]
+            queries.append(len(captured))
+            url = response.json()['next']
+        return ids, queries
+
+    def test_course_list_pages(self):
+        ids, queries = self.walk('/api/courses/?page_size=10')
+        self.assertEqual(ids, list(Course.objects.order_by('id').values_list('id', flat=True)))
+        self.assertEqual(len(queries), 11)
+        self.assertEqual(len(set(queries)), 1, "deep pages ran more queries")
+
+        # Deleting a row already seen does not shift the pages after it
+        response = self.client.get('/api/courses/?page_size=10').json()
+        first = [row['id'] for row in response['results']]
+        Course.objects.filter(pk=first[0]).delete()
+        second = self.client.get(response['next']).json()
+        self.assertEqual(second['results'][0]['id'], first[-1] + 1)
+        previous = self.client.get(second['previous']).json()
+        self.assertEqual([row['id'] for row in previous['results']], first[1:])
+
+    def test_page_size_bounds(self):
+        sizes = {
+            '': 20, '?page_size=5': 5, '?page_size=100': 100, '?page_size=1000': 100,
+            '?page_size=0': 20, '?page_size=-3': 20, '?page_size=lots': 20,
+        }
+        for query, expected in sizes.items():
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/courses/{query}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), expected)
+
+    def test_attempt_history_ties(self):
+        quiz = build_quiz(questions=1)
+        at = timezone.now()
+        QuizAttempt.objects.bulk_create([
+            QuizAttempt(user=self.user, quiz=quiz, score=n, timestamp=at - timedelta(minutes=n // 3))
+            for n in range(9)
+        ])
+        ids, _ = self.walk(f'/api/quizzes/{quiz.id}/my-attempts/?page_size=2')
+        self.assertEqual(ids, list(
+            QuizAttempt.objects.filter(quiz=quiz).order_by('-timestamp', '-id').values_list('id', flat=True)
+        ))
+
+    def test_bad_cursor(self):
+        response = self.client.get('/api/courses/?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+
+class FieldSelectionTests(APITestCase):
+    """
+    ?fields= and ?expand= prune the course tree: what is left out is neither
+    serialized nor fetched.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = [build_course(n, chapters=2, topics=2) for n in range(2)]
+
+    def setUp(self):
+        cache.clear()
+        course_tree_cache.clear()
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), queries
+
+    def test_detail_fields(self):
+        url = f'/api/courses/{self.courses[0].id}/'
+        full, full_queries = self.get(url)
+        data, queries = self.get(url + '?fields=id,title,chapters.title,chapters.topics.title')
+        self.assertEqual(set(data), {'id', 'title', 'chapters'})
+        self.assertEqual([set(chapter) for chapter in data['chapters']], [{'title', 'topics'}] * 2)
+        self.assertEqual(
+            [topic['title'] for chapter in data['chapters'] for topic in chapter['topics']],
+            [topic['title'] for chapter in full['chapters'] for topic in chapter['topics']],
+        )
+        # Content version, course, chapters, topics; the article bodies stay
+        # in the table
+        self.assertEqual(len(queries), 4)
+        self.assertLess(len(queries), len(full_queries))
+        self.assertFalse(any('article_html' in query['sql'] for query in queries.captured_queries))
+
+        # Naming a nested field renders its whole subtree
+        data, _ = self.get(url + '?fields=course_quiz')
+        self.assertEqual(set(data), {'course_quiz'})
+        self.assertEqual(set(data['course_quiz']['questions'][0]), {'id', 'text', 'answers'})
+
+    def test_list_expand(self):
+        compact, compact_queries = self.get('/api/courses/')
+        self.assertEqual(set(compact['results'][0]), {'id', 'title', 'description', 'chapter_count', 'topic_count'})
+        full, full_queries = self.get('/api/courses/?expand=full')
+        data, queries = self.get('/api/courses/?expand=chapters')
+        for course in data['results']:
+            self.assertEqual(set(course), {'id', 'title', 'description', 'chapters'})
+            self.assertEqual(set(course['chapters'][0]), {'id', 'title', 'order'})
+        # Validators, courses, chapters
+        self.assertEqual(len(queries), 3)
+        self.assertLess(len(queries), len(full_queries))
+
+        data, queries = self.get('/api/courses/?expand=chapters.topics&fields=id,chapters.topics.title')
+        self.assertEqual(data['results'][0]['chapters'][0], {'topics': [{'title': 'Topic 0'}, {'title': 'Topic 1'}]})
+        self.assertEqual(len(queries), 4)
+        self.assertEqual(len(compact_queries), QUERY_BUDGETS['course-list'])
+
+    def test_equivalent_selections_share_a_cache_entry(self):
+        url = f'/api/courses/{self.courses[0].id}/'
+        first, _ = self.get(url + '?fields=title,id')
+        second, queries = self.get(url + '?fields=id,,title')
+        self.assertEqual(first, second)
+        self.assertEqual(len(queries), 1)  # the content version only
+        self.assertEqual(course_tree_cache.stats()['local_entries'], 1)
+
+
+class SeedCommandTests(TestCase):
+    """
+    manage.py seed_elearning builds the requested shape, keeps the rollup
+    tables consistent and is reproducible for a given seed.
+    """
+    options = dict(seed=7, courses=2, chapters=2, topics=3, questions=2, answers=3, pairs=2,
+                   users=4, enrollments=2, batch_size=50, stdout=StringIO())
+
+    def snapshot(self):
+        return {
+            'courses': list(Course.objects.values_list('id', 'title', 'description')),
+            'topics': list(Topic.objects.values_list('id', 'chapter_id', 'title', 'article_content')),
+            'answers': list(Answer.objects.values_list('id', 'question_id', 'is_correct')),
+            'users': list(User.objects.values_list('id', 'username')),
+            'attempts': list(QuizAttempt.objects.order_by('id').values_list('user_id', 'quiz_id', 'score')),
+        }
+
+    def test_shape_and_rollups(self):
+        call_command('seed_elearning', **self.options)
+        self.assertEqual(Course.objects.count(), 2)
+        self.assertEqual(Topic.objects.count(), 2 * 2 * 3)
+        # A quiz and a game per topic, per chapter and per course
+        self.assertEqual(Quiz.objects.count(), 2 * (6 + 2 + 1))
+        self.assertEqual(MatchingGame.objects.count(), 2 * (6 + 2 + 1))
+        self.assertEqual(Answer.objects.filter(is_correct=True).count(), Question.objects.count())
+        self.assertTrue(User.objects.first().check_password('seed-pass-123'))
+
+        for stats in UserCourseStats.objects.all():
+            # One latest score per quiz attempted
+            summaries = QuizScoreSummary.objects.filter(user_id=stats.user_id, quiz__topic__chapter__course_id=stats.course_id)
+            self.assertEqual(stats.quiz_attempt_count, summaries.count())
+            self.assertAlmostEqual(stats.quiz_score_sum, sum(summaries.values_list('latest_score', flat=True)))
+            self.assertEqual(
+                stats.completed_topics,
+                UserProgress.objects.filter(user_id=stats.user_id, topic__chapter__course_id=stats.course_id).count(),
+            )
+        self.assertEqual(
+            sum(QuizScoreSummary.objects.values_list('attempt_count', flat=True)), QuizAttempt.objects.count()
+        )
+
+    def test_rebuild_course_stats(self):
+        call_command('seed_elearning', **self.options)
+        fields = ('user_id', 'course_id', 'completed_topics', 'quiz_score_sum', 'quiz_attempt_count')
+        seeded = sorted(UserCourseStats.objects.values_list(*fields))
+        UserCourseStats.objects.filter(pk=UserCourseStats.objects.first().pk).delete()
+        UserCourseStats.objects.update(completed_topics=0, quiz_score_sum=0)
+        out = StringIO()
+        call_command('rebuild_course_stats', batch_size=2, stdout=out)
+        self.assertIn(f"Rebuilt {len(seeded)} course stats rows.", out.getvalue())
+        rebuilt = sorted(UserCourseStats.objects.values_list(*fields))
+        self.assertEqual([row[:3] + (round(row[3], 6),) + row[4:] for row in rebuilt],
+                         [row[:3] + (round(row[3], 6),) + row[4:] for row in seeded])
+
+    def test_deletions_recompute_stats(self):
+        call_command('seed_elearning', **self.options)
+        fields = ('user_id', 'course_id', 'completed_topics', 'quiz_score_sum', 'quiz_attempt_count')
+        rows = lambda: sorted(
+            row[:3] + (round(row[3], 6),) + row[4:] for row in UserCourseStats.objects.values_list(*fields)
+        )
+        retaken = QuizScoreSummary.objects.filter(attempt_count__gt=1).first()
+        latest = QuizAttempt.objects.filter(user_id=retaken.user_id, quiz_id=retaken.quiz_id).order_by('-timestamp', '-id').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            latest.delete()
+        summary = QuizScoreSummary.objects.get(pk=retaken.pk)
+        remaining = QuizAttempt.objects.filter(user_id=retaken.user_id, quiz_id=retaken.quiz_id).order_by('timestamp', 'id')
+        self.assertEqual(summary.attempt_count, retaken.attempt_count - 1)
+        self.assertEqual(summary.latest_score, remaining.last().score)
+        self.assertEqual(summary.best_score, max(attempt.score for attempt in remaining))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserProgress.objects.filter(completed=True).first().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            QuizScoreSummary.objects.first().quiz.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            Topic.objects.filter(userprogress__completed=True).first().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            QuizAttempt.objects.filter(user_id=retaken.user_id).delete()
+        incremental = rows()
+        call_command('rebuild_course_stats', stdout=StringIO())
+        self.assertEqual(incremental, rows())
+
+    def test_same_seed_same_data(self):
+        call_command('seed_elearning', **self.options)
+        first = self.snapshot()
+        User.objects.all().delete()
+        Course.objects.all().delete()
+        call_command('seed_elearning', **self.options)
+        self.assertEqual(self.snapshot(), first)
+
+
+class BenchCommandTests(LiveServerTestCase):
+    """
+    manage.py bench_api logs in through token/ and replays the traffic mix
+    against a live server without errors.
+    """
+    def test_short_run(self):
+        call_command('seed_elearning', seed=3, courses=2, chapters=1, topics=2, users=3, stdout=StringIO())
+        output = tempfile.mktemp(suffix='.json')
+        try:
+            call_command(
+                # One client: SQLite does not take concurrent writers well
+                'bench_api', url=f'{self.live_server_url}/api/', concurrency=1, duration=60, requests=40,
+                accounts=2, output=output, stdout=StringIO(), stderr=StringIO(),
+            )
+            with open(output) as f:
+                report = json.load(f)
+        finally:
+            if os.path.exists(output):
+                os.remove(output)
+        self.assertEqual(report['total']['errors'], 0, report['endpoints'])
+        self.assertEqual(report['concurrency'], 1)
+        self.assertIn('course-detail', report['endpoints'])
+        for row in report['endpoints'].values():
+            self.assertLessEqual(row['p50_ms'], row['p95_ms'])
+            self.assertLessEqual(row['p95_ms'], row['p99_ms'])
+
+
+class FastJSONTests(TestCase):
+    """
+    The orjson renderer/parser produce what DRF's stdlib ones do.
+    """
+    def test_matches_stdlib_renderer(self):
+        data = {
+            'price': Decimal('12.50'),
+            'at': datetime(2026, 1, 2, 3, 4, 5, 600000, tzinfo=dt_timezone.utc),
+            'naive': datetime(2026, 1, 2, 3, 4, 5),
+            'day': date(2026, 1, 2),
+            'took': timedelta(seconds=90),
+            'label': gettext_lazy('Course'),
+            'id': uuid.UUID(int=7),
+            'tags': ('a', 'b'),
+            1: 'non-string key',
+            'text': 'বাংলা \u2028 line',
+            'nested': [{'n': 2 ** 40, 'x': 1.5, 'none': None, 'flag': True}],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4'),
+        )
+        # Past 64 bits orjson gives up and the stdlib takes over
+        self.assertEqual(FastJSONRenderer().render({'n': 2 ** 70}), b'{"n":1180591620717411303424}')
+
+    def test_parser(self):
+        parse = lambda raw: FastJSONParser().parse(BytesIO(raw))
+        self.assertEqual(parse('{"a": [1, 2.5, "বাংলা"]}'.encode()), {'a': [1, 2.5, 'বাংলা']})
+        self.assertEqual(parse(b'{"n": 1180591620717411303424}'), {'n': 2 ** 70})
+        for bad in (b'{"a": NaN}', b'{"a": ', b''):
+            with self.assertRaises(ParseError):
+                parse(bad)
+
+    def test_benchmark_command(self):
+        build_course(0, chapters=1, topics=2)
+        out = StringIO()
+        call_command('bench_json', repeat=2, rounds=1, stdout=out)
+        self.assertRegex(out.getvalue(), r'render .* x[\d.]+\nparse')
+
+
+class CompressionTests(APITestCase):
+    """
+    Responses are compressed as negotiated; course trees only once per
+    content version.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = build_course(0, chapters=1, topics=2)
+
+    def setUp(self):
+        cache.clear()
+        course_tree_cache.clear()
+        self.url = f'/api/courses/{self.course.id}/'
+
+    def test_course_tree_compressed_once_per_version(self):
+        plain = self.client.get(self.url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+        with mock.patch('api.views.compress', wraps=compress) as spy:
+            for _ in range(3):
+                response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+                self.assertEqual(response['Content-Encoding'], 'gzip')
+                self.assertEqual(gzip.decompress(response.content), plain.content)
+            self.assertEqual(spy.call_count, 1)
+
+            # If-None-Match still matches the (weakened) ETag
+            self.assertTrue(response['ETag'].startswith('W/"'))
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+
+            # An edit is a new version, compressed once more
+            Topic.objects.filter(chapter__course=self.course).first().save()
+            self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(spy.call_count, 2)
+
+    def test_negotiation(self):
+        self.assertEqual(choose_encoding('gzip;q=0, identity'), 'identity')
+        self.assertEqual(choose_encoding('*'), 'br' if compression_brotli else 'gzip')
+        self.assertEqual(choose_encoding('br;q=1.0, gzip;q=0.5'), 'br' if compression_brotli else 'gzip')
+        self.assertEqual(choose_encoding('deflate'), 'identity')
+        with self.settings(RESPONSE_COMPRESSION={'ENABLED': False}):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_middleware_threshold(self):
+        big = self.client.get('/api/courses/?expand=full', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(big['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(big.content))['results'][0]['id'], self.course.id)
+        with self.settings(RESPONSE_COMPRESSION={'MIN_SIZE': 10 ** 6}):
+            response = self.client.get('/api/courses/?expand=full', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class UserCacheTests(APITestCase):
+    """
+    JWT requests resolve their user from the per-worker cache, which drops
+    users as soon as they change.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cached', password='pass12345!')
+
+    def setUp(self):
+        user_cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.url = '/api/courses/'
+
+    def user_queries(self, url=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url or self.url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return sum('FROM "auth_user"' in query['sql'] for query in queries.captured_queries)
+
+    def test_cached_between_requests(self):
+        self.assertEqual(self.user_queries(), 1)
+        hits = user_cache.hits
+        self.assertEqual(self.user_queries(), 0)
+        self.assertEqual(user_cache.hits, hits + 1)
+        self.assertIn('jwt_user_cache_hits', registry.render())
+
+    def test_deactivation_and_password_change_evict(self):
+        self.user_queries()
+        self.user.set_password('new-pass-456!')
+        self.user.save()
+        self.assertEqual(self.user_queries(), 1)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    def test_ttl_and_size_bound(self):
+        cache = UserCache(ttl=30, max_entries=2)
+        with mock.patch('api.authentication.time.monotonic', return_value=100):
+            for user_id in (1, 2, 3):
+                cache.set(user_id, self.user)
+            self.assertIsNone(cache.get(1))
+            self.assertEqual(cache.get(3).username, 'cached')
+            self.assertIsNot(cache.get(3), cache.get(3))
+        with mock.patch('api.authentication.time.monotonic', return_value=131):
+            self.assertIsNone(cache.get(3))
+
+    def test_token_user_endpoints_skip_the_lookup(self):
+        self.assertEqual(self.user_queries('/api/dashboard-stats/'), 0)
+        self.assertEqual(user_cache.stats()['entries'], 0)
+
+
+@override_settings(
+    DATABASE_REPLICAS={'ALIASES': ['replica'], 'CHECK_INTERVAL': 0},
+    # Pins must be visible to every worker; a directory is the simplest shared cache
+    CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(), 'elearning-test-cache'),
+    }},
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    With a replica configured, request reads of api models use it unless
+    the client just wrote or the replica lags; writes go to the primary.
+    "replica" is a separate SQLite database that nothing replicates to, so
+    stale reads show up as missing rows.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        course_tree_cache.clear()
+        reset_health()
+        self.course = build_course(0, chapters=1, topics=2)
+        # "Replicate" the content once; later writes only reach the primary
+        for model in (Course, Chapter, Topic, Quiz, Question, Answer, MatchingGame, MatchingPair):
+            model.objects.using('replica').bulk_create(list(model.objects.all()))
+        self.user = User.objects.create_user('reader', password='pass12345!')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def completed_topics(self):
+        response = self.client.get('/api/dashboard-stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.data[0]['completed_topics']
+
+    def test_read_your_writes(self):
+        game = MatchingGame.objects.filter(topic__chapter__course=self.course).first()
+        response = self.client.post('/api/submit-game/', {'game_id': game.id, 'score': 100}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(UserCourseStats.objects.using('default').filter(user=self.user).exists())
+        self.assertFalse(UserCourseStats.objects.using('replica').exists())
+
+        # Pinned to the primary right after the write...
+        self.assertEqual(self.completed_topics(), 1)
+        # ...and back on the (stale) replica once the pin expires
+        cache.clear()
+        self.assertEqual(self.completed_topics(), 0)
+
+    def test_lagging_or_broken_replica_falls_back(self):
+        UserProgress.objects.create(user=self.user, topic=Topic.objects.first(), completed=True)
+        UserCourseStats.objects.create(user=self.user, course=self.course, completed_topics=1)
+        self.assertEqual(self.completed_topics(), 0)
+        with mock.patch('api.routers.replica_lag', return_value=60):
+            reset_health()
+            self.assertEqual(self.completed_topics(), 1)
+        with mock.patch('api.routers.replica_lag', side_effect=OSError), self.assertLogs('api.routers', 'WARNING'):
+            reset_health()
+            self.assertEqual(self.completed_topics(), 1)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_per_process_cache_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            APIClient().get('/api/courses/')
+
+    def test_new_course_missing_on_replica(self):
+        course = Course.objects.create(title='Fresh', description='Not replicated yet')
+        self.assertEqual(self.client.get('/api/courses/').data['results'][-1]['id'], self.course.id)
+        response = self.client.get(f'/api/courses/{course.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['title'], 'Fresh')
+
+
+class ImageOptimizationTests(TestCase):
+    """
+    Uploads referenced by an article get resized WebP/JPEG variants without
+    metadata, identical files share them, and the article gets srcset markup.
+    """
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        override = override_settings(MEDIA_ROOT=media, IMAGE_OPTIMIZATION={'BACKGROUND': False})
+        override.enable()
+        self.addCleanup(override.disable)
+
+        photo = Image.radial_gradient('L').resize((2000, 1500)).convert('RGB')
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        buffer = BytesIO()
+        photo.save(buffer, 'JPEG', quality=95, exif=exif)
+        self.photo = buffer.getvalue()
+        for name in ('uploads/photo.jpg', 'uploads/copy.jpg'):
+            default_storage.save(name, ContentFile(self.photo))
+        buffer = BytesIO()
+        Image.new('RGBA', (200, 100), (255, 0, 0, 128)).save(buffer, 'PNG')
+        default_storage.save('uploads/logo.png', ContentFile(buffer.getvalue()))
+        self.course = build_course(0, chapters=1, topics=1)
+        self.topic = Topic.objects.filter(chapter__course=self.course).get()
+
+    def save_article(self, article):
+        self.topic.article_content = article
+        with self.captureOnCommitCallbacks(execute=True):
+            self.topic.save()
+        self.topic.refresh_from_db()
+        return self.topic.article_content
+
+    def test_variants_and_srcset(self):
+        version = Course.objects.get(pk=self.course.pk).content_version
+        article = self.save_article(
+            '<p>Intro</p><p><img alt="A &quot;photo&quot;" src="/media/uploads/photo.jpg" style="width:100%"></p>'
+            '<img src="http://example.com/media/uploads/copy.jpg"><img src="/media/uploads/logo.png">'
+            '<img src="https://cdn.example.com/elsewhere.jpg">'
+        )
+        self.assertEqual(article.count('<picture>'), 3)
+        self.assertIn('alt="A &quot;photo&quot;"', article)
+        self.assertIn('style="width:100%"', article)
+        self.assertIn('<img src="https://cdn.example.com/elsewhere.jpg">', article)
+        self.assertGreater(Course.objects.get(pk=self.course.pk).content_version, version)
+
+        # Identical bytes are optimized once
+        self.assertEqual(OptimizedImage.objects.count(), 2)
+        photo = ImageUpload.objects.get(name='uploads/photo.jpg').image
+        self.assertEqual(ImageUpload.objects.get(name='uploads/copy.jpg').image, photo)
+        self.assertEqual(
+            [(v['width'], v['format']) for v in photo.variants],
+            [(320, 'webp'), (320, 'jpeg'), (640, 'webp'), (640, 'jpeg'),
+             (1024, 'webp'), (1024, 'jpeg'), (1600, 'webp'), (1600, 'jpeg')],
+        )
+        self.assertIn('320w', article)
+        self.assertIn('type="image/webp"', article)
+        # Clients that ignore srcset get the phone-sized copy
+        self.assertIn(f'src="{default_storage.url(photo.variants[3]["name"])}"', article)
+        smallest = photo.variants[0]
+        self.assertLess(smallest['size'] * 10, len(self.photo))
+        with default_storage.open(smallest['name']) as f, Image.open(f) as variant:
+            self.assertEqual(variant.size, (320, 240))
+            self.assertEqual(len(variant.getexif()), 0)
+        logo = ImageUpload.objects.get(name='uploads/logo.png').image
+        self.assertEqual([(v['width'], v['format']) for v in logo.variants], [(200, 'webp'), (200, 'png')])
+
+        # Saving the rewritten article again changes nothing
+        self.assertEqual(self.save_article(article), article)
+        self.assertEqual(rewrite_article(article, {'uploads/photo.jpg': photo}), article)
+
+    def test_command_and_unreadable_upload(self):
+        default_storage.save('uploads/broken.jpg', ContentFile(b'not an image'))
+        Topic.objects.filter(pk=self.topic.pk).update(
+            article_content='<img src="/media/uploads/photo.jpg"><img src="/media/uploads/broken.jpg">'
+        )
+        out = StringIO()
+        call_command('optimize_images', workers=1, stdout=out)
+        self.assertIn('Rewrote 1 of 1 articles', out.getvalue())
+        article = Topic.objects.get(pk=self.topic.pk).article_content
+        self.assertEqual(article.count('<picture>'), 1)
+        self.assertIn('<img src="/media/uploads/broken.jpg">', article)
+
+
+class ArticleRenderingTests(APITestCase):
+    """
+    Articles are cleaned, minified and measured on save; the course tree
+    serves the stored rendering and never loads the editor's source.
+    """
+    def setUp(self):
+        cache.clear()
+        course_tree_cache.clear()
+        self.course = build_course(0, chapters=1, topics=1)
+        self.topic = Topic.objects.filter(chapter__course=self.course).get()
+
+    def test_sanitize_and_minify(self):
+        rendered = render_article(
+            '<!-- draft -->\n<p>Hello   <b>world</b>\n</p>\n<script>alert(1)</script>'
+            '<p onclick="steal()" style="color:red">Read <a href=" javascript:alert(1)" target="_blank">this</a>'
+            '<iframe src="https://example.com"><p>framed</p></iframe>'
+            '<img src="/media/a.jpg" alt="A" onerror="steal()"></p><pre>  keep\n  this</pre><p>open <em>tags'
+        )
+        self.assertEqual(
+            rendered.html,
+            '<p>Hello <b>world</b></p><p style="color:red">Read <a target="_blank" rel="noopener noreferrer">this</a>'
+            '<img src="/media/a.jpg" alt="A"></p><pre>  keep\n  this</pre><p>open <em>tags</em></p>',
+        )
+        self.assertEqual(rendered.text, 'Hello world\nRead this\nkeep\nthis\nopen tags')
+        self.assertEqual(render_article(rendered.html), rendered)
+        self.assertNotIn('url', render_article('<p style="background: URL(&quot;x&quot;)">x</p>').html)
+        for style in ('background:\\75rl(//evil.example)', 'background:u\\rl(//evil.example)', 'width:expr\\65 ssion(1)'):
+            self.assertEqual(render_article(f'<p style="{style}">x</p>').html, '<p>x</p>')
+
+    def test_migration_renders_existing_articles(self):
+        migration = importlib.import_module('api.migrations.0013_rendered_articles')
+        expected = Topic.objects.values_list('article_html', 'article_text', 'word_count', 'reading_minutes').get()
+        Topic.objects.update(article_html=None, article_text='', word_count=0, reading_minutes=0)
+        migration.render_existing_articles(django_apps, None)
+        self.assertEqual(
+            Topic.objects.values_list('article_html', 'article_text', 'word_count', 'reading_minutes').get(), expected,
+        )
+
+    def test_counts_and_tree(self):
+        self.topic.article_content = '<h2>শিরোনাম</h2><p>আমি বাংলায় গান গাই, আমি বাংলার গান গাই।</p><p>' + 'word ' * 400 + '</p>'
+        self.topic.save()
+        self.topic.refresh_from_db()
+        self.assertEqual(self.topic.word_count, 409)
+        self.assertEqual(self.topic.reading_minutes, 3)
+        self.assertTrue(self.topic.article_text.startswith('শিরোনাম\nআমি বাংলায়'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/courses/{self.course.id}/')
+        topic = response.json()['chapters'][0]['topics'][0]
+        self.assertEqual(topic['article_content'], self.topic.article_html)
+        self.assertEqual((topic['word_count'], topic['reading_minutes']), (409, 3))
+        topic_query = next(q['sql'] for q in queries.captured_queries if 'FROM "api_topic"' in q['sql'])
+        self.assertIn('"article_html"', topic_query)
+        self.assertNotIn('"article_content"', topic_query)
+        self.assertNotIn('"article_text"', topic_query)
+
+
+class SearchTests(APITestCase):
+    """
+    /api/search/ ranks full-text matches (titles first), matches prefixes,
+    keeps Bengali words whole, and the index follows content edits.
+    """
+    def setUp(self):
+        self.course = build_course(0, chapters=1, topics=2)
+        # build_quiz()/build_game() use bulk_create(), which sends no signals
+        rebuild_search_index()
+        self.grammar, self.history = Topic.objects.filter(chapter__course=self.course).order_by('order')
+        self.grammar.title = 'বাংলা ব্যাকরণ'
+        self.grammar.article_content = '<p>সন্ধি ও সমাস</p>'
+        self.grammar.save()
+        self.history.title = 'Grammar basics'
+        self.history.article_content = '<p>বাংলা ভাষার ইতিহাস</p>'
+        self.history.save()
+        quiz = build_quiz(questions=1, topic=Topic.objects.create(chapter=self.grammar.chapter, title='Quiz', order=9))
+        self.question = quiz.questions.get()
+        self.question.text = 'কোনটি সমাস?'
+        self.question.save()
+
+    def results(self, **params):
+        response = self.client.get('/api/search/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(result['type'], result['id']) for result in response.json()['results']]
+
+    def test_ranking_prefix_and_bengali(self):
+        self.assertEqual(tokenize('বাংলায় গান গাই।'), ['বাংলায়', 'গান', 'গাই'])
+        with CaptureQueriesContext(connection) as queries:
+            found = self.results(q='বাং')
+        self.assertEqual(found[:2], [('topic', self.grammar.id), ('topic', self.history.id)])
+        self.assertEqual(len(queries), 1)
+        self.assertIn('MATCH', queries[0]['sql'])
+        self.assertNotIn('LIKE', queries[0]['sql'].upper())
+
+        self.assertEqual(self.results(q='সমা', type='topic'), [('topic', self.grammar.id)])
+        self.assertEqual(self.results(q='সমাস', type='question'), [('question', self.question.id)])
+        self.assertEqual(self.results(q='GRAMMAR bas'), [('topic', self.history.id)])
+        self.assertEqual(self.results(q='grammar ইতিহাস', course=self.course.id), [('topic', self.history.id)])
+        self.assertEqual(self.results(q='grammar', course=self.course.id + 1), [])
+        self.assertEqual(self.client.get('/api/search/').status_code, 400)
+        self.assertEqual(self.client.get('/api/search/', {'q': 'x', 'type': 'user'}).status_code, 400)
+
+    def test_index_follows_edits(self):
+        self.history.title = 'Rivers'
+        self.history.save()
+        self.assertEqual(self.results(q='grammar'), [])
+        self.assertEqual(self.results(q='river'), [('topic', self.history.id)])
+
+        # Moving a chapter moves its documents to the other course
+        other = Course.objects.create(title='Other', description='')
+        chapter = self.history.chapter
+        chapter.course = other
+        chapter.save()
+        self.assertEqual(self.results(q='river', course=other.id), [('topic', self.history.id)])
+        self.assertEqual(self.results(q='সমাস', type='question', course=other.id), [('question', self.question.id)])
+
+        self.history.delete()
+        self.assertEqual(self.results(q='river'), [])
+
+        fields = ('kind', 'object_id', 'course_id', 'title', 'title_terms', 'body_terms')
+        incremental = sorted(SearchDocument.objects.values_list(*fields))
+        rebuild_search_index(batch_size=5)
+        self.assertEqual(sorted(SearchDocument.objects.values_list(*fields)), incremental)
+        self.assertEqual(self.results(q='সন্ধি'), [('topic', self.grammar.id)])
+
+    def test_unavailable_backend(self):
+        with mock.patch.dict('api.search.QUERY_BUILDERS', clear=True):
+            response = self.client.get('/api/search/?q=topic')
+        self.assertEqual(response.status_code, 501)
+        self.assertIn('not available', response.json()['error'])
+
+    def test_migration_backfill_matches_index(self):
+        migration = importlib.import_module('api.migrations.0014_search_documents')
+        fields = ('kind', 'object_id', 'course_id', 'title', 'title_terms', 'body_terms')
+        indexed = sorted(SearchDocument.objects.values_list(*fields))
+        SearchDocument.objects.all().delete()
+        migration.index_existing_content(django_apps, None)
+        self.assertEqual(sorted(SearchDocument.objects.values_list(*fields)), indexed)
+
+
+class ChangeLogTests(APITestCase):
+    """
+    /api/courses/<id>/changes/ hands out the rows saved and deleted since a
+    cursor; compaction and moves send old cursors back to a full resync.
+    """
+    def setUp(self):
+        self.course = build_course(0, chapters=1, topics=2)
+        self.chapter = Chapter.objects.get(course=self.course)
+        self.topic = Topic.objects.filter(chapter=self.chapter).first()
+        self.url = f'/api/courses/{self.course.id}/changes/'
+
+    def changes(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_upserts_and_tombstones(self):
+        start = self.changes()
+        self.assertTrue(start['resync'])
+
+        self.topic.title = 'Draft'
+        self.topic.save()
+        self.topic.title = 'Renamed'
+        self.topic.article_content = '<p>New <script>x()</script>text</p>'
+        self.topic.save()
+        question = Question.objects.filter(quiz__topic=self.topic).first()
+        question_id, answer_ids = question.id, sorted(question.answers.values_list('id', flat=True))
+        question.delete()
+        chapter = Chapter.objects.create(course=self.course, title='Extra', order=5)
+
+        delta = self.changes(start['cursor'])
+        self.assertFalse(delta['resync'])
+        self.assertFalse(delta['more'])
+        self.assertEqual(delta['upserts']['topics'], [{
+            'id': self.topic.id, 'chapter_id': self.chapter.id, 'title': 'Renamed', 'video_url': None,
+            'article_content': '<p>New text</p>', 'word_count': 2, 'reading_minutes': 1, 'order': 0,
+        }])
+        self.assertEqual(delta['upserts']['chapters'], [
+            {'id': chapter.id, 'course_id': self.course.id, 'title': 'Extra', 'order': 5},
+        ])
+        self.assertEqual(delta['deleted'], {'questions': [question_id], 'answers': answer_ids})
+        self.assertEqual(
+            self.changes(delta['cursor']),
+            {'course_id': self.course.id, 'resync': False, 'cursor': delta['cursor'],
+             'more': False, 'upserts': {}, 'deleted': {}},
+        )
+
+        first = self.changes(start['cursor'], limit=1)
+        self.assertTrue(first['more'])
+        self.assertEqual(first['upserts'], {'topics': [first['upserts']['topics'][0]]})
+        self.assertEqual(self.client.get(self.url, {'since': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/courses/999999/changes/').status_code, 404)
+
+    def test_compaction_and_resync(self):
+        start = self.changes()['cursor']
+        for title in ('One', 'Two', 'Three'):
+            self.topic.title = title
+            self.topic.save()
+        removed = Topic.objects.filter(chapter=self.chapter).last()
+        removed.delete()
+        middle = self.changes(start)['cursor']
+        self.topic.title = 'Four'
+        self.topic.save()
+
+        superseded, pruned = compact_change_log(tombstone_days=0, now=timezone.now() + timedelta(seconds=1))
+        self.assertGreaterEqual(superseded, 3)
+        self.assertGreater(pruned, 0)
+        self.assertFalse(ContentChange.objects.filter(deleted=True).exists())
+        # Behind an expired tombstone: resync; past it, the compacted log
+        self.assertTrue(self.changes(start)['resync'])
+        delta = self.changes(middle)
+        self.assertEqual(delta['upserts']['topics'][0]['title'], 'Four')
+        self.assertTrue(self.changes(delta['cursor'] + 1000)['resync'])
+
+        # A chapter moved away: tombstone here, resync there
+        other = Course.objects.create(title='Other', description='')
+        other_cursor = self.client.get(f'/api/courses/{other.id}/changes/').json()['cursor']
+        before_move = self.changes(delta['cursor'])['cursor']
+        self.chapter.course = other
+        self.chapter.save()
+        self.assertEqual(self.changes(before_move)['deleted'], {'chapters': [self.chapter.id]})
+        moved = self.client.get(f'/api/courses/{other.id}/changes/', {'since': other_cursor}).json()
+        self.assertTrue(moved['resync'])
+
+        other.delete()
+        self.assertFalse(ContentChange.objects.filter(course_id=other.id).exists())
+
+
+    def test_published_course_logs_publishes_only(self):
+        publish_course(self.course.id)
+        start = self.changes()['cursor']
+        self.topic.title = 'Draft'
+        self.topic.save()
+        question = Question.objects.filter(quiz__topic=self.topic).first()
+        question_id = question.id
+        question.delete()
+        # Draft edits of a published course stay out of the log
+        self.assertEqual(self.changes(start)['cursor'], start)
+
+        self.topic.title = 'Published'
+        self.topic.save()
+        publish_course(self.course.id)
+        delta = self.changes(start)
+        self.assertEqual(list(delta['upserts']), ['topics'])
+        self.assertEqual([row['title'] for row in delta['upserts']['topics']], ['Published'])
+        self.assertEqual(delta['deleted']['questions'], [question_id])
+
+        # Later drafts are served as published until the course is unpublished
+        self.topic.title = 'Later draft'
+        self.topic.save()
+        self.assertEqual(self.changes(start)['upserts']['topics'][0]['title'], 'Published')
+        unpublish_course(self.course.id)
+        delta = self.changes(delta['cursor'])
+        self.assertEqual([row['title'] for row in delta['upserts']['topics']], ['Later draft'])
+        self.assertEqual(delta['deleted'], {})
+
+class MetricsTests(APITestCase):
+    """
+    PerformanceMiddleware records every request by view and /metrics
+    exposes the numbers in the Prometheus text format.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = build_course(0, chapters=1, topics=2)
+
+    def setUp(self):
+        registry.clear()
+        cache.clear()
+        course_tree_cache.clear()
+
+    def test_records_requests_by_view(self):
+        self.client.get(f'/api/courses/{self.course.id}/')
+        self.client.get('/api/courses/')
+        data = registry.snapshot()
+        self.assertEqual(data['course-detail']['requests'], {('GET', 200): 1})
+        self.assertGreater(data['course-detail']['queries'], 0)
+        self.assertGreater(data['course-detail']['render_time'], 0)
+        self.assertGreater(data['course-list']['render_time'], 0)
+
+        with self.settings(INTERNAL_IPS=['127.0.0.1']):
+            body = self.client.get('/metrics').content.decode()
+        self.assertIn('http_requests_total{view="course-detail",method="GET",status="200"} 1', body)
+        self.assertIn('http_request_duration_seconds_count{view="course-list"} 1', body)
+        self.assertIn('http_request_db_queries_total{view="course-detail"}', body)
+
+    async def test_async_requests_count_queries(self):
+        # Under ASGI the ORM runs in sync_to_async threads, each with its own connections
+        response = await self.async_client.get(f'/api/courses/{self.course.id}/', headers={'Accept-Encoding': 'identity'})
+        self.assertEqual(response.status_code, 200)
+        with self.settings(PERF_METRICS={'SERVER_TIMING': True}):
+            response = await self.async_client.get('/api/courses/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        data = registry.snapshot()
+        self.assertGreater(data['course-detail']['queries'], 0)
+        self.assertGreater(data['course-detail']['db_time'], 0)
+
+    def test_server_timing_header(self):
+        with self.settings(PERF_METRICS={'SERVER_TIMING': True}):
+            response = self.client.get('/api/courses/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", render;dur=[\d.]+, total;dur=[\d.]+$')
+        with self.settings(PERF_METRICS={'SERVER_TIMING': False}):
+            self.assertNotIn('Server-Timing', self.client.get('/api/courses/'))
+
+    def test_metrics_token(self):
+        with self.settings(PERF_METRICS={'TOKEN': 'secret'}, INTERNAL_IPS=['127.0.0.1']):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_metrics_without_token(self):
+        with self.settings(PERF_METRICS={}):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            with self.settings(INTERNAL_IPS=['10.0.0.5']):
+                self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, 200)
+                self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.6').status_code, 403)
+            with self.settings(DEBUG=True):
+                self.assertEqual(self.client.get('/metrics').status_code, 200)
+            self.client.force_login(User.objects.create_user('ops', password='pass12345!', is_staff=True))
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+# URLconf for AsyncViewTests: the async views at the paths backend/asgi.py serves them on
+urlpatterns = [
+    path('api/submit-quiz/', AsyncSubmitQuizView.as_view()),
+    path('api/submit-game/', AsyncSubmitGameView.as_view()),
+    path('api/topics/<int:topic_id>/mark-complete/', AsyncMarkTopicCompleteView.as_view()),
+    path('api/courses/<int:course_id>/my-progress/', AsyncCourseProgressView.as_view(), name='course-progress'),
+]
+
+
+@override_settings(ROOT_URLCONF='api.tests')
+class AsyncViewTests(TestCase):
+    """
+    The async write endpoints behave like their DRF counterparts.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = build_course(0, chapters=1, topics=3)
+        cls.user = User.objects.create_user('student', password='pass12345!')
+
+    def setUp(self):
+        answer_key_cache.clear()
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def post(self, url, data=None, **headers):
+        return await self.async_client.post(
+            url, data or {}, content_type='application/json', headers={**self.headers, **headers}
+        )
+
+    async def test_submit_quiz(self):
+        quiz = await Quiz.objects.filter(topic__chapter__course=self.course).afirst()
+        answers = await sync_to_async(answers_for)(quiz)
+        response = await self.post('/api/submit-quiz/', {'quiz_id': quiz.id, 'answers': answers})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['score'], 100)
+        self.assertEqual(response.json()['user'], 'student')
+
+        summary = await QuizScoreSummary.objects.aget(user=self.user, quiz=quiz)
+        self.assertEqual((summary.best_score, summary.attempt_count), (100, 1))
+        stats = await UserCourseStats.objects.aget(user=self.user, course=self.course)
+        self.assertEqual((stats.completed_topics, stats.quiz_attempt_count), (1, 1))
+
+        response = await self.post('/api/submit-quiz/', {'quiz_id': 0, 'answers': {}})
+        self.assertEqual(response.status_code, 404)
+        response = await self.post('/api/submit-quiz/', {'quiz_id': quiz.id, 'answers': []})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_submit_game_and_mark_topic(self):
+        game = await MatchingGame.objects.select_related('topic').filter(topic__chapter__course=self.course).afirst()
+        response = await self.post('/api/submit-game/', {'game_id': game.id, 'score': 100})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertTrue(await GameScoreSummary.objects.filter(user=self.user, game=game).aexists())
+
+        # The game already completed its topic; marking it again changes nothing
+        response = await self.post(f'/api/topics/{game.topic.id}/mark-complete/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['completed'])
+        stats = await UserCourseStats.objects.aget(user=self.user, course=self.course)
+        self.assertEqual(stats.completed_topics, 1)
+
+    async def test_game_attempt_rolls_back_with_summary(self):
+        game = await MatchingGame.objects.filter(topic__chapter__course=self.course).afirst()
+        with mock.patch('api.attempts.upsert_score_summaries', side_effect=DatabaseError):
+            response = await self.post('/api/submit-game/', {'game_id': game.id, 'score': 100})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(await GameAttempt.objects.filter(user=self.user).aexists())
+
+    async def test_progress_pages(self):
+        async for topic in Topic.objects.select_related('chapter').filter(chapter__course=self.course):
+            await amark_topic_completed(self.user, topic)
+        seen, url = [], f'/api/courses/{self.course.id}/my-progress/?page_size=2'
+        while url:
+            response = await self.async_client.get(url, headers=self.headers)
+            self.assertEqual(response.status_code, 200)
+            seen += [row['topic'] for row in response.json()['results']]
+            url = response.json()['next']
+        self.assertEqual(len(seen), 3)
+        self.assertEqual(seen, sorted(seen))
+
+    async def test_authentication(self):
+        response = await self.post('/api/submit-game/', {'game_id': 1, 'score': 100}, Authorization='')
+        self.assertEqual(response.status_code, 401)
+        response = await self.post('/api/submit-game/', {'game_id': 1, 'score': 100}, Authorization='Bearer nonsense')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+
+
+class WriteBehindTests(APITestCase):
+    """
+    In write-behind mode submissions are journaled and acknowledged with 202;
+    a flush writes them with the same effect as the synchronous path.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = build_course(0, chapters=1, topics=2)
+        cls.users = [User.objects.create_user(f'student{n}', password='pass12345!') for n in range(3)]
+
+    def setUp(self):
+        answer_key_cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.config = {
+            'ENABLED': True, 'PATH': os.path.join(directory, 'queue.sqlite3'),
+            'MAX_PENDING': 4, 'ENQUEUE_TIMEOUT': 0, 'BACKGROUND': False,
+        }
+        override = self.settings(SUBMISSION_WRITE_BEHIND=self.config)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def submit_quiz(self, user, quiz):
+        self.client.force_authenticate(user)
+        return self.client.post('/api/submit-quiz/', {'quiz_id': quiz.id, 'answers': answers_for(quiz)}, format='json')
+
+    def test_queued_then_flushed(self):
+        quiz = Quiz.objects.filter(topic__chapter__course=self.course).first()
+        game = MatchingGame.objects.filter(topic__chapter__course=self.course).first()
+        for user in self.users:
+            response = self.submit_quiz(user, quiz)
+            self.assertEqual(response.status_code, 202, response.content)
+            self.assertEqual(response.data, {'quiz': quiz.id, 'score': 100.0, 'status': 'queued'})
+        response = self.client.post('/api/submit-game/', {'game_id': game.id, 'score': 100}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(QuizAttempt.objects.count(), 0)
+
+        # Savepoint, 2 attempt inserts, per table a previous-best select,
+        # summary upsert and three leaderboard queries, progress select +
+        # insert, rollup upsert, release: the same for any batch size
+        with self.assertNumQueries(17):
+            self.assertEqual(get_writer().drain(), 4)
+        self.assertEqual(len(get_writer().queue), 0)
+        self.assertEqual(QuizAttempt.objects.filter(quiz=quiz).count(), 3)
+        self.assertEqual(QuizScoreSummary.objects.filter(quiz=quiz).count(), 3)
+        self.assertTrue(GameScoreSummary.objects.filter(user=self.users[-1], game=game).exists())
+        for user in self.users:
+            stats = UserCourseStats.objects.get(user=user, course=self.course)
+            self.assertEqual((stats.completed_topics, stats.quiz_attempt_count, stats.quiz_score_sum), (1, 1, 100))
+
+    def test_backpressure(self):
+        quiz = Quiz.objects.filter(topic__chapter__course=self.course).first()
+        for _ in range(4):
+            self.assertEqual(self.submit_quiz(self.users[0], quiz).status_code, 202)
+        response = self.submit_quiz(self.users[0], quiz)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_failed_entry_does_not_block_batch(self):
+        quiz = Quiz.objects.filter(topic__chapter__course=self.course).first()
+        submitted = timezone.now()
+        for user in self.users[:2]:
+            self.submit_quiz(user, quiz)
+        self.config.update(LEASE_SECONDS=0, MAX_ATTEMPTS=2)
+        writer = get_writer()
+        poisoned = self.users[0].id
+
+        def failing(payloads):
+            if any(payload['user_id'] == poisoned for payload in payloads):
+                raise RuntimeError
+            apply_submissions(payloads)
+
+        with mock.patch('api.ingest.apply_submissions', side_effect=failing), self.assertLogs('api.ingest'):
+            self.assertEqual(writer.flush_once(), 1)
+            self.assertEqual(len(writer.queue), 1)
+            self.assertEqual(writer.drain(), 0)
+        # The second failure sets it aside
+        self.assertEqual((len(writer.queue), writer.queue.dead_count()), (0, 1))
+        attempt = QuizAttempt.objects.get()
+        self.assertEqual(attempt.user, self.users[1])
+        # Written with the time it was submitted, not that of the flush
+        summary = QuizScoreSummary.objects.get(user=self.users[1], quiz=quiz)
+        self.assertLess(attempt.timestamp - submitted, timedelta(seconds=1))
+        self.assertEqual(summary.latest_at, attempt.timestamp)
+
+        self.assertEqual(writer.queue.requeue_dead(), 1)
+        self.assertEqual(writer.drain(), 1)
+        self.assertEqual(QuizAttempt.objects.count(), 2)
+
+    def test_late_retry_keeps_latest_score(self):
+        quiz = Quiz.objects.filter(topic__chapter__course=self.course).first()
+        user = self.users[0]
+        earlier = {
+            'type': 'quiz', 'user_id': user.id, 'object_id': quiz.id, 'score': 10.0, 'course_id': self.course.id,
+            'topic_id': None, 'topic_course_id': None, 'submitted_at': timezone.now().isoformat(),
+        }
+        later = {**earlier, 'score': 90.0, 'submitted_at': (timezone.now() + timedelta(minutes=1)).isoformat()}
+        apply_submissions([later])
+        apply_submissions([earlier])
+        summary = QuizScoreSummary.objects.get(user=user, quiz=quiz)
+        self.assertEqual((summary.best_score, summary.latest_score, summary.attempt_count), (90.0, 90.0, 2))
+
+
+class LeaderboardTests(APITestCase):
+    """
+    Course leaderboards follow best scores as they improve, and a rebuild
+    from the summaries gives the same tables.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = build_course(0, chapters=1, topics=2)
+        cls.users = [User.objects.create_user(f'player{n}', password='pass12345!') for n in range(4)]
+        cls.games = list(MatchingGame.objects.filter(topic__chapter__course=cls.course).order_by('id'))
+        cls.course_game = MatchingGame.objects.get(course=cls.course)
+
+    def submit_game(self, user, game, score):
+        self.client.force_authenticate(user)
+        response = self.client.post('/api/submit-game/', {'game_id': game.id, 'score': score}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def leaderboard(self, user, **params):
+        self.client.force_authenticate(user)
+        response = self.client.get(f'/api/courses/{self.course.id}/leaderboard/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def tables(self):
+        return (
+            sorted(LeaderboardEntry.objects.values_list('user_id', 'course_id', 'points')),
+            sorted(LeaderboardScoreCount.objects.filter(learners__gt=0).values_list('course_id', 'points', 'learners')),
+        )
+
+    def test_ranks_and_ties(self):
+        first, second, third, idle = self.users
+        self.submit_game(first, self.games[0], 90)
+        self.submit_game(first, self.course_game, 40)   # another item adds up: 130
+        self.submit_game(second, self.games[1], 80)
+        self.submit_game(third, self.games[0], 79.5)    # rounds to 80: ties with second
+
+        data = self.leaderboard(third)
+        self.assertEqual(data['learners'], 3)
+        self.assertEqual(
+            [(row['rank'], row['user'], row['points']) for row in data['top']],
+            [(1, 'player0', 130), (2, 'player1', 80), (2, 'player2', 80)],
+        )
+        self.assertEqual(data['me'], {'rank': 2, 'points': 80})
+        self.assertEqual(self.leaderboard(idle)['me'], {'rank': 4, 'points': 0})
+        self.assertEqual(len(self.leaderboard(idle, limit=1)['top']), 1)
+
+    def test_only_improvements_count(self):
+        user = self.users[0]
+        self.submit_game(user, self.games[0], 50)
+        self.submit_game(user, self.games[0], 30)
+        self.submit_game(user, self.games[0], 70)
+        self.assertEqual(self.leaderboard(user)['me'], {'rank': 1, 'points': 70})
+        self.assertEqual(self.tables()[1], [(self.course.id, 70, 1)])
+
+    def test_game_attempt_rolls_back_with_summary(self):
+        self.client.force_authenticate(self.users[0])
+        with mock.patch('api.attempts.upsert_score_summaries', side_effect=DatabaseError):
+            response = self.client.post('/api/submit-game/', {'game_id': self.games[0].id, 'score': 50}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(GameAttempt.objects.exists())
+
+    def test_scores_are_bounded(self):
+        user = self.users[0]
+        self.submit_game(user, self.games[0], 1e9)
+        self.assertEqual(GameAttempt.objects.get(user=user).score, 100.0)
+        self.assertEqual(self.leaderboard(user)['me'], {'rank': 1, 'points': 100})
+        for score in ('nan', 'inf', '-Infinity', 'lots'):
+            response = self.client.post('/api/submit-game/', {'game_id': self.games[1].id, 'score': score}, format='json')
+            self.assertEqual(response.status_code, 400, score)
+        self.assertEqual(item_points(float('inf')), 0)
+        self.assertEqual(item_points(250), 100)
+
+    def test_rebuild_matches_incremental(self):
+        for n, user in enumerate(self.users):
+            for game in self.games[:n + 1]:
+                self.submit_game(user, game, 20 * n + 15)
+        quiz = Quiz.objects.filter(topic__chapter__course=self.course).first()
+        self.client.force_authenticate(self.users[0])
+        self.client.post('/api/submit-quiz/', {'quiz_id': quiz.id, 'answers': answers_for(quiz)}, format='json')
+
+        incremental = self.tables()
+        call_command('rebuild_leaderboards', stdout=StringIO())
+        self.assertEqual(self.tables(), incremental)
+
+
+    def test_deletions_lower_points(self):
+        first, second, third, _ = self.users
+        for game in self.games:
+            self.submit_game(first, game, 90)
+        self.submit_game(second, self.games[0], 50)
+        self.submit_game(second, self.games[0], 100)
+        self.submit_game(third, self.games[1], 70)
+        self.assertEqual(self.leaderboard(second)['me']['rank'], 2)
+
+        # Without its best attempt second is back to 50, below third
+        with self.captureOnCommitCallbacks(execute=True):
+            GameAttempt.objects.filter(user=second, score=100).delete()
+        self.assertEqual(self.leaderboard(second)['me'], {'rank': 3, 'points': 50})
+        # A deleted game takes its points from everyone who played it
+        with self.captureOnCommitCallbacks(execute=True):
+            self.games[1].delete()
+        self.assertEqual(self.leaderboard(third)['me'], {'rank': 3, 'points': 0})
+        self.assertFalse(LeaderboardEntry.objects.filter(user=third).exists())
+
+        incremental = self.tables()
+        call_command('rebuild_leaderboards', stdout=StringIO())
+        self.assertEqual(self.tables(), incremental)
+
+class CourseSnapshotTests(APITestCase):
+    """
+    Published courses are served from their immutable snapshot; draft edits
+    show up only after publishing again.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = build_course(0, chapters=1, topics=2)
+
+    def setUp(self):
+        cache.clear()
+        course_tree_cache.clear()
+        self.url = f'/api/courses/{self.course.id}/'
+
+    def test_published_bytes_survive_draft_edits(self):
+        live = self.client.get(self.url).content
+        snapshot = publish_course(self.course.id)
+        self.assertEqual(bytes(snapshot.body), live)
+        self.assertEqual(bytes(snapshot.body), render_course_tree(self.course.id))
+
+        chapter = self.course.chapters.first()
+        chapter.title = 'Draft title'
+        chapter.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.content, live)
+        self.assertEqual(response['ETag'], f'"course-{self.course.id}-p1"')
+        # Sparse/expanded variants keep rendering the live tree
+        self.assertIn('Draft title', self.client.get(self.url + '?fields=chapters.title').content.decode())
+
+        self.assertEqual(publish_course(self.course.id).version, 2)
+        self.assertIn('Draft title', self.client.get(self.url).content.decode())
+
+    def test_precompressed_variant(self):
+        publish_course(self.course.id)
+        plain = self.client.get(self.url)
+        compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        refused = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(refused.has_header('Content-Encoding'))
+
+    def test_graded_against_published_answers(self):
+        answer_key_cache.clear()
+        quiz = Quiz.objects.filter(topic__chapter__course=self.course).first()
+        published = answers_for(quiz)
+        publish_course(self.course.id)
+        # A draft edit moves the correct answer of every question
+        for question in quiz.questions.all():
+            for answer in question.answers.all():
+                answer.is_correct = not answer.is_correct
+                answer.save()
+        self.client.force_authenticate(User.objects.create_user('learner', password='pass12345!'))
+
+        def submit():
+            response = self.client.post('/api/submit-quiz/', {'quiz_id': quiz.id, 'answers': published}, format='json')
+            return response.data['score']
+
+        self.assertEqual(submit(), 100.0)
+        publish_course(self.course.id)
+        self.assertEqual(submit(), 0.0)
+        unpublish_course(self.course.id)
+        self.assertEqual(submit(), 0.0)
+
+    def test_snapshots_are_immutable(self):
+        snapshot = publish_course(self.course.id)
+        snapshot.body = b'{}'
+        with self.assertRaises(ValueError):
+            snapshot.save()
+
+    def test_publish_only_changed(self):
+        call_command('publish_courses', '--all', stdout=StringIO())
+        call_command('publish_courses', '--all', '--changed', stdout=StringIO())
+        self.assertEqual(CourseSnapshot.objects.filter(course=self.course).count(), 1)
+        Topic.objects.filter(chapter__course=self.course).first().save()
+        call_command('publish_courses', '--all', '--changed', stdout=StringIO())
+        self.assertEqual(CourseSnapshot.objects.filter(course=self.course).count(), 2)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
@@ -7,9 +8,24 @@ from .views import (
     SubmitGameView, 
     CourseProgressView, 
     UserDashboardStatsView,
-    MarkTopicCompleteView # <-- এটি ফিরিয়ে আনা হয়েছে
+    MarkTopicCompleteView, # <-- এটি ফিরিয়ে আনা হয়েছে
+    SyncEventsView,
+    QuizAttemptHistoryView,
+    GameAttemptHistoryView,
+    CourseLeaderboardView,
+    SearchView,
+    CourseChangesView,
+    AsyncSubmitQuizView,
+    AsyncSubmitGameView,
+    AsyncCourseProgressView,
+    AsyncMarkTopicCompleteView,
 )
 
+# Under ASGI the write endpoints are served by their async versions
+if getattr(settings, 'ASYNC_API_VIEWS', False):
+    SubmitQuizView, SubmitGameView = AsyncSubmitQuizView, AsyncSubmitGameView
+    CourseProgressView, MarkTopicCompleteView = AsyncCourseProgressView, AsyncMarkTopicCompleteView
+
 router = DefaultRouter()
 router.register(r'courses', CourseViewSet, basename='course')
 
@@ -18,8 +34,14 @@ urlpatterns = [
     path('register/', UserRegistrationView.as_view(), name='register'),
     path('submit-quiz/', SubmitQuizView.as_view(), name='submit-quiz'),
     path('submit-game/', SubmitGameView.as_view(), name='submit-game'),
+    path('sync/', SyncEventsView.as_view(), name='sync-events'),
     path('courses/<int:course_id>/my-progress/', CourseProgressView.as_view(), name='course-progress'),
+    path('courses/<int:course_id>/leaderboard/', CourseLeaderboardView.as_view(), name='course-leaderboard'),
+    path('courses/<int:course_id>/changes/', CourseChangesView.as_view(), name='course-changes'),
+    path('quizzes/<int:quiz_id>/my-attempts/', QuizAttemptHistoryView.as_view(), name='quiz-attempt-history'),
+    path('games/<int:game_id>/my-attempts/', GameAttemptHistoryView.as_view(), name='game-attempt-history'),
     path('dashboard-stats/', UserDashboardStatsView.as_view(), name='dashboard-stats'),
+    path('search/', SearchView.as_view(), name='search'),
     
     # ----- এটিই সেই URL যা আমরা ফিরিয়ে আনছি -----
     path('topics/<int:topic_id>/mark-complete/', MarkTopicCompleteView.as_view(), name='mark-topic-complete'),
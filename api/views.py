@@ -1,35 +1,196 @@
+import hashlib
+import json
+import logging
 
 
+
+from asgiref.sync import sync_to_async
 from rest_framework import viewsets, generics, permissions, status
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework.request import Request
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Avg
+from django.http import Http404, JsonResponse
+from django.utils.decorators import classonlymethod, method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+from django.db import transaction
+from django.db.models import Count, Max, Sum
 
 # Import Models
 from .models import (
     Course, Topic, 
     Quiz, UserProgress, QuizAttempt,
-    MatchingGame, GameAttempt 
+    MatchingGame, GameAttempt, UserCourseStats
 )
 # Import Serializers
 from .serializers import (
-    CourseSerializer, UserRegistrationSerializer, UserProgressSerializer, QuizAttemptSerializer,
+    CourseSerializer, CourseSummarySerializer, UserRegistrationSerializer, UserProgressSerializer, QuizAttemptSerializer,
     GameAttemptSerializer
 )
+from .renderers import FastJSONRenderer
+from .pagination import IdCursorPagination, TimestampCursorPagination
+from .fieldsets import FieldSelection, deferred_fields, tree_prefetches
+from .course_cache import course_tree_cache, COURSE_TREE_FORMAT
+from .attempts import record_quiz_attempts, record_game_attempts, arecord_game_attempt
+from .authentication import AsyncJWTAuthentication, TokenUserAuthentication
+from .grading import (
+    InvalidSubmission, answer_key_cache, aget_quiz_for_grading, answer_key_version,
+    get_quiz_for_grading, grade_quiz, parse_answers, parse_score,
+)
+from .sync import apply_sync_events
+from .ingest import get_writer, queue_submission
+from .stats import amark_topic_completed, mark_topic_completed
+from .metrics import time_render
+from .routers import pin_to_primary
+from .leaderboards import learner_rank, top_learners
+from .snapshots import snapshot_body
+from .compression import compress, compressed_response
+from .search import SOURCES as SEARCH_SOURCES, SearchUnavailable, search
+from .changelog import changes_since, latest_cursor
+
+logger = logging.getLogger(__name__)
+
+# --- Conditional GET validators (ETag / Last-Modified) ---
+# Both are derived from Course.content_version/content_updated_at, so a matching
+# If-None-Match is answered with 304 before anything is serialized or prefetched.
+def _course_content_state(request, pk=None):
+    state = getattr(request, '_course_content_state', None)
+    if state is not None:
+        return state
+    if pk is not None:
+        try:
+            row = Course.objects.filter(pk=pk).values(
+                'id', 'content_version', 'content_updated_at', 'published_version', 'published_at',
+            ).first()
+        except (TypeError, ValueError):
+            row = None
+        if row is None and pin_to_primary():
+            # Maybe just created and not on the replica yet (api/routers.py)
+            return _course_content_state(request, pk)
+        if row is None:
+            state = {'course': None, 'etag': None, 'last_modified': None}
+        elif row['published_version'] and not request.GET:
+            # The published snapshot (api/snapshots.py), whatever the draft says
+            state = {
+                'course': row,
+                'etag': f'course-{row["id"]}-p{row["published_version"]}',
+                'last_modified': row['published_at'],
+            }
+        else:
+            etag = f'course-{row["id"]}-v{row["content_version"]}-f{COURSE_TREE_FORMAT}'
+            if request.GET:
+                # ?fields= / ?expand= select a different representation
+                etag += '-' + hashlib.sha1(request.GET.urlencode().encode()).hexdigest()[:12]
+            state = {
+                'course': row,
+                'etag': etag,
+                'last_modified': row['content_updated_at'],
+            }
+    else:
+        # Any edit, addition or removal changes one of these aggregates
+        agg = Course.objects.aggregate(
+            count=Count('id'), max_id=Max('id'),
+            versions=Sum('content_version'), last_modified=Max('content_updated_at'),
+        )
+        fingerprint = f'{agg["count"]}:{agg["max_id"]}:{agg["versions"]}:{request.GET.urlencode()}'
+        state = {
+            'course': None,
+            'etag': 'courses-' + hashlib.sha1(fingerprint.encode()).hexdigest()[:20],
+            'last_modified': agg['last_modified'],
+        }
+    request._course_content_state = state
+    return state
+
+def course_etag(request, *args, **kwargs):
+    return _course_content_state(request, kwargs.get('pk'))['etag']
+
+def course_last_modified(request, *args, **kwargs):
+    return _course_content_state(request, kwargs.get('pk'))['last_modified']
 
 # --- Course ViewSet ---
 class CourseViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Course.objects.all().prefetch_related(
-        'chapters__topics__topic_quiz__questions__answers',
-        'chapters__topics__matching_game__pairs',
-        'chapters__chapter_quiz__questions__answers',
-        'chapters__matching_game__pairs',
-        'course_quiz__questions__answers',
-        'matching_game__pairs'
-    )
+    """
+    list: compact course summaries unless the client opts in with ?expand=.
+    retrieve: the full chapter/topic/quiz/game tree; the published snapshot's
+              stored bytes once the course has been published.
+    Both accept ?fields= and ?expand= (see api/fieldsets.py); omitted branches
+    are neither serialized nor prefetched.
+    """
+    queryset = Course.objects.all().order_by('id')
     serializer_class = CourseSerializer
+    pagination_class = IdCursorPagination
+
+    def get_field_selection(self):
+        if not hasattr(self, '_field_selection'):
+            self._field_selection = FieldSelection.from_request(
+                self.request, expand_all=(self.action == 'retrieve')
+            )
+        return self._field_selection
+
+    def wants_full_tree(self):
+        if self.action == 'retrieve':
+            return True
+        return bool(self.request.query_params.get('expand'))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['field_selection'] = self.get_field_selection()
+        return context
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.wants_full_tree():
+            serializer = self.get_serializer()
+            return queryset.defer(*deferred_fields(serializer)).prefetch_related(*tree_prefetches(serializer))
+        return queryset.annotate(
+            chapter_count=Count('chapters', distinct=True),
+            topic_count=Count('chapters__topics', distinct=True),
+        )
+
+    def get_serializer_class(self):
+        if self.wants_full_tree():
+            return CourseSerializer
+        return CourseSummarySerializer
+
+    @method_decorator(condition(etag_func=course_etag, last_modified_func=course_last_modified))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @method_decorator(condition(etag_func=course_etag, last_modified_func=course_last_modified))
+    def retrieve(self, request, *args, **kwargs):
+        course = _course_content_state(request, kwargs[self.lookup_field])['course']
+        if course is None:
+            raise Http404
+
+        if course['published_version'] and not request.GET:
+            body = snapshot_body(course['id'], course['published_version'])
+            if body:
+                return compressed_response(
+                    request, body,
+                    lambda encoding: snapshot_body(course['id'], course['published_version'], encoding),
+                )
+
+        def render():
+            serializer = self.get_serializer(self.get_object())
+            with time_render():
+                return FastJSONRenderer().render(serializer.data)
+
+        # Rendered tree bytes, and their compressed forms, are cached per
+        # content_version (api/course_cache.py, api/compression.py)
+        variant = self.get_field_selection().cache_variant
+        body = course_tree_cache.get_or_render(course['id'], course['content_version'], render, variant=variant)
+        return compressed_response(
+            request, body,
+            lambda encoding: course_tree_cache.get_or_render(
+                course['id'], course['content_version'],
+                lambda: compress(body, encoding, cached=True), variant=f'{variant}:{encoding}',
+            ),
+        )
 
 # --- User Registration ---
 class UserRegistrationView(generics.CreateAPIView):
@@ -37,33 +198,41 @@ class UserRegistrationView(generics.CreateAPIView):
     permission_classes = (permissions.AllowAny,)
     serializer_class = UserRegistrationSerializer
 
+def _queued_response(status_code, data, headers):
+    return Response(data, status=status_code, headers=headers)
+
 # --- Submit Quiz Score ---
 class SubmitQuizView(APIView):
+    """
+    Grades the submitted {question_id: answer_id} map on the server
+    (api/grading.py) and stores the resulting score.
+    """
     permission_classes = [IsAuthenticated]
     def post(self, request, *args, **kwargs):
         quiz_id = request.data.get('quiz_id')
-        score = request.data.get('score')
+        answers = request.data.get('answers')
         user = request.user
 
-        if quiz_id is None or score is None:
-            return Response({"error": "quiz_id and score are required."}, status=status.HTTP_400_BAD_REQUEST)
+        if quiz_id is None or answers is None:
+            return Response({"error": "quiz_id and answers are required."}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            quiz = Quiz.objects.get(id=quiz_id)
-            attempt, created = QuizAttempt.objects.update_or_create(
-                user=user, quiz=quiz, defaults={'score': score} 
-            )
+            answers = parse_answers(answers)
+            quiz = get_quiz_for_grading(quiz_id)
+            score = grade_quiz(quiz, answers)
+            writer = get_writer()
+            if writer is not None: # Write-behind mode (api/ingest.py)
+                return _queued_response(*queue_submission(writer, 'quiz', user, quiz, score))
+            with transaction.atomic():
+                attempt, = record_quiz_attempts(user, [(quiz.id, score)], {quiz.id: quiz.get_course_id()})
             serializer = QuizAttemptSerializer(attempt)
             if quiz.topic: # Automatic Topic Completion
                 try:
-                    progress, progress_created = UserProgress.objects.get_or_create(
-                        user=user, topic=quiz.topic, defaults={'completed': True}
-                    )
-                    if not progress_created and not progress.completed:
-                        progress.completed = True
-                        progress.save()
-                except Exception as e:
-                    print(f"Error updating progress for topic {quiz.topic.id}: {e}") 
-            return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+                    mark_topic_completed(user, quiz.topic)
+                except Exception:
+                    logger.exception("Error updating progress for topic %s", quiz.topic.id)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        except InvalidSubmission as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Quiz.DoesNotExist:
             return Response({"error": "Quiz not found"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
@@ -80,49 +249,169 @@ class SubmitGameView(APIView):
         if game_id is None or score is None:
             return Response({"error": "game_id and score are required."}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            game = MatchingGame.objects.get(id=game_id)
-            attempt, created = GameAttempt.objects.update_or_create(
-                user=user, game=game, defaults={'score': score} 
-            )
+            score = parse_score(score)
+            game = MatchingGame.objects.select_related('topic__chapter', 'chapter').get(id=game_id)
+            writer = get_writer()
+            if writer is not None: # Write-behind mode (api/ingest.py)
+                return _queued_response(*queue_submission(writer, 'game', user, game, score))
+            with transaction.atomic():
+                attempt, = record_game_attempts(user, [(game.id, score)])
             serializer = GameAttemptSerializer(attempt)
             if game.topic: # Automatic Topic Completion
                 try:
-                    progress, progress_created = UserProgress.objects.get_or_create(
-                        user=user, topic=game.topic, defaults={'completed': True}
-                    )
-                    if not progress_created and not progress.completed:
-                        progress.completed = True
-                        progress.save()
-                except Exception as e:
-                    print(f"Error updating progress for topic {game.topic.id} via game: {e}") 
-            return Response(serializer.data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+                    mark_topic_completed(user, game.topic)
+                except Exception:
+                    logger.exception("Error updating progress for topic %s via game", game.topic.id)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        except InvalidSubmission as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except MatchingGame.DoesNotExist:
             return Response({"error": "MatchingGame not found"}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
 
+# --- Batch Offline Sync ---
+class SyncEventsView(APIView):
+    """
+    Applies a list of quiz/game/topic-completion events recorded offline in
+    one request (see api/sync.py) and returns a result per event.
+    """
+    permission_classes = [IsAuthenticated]
+    def post(self, request, *args, **kwargs):
+        events = request.data.get('events')
+        if not isinstance(events, list):
+            return Response({"error": "events must be a list."}, status=status.HTTP_400_BAD_REQUEST)
+        max_events = getattr(settings, 'SYNC_MAX_EVENTS', 500)
+        if len(events) > max_events:
+            return Response({"error": f"At most {max_events} events per request."}, status=status.HTTP_400_BAD_REQUEST)
+        results = apply_sync_events(request.user, events)
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
 # --- Get User Progress for a Course ---
 class CourseProgressView(generics.ListAPIView):
     serializer_class = UserProgressSerializer
+    authentication_classes = [TokenUserAuthentication]  # only needs the user id
     permission_classes = [IsAuthenticated]
+    pagination_class = IdCursorPagination
     def get_queryset(self):
         course_id = self.kwargs.get('course_id')
         return UserProgress.objects.filter(
-            user=self.request.user, topic__chapter__course_id=course_id, completed=True 
+            user_id=self.request.user.id, topic__chapter__course_id=course_id, completed=True 
         )
 
+# --- Attempt History ---
+class QuizAttemptHistoryView(generics.ListAPIView):
+    serializer_class = QuizAttemptSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = TimestampCursorPagination
+    def get_queryset(self):
+        return QuizAttempt.objects.filter(user=self.request.user, quiz_id=self.kwargs.get('quiz_id')).select_related('user')
+
+class GameAttemptHistoryView(generics.ListAPIView):
+    serializer_class = GameAttemptSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = TimestampCursorPagination
+    def get_queryset(self):
+        return GameAttempt.objects.filter(user=self.request.user, game_id=self.kwargs.get('game_id')).select_related('user')
+
+# --- Course Leaderboard ---
+class CourseLeaderboardView(APIView):
+    """
+    Top learners of a course by points (each quiz/game's best score, see
+    api/leaderboards.py) plus the caller's own rank. ?limit= defaults to 10.
+    """
+    authentication_classes = [TokenUserAuthentication]  # only needs the user id
+    permission_classes = [IsAuthenticated]
+    default_limit = 10
+    max_limit = 100
+
+    def get(self, request, course_id, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return Response({"error": "limit must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), self.max_limit)
+        me = learner_rank(request.user, course_id)
+        return Response({
+            'course_id': course_id,
+            'learners': me.pop('learners'),
+            'top': top_learners(course_id, limit),
+            'me': me,
+        })
+
+# --- Delta sync ---
+class CourseChangesView(APIView):
+    """
+    What changed in a course since ?since=<cursor> (api/changelog.py): the
+    rows saved since, flat, and the ids deleted since. Without a usable
+    cursor the answer is {"resync": true, "cursor": ...}: download the tree
+    again and continue from that cursor. ?limit= caps the log entries read
+    per request (default 500); "more" asks for another round.
+    """
+    default_limit = 500
+    max_limit = 2000
+
+    def get(self, request, course_id, *args, **kwargs):
+        course = Course.objects.filter(pk=course_id).values('change_floor', 'published_version').first()
+        if course is None:
+            if pin_to_primary():
+                # Maybe just created and not on the replica yet (api/routers.py)
+                return self.get(request, course_id, *args, **kwargs)
+            return Response({"error": "Course not found"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            since = request.query_params.get('since')
+            since = int(since) if since else None
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return Response({"error": "since and limit must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), self.max_limit)
+        floor = course['change_floor']
+        changes = changes_since(course_id, since, limit, floor, published=course['published_version'] is not None)
+        if changes is None:
+            return Response({'course_id': course_id, 'resync': True, 'cursor': latest_cursor(course_id, floor)})
+        return Response({'course_id': course_id, 'resync': False, **changes})
+
+# --- Full-text search ---
+class SearchView(APIView):
+    """
+    Courses, topics, quiz questions and matching pairs matching every word
+    of ?q= (api/search.py), best first. ?type=topic,question narrows the
+    kinds, ?course= to one course; ?limit= defaults to 20, ?offset= pages.
+    """
+    default_limit = 20
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+        kinds = [kind for kind in request.query_params.get('type', '').split(',') if kind]
+        unknown = set(kinds) - set(SEARCH_SOURCES)
+        if unknown:
+            return Response(
+                {"error": f"Unknown type: {', '.join(sorted(unknown))}"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+            offset = int(request.query_params.get('offset', 0))
+            course_id = request.query_params.get('course')
+            course_id = int(course_id) if course_id else None
+        except ValueError:
+            return Response({"error": "limit, offset and course must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), self.max_limit)
+        try:
+            results = search(query, kinds=kinds, course_id=course_id, limit=limit, offset=max(offset, 0))
+        except SearchUnavailable as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        return Response({'query': query, 'results': results})
+
 # --- Mark Topic Complete (Manual) ---
 class MarkTopicCompleteView(APIView):
     permission_classes = [IsAuthenticated]
     def post(self, request, topic_id, *args, **kwargs):
         try:
-            topic = Topic.objects.get(id=topic_id)
-            progress, created = UserProgress.objects.get_or_create(
-                user=request.user, topic=topic, defaults={'completed': True}
-            )
-            if not created and not progress.completed:
-                progress.completed = True
-                progress.save()
+            topic = Topic.objects.select_related('chapter').get(id=topic_id)
+            progress = mark_topic_completed(request.user, topic)
             serializer = UserProgressSerializer(progress)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except Topic.DoesNotExist:
@@ -136,48 +425,168 @@ class UserDashboardStatsView(APIView):
     Calculates and returns statistics for ALL courses for the logged-in user.
     Shows 0% for courses not started.
     """
+    authentication_classes = [TokenUserAuthentication]  # only needs the user id
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        print("!!!!!!!!!! DEBUG: চূড়ান্ত ড্যাশবোর্ড কোডটি চলছে (বাগ ফিক্স সহ) !!!!!!!!!!")
         user = request.user
-        all_courses = Course.objects.all()
+        all_courses = Course.objects.annotate(total_topics=Count('chapters__topics')).order_by('id')
+        # Per-course rollup maintained on write (see api/stats.py)
+        stats_by_course = {
+            stats.course_id: stats for stats in UserCourseStats.objects.filter(user_id=user.id)
+        }
         courses_stats = []
-        
+
         for course in all_courses:
+            stats = stats_by_course.get(course.id)
+            completed_topics_count = stats.completed_topics if stats else 0
+            total_topics_count = course.total_topics
+            completion_percentage = (completed_topics_count / total_topics_count) * 100 if total_topics_count > 0 else 0
+            avg_score = stats.average_quiz_score if stats else None
+
+            courses_stats.append({
+                'course_id': course.id,
+                'course_title': course.title,
+                'total_topics': total_topics_count,
+                'completed_topics': completed_topics_count,
+                'completion_percentage': round(completion_percentage, 2),
+                'average_quiz_score': round(avg_score, 2) if avg_score is not None else None 
+            })
+
+        return Response(courses_stats)
+
+
+# --- Async (ASGI) versions of the write endpoints ---
+# Same URLs, payloads and responses as SubmitQuizView, SubmitGameView,
+# MarkTopicCompleteView and CourseProgressView, but written against the async
+# ORM so a uvicorn worker serves them from its event loop instead of pushing
+# every request through the sync bridge. urls.py picks them when
+# settings.ASYNC_API_VIEWS is on (the default under backend/asgi.py).
+class AsyncAPIView(View):
+    """
+    Base class for the async views: JWT authentication (api/authentication.py),
+    a parsed JSON body in request.data and DRF-style error bodies.
+    """
+    authentication = AsyncJWTAuthentication()
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Token-authenticated like the DRF views, so no CSRF check
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            authenticated = await self.authentication.aauthenticate(request)
+        except AuthenticationFailed as e:
+            return self.unauthorized(e.detail)
+        if authenticated is None:
+            return self.unauthorized(NotAuthenticated.default_detail)
+        request.user, request.auth = authenticated
+
+        request.data = {}
+        if request.body:
             try:
-                total_topics_count = Topic.objects.filter(chapter__course_id=course.id).count()
-                
-                completed_topics_count = UserProgress.objects.filter(
-                    user=user,
-                    topic__chapter__course_id=course.id,
-                    completed=True
-                ).count()
-                
-                completion_percentage = (completed_topics_count / total_topics_count) * 100 if total_topics_count > 0 else 0
-                
-                # --- কুইজের গড় স্কোর গণনার সংশোধিত কোড ---
-                # (এটি এখন টপিক, অধ্যায় এবং কোর্স কুইজ—সবকিছুই হিসাব করবে)
-                topic_quiz_attempts = QuizAttempt.objects.filter(user=user, quiz__topic__chapter__course_id=course.id)
-                chapter_quiz_attempts = QuizAttempt.objects.filter(user=user, quiz__chapter__course_id=course.id)
-                course_quiz_attempts = QuizAttempt.objects.filter(user=user, quiz__course_id=course.id)
-                
-                # সব ধরনের কুইজ অ্যাটেম্পটকে একত্রিত করা
-                latest_attempts = topic_quiz_attempts.union(chapter_quiz_attempts, course_quiz_attempts).distinct()
-                
-                avg_score_data = latest_attempts.aggregate(average_score=Avg('score'))
-                avg_score = avg_score_data.get('average_score')
-                
-                courses_stats.append({
-                    'course_id': course.id,
-                    'course_title': course.title,
-                    'total_topics': total_topics_count,
-                    'completed_topics': completed_topics_count,
-                    'completion_percentage': round(completion_percentage, 2),
-                    'average_quiz_score': round(avg_score, 2) if avg_score is not None else None 
-                })
-            except Exception as e:
-                print(f"Error processing stats for course {course.id}: {e}")
-                continue
-            
-        return Response(courses_stats)
\ No newline at end of file
+                request.data = json.loads(request.body)
+            except ValueError as e:
+                return JsonResponse({"detail": f"JSON parse error - {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        return await super().dispatch(request, *args, **kwargs)
+
+    def unauthorized(self, detail):
+        response = JsonResponse(
+            detail if isinstance(detail, dict) else {"detail": detail}, status=status.HTTP_401_UNAUTHORIZED
+        )
+        response['WWW-Authenticate'] = self.authentication.authenticate_header(request=None)
+        return response
+
+
+def _queued_json_response(status_code, data, headers):
+    return JsonResponse(data, status=status_code, headers=headers)
+
+
+def _save_quiz_submission(user, quiz, score):
+    # Transactions have no async API; this whole unit runs in one sync call
+    with transaction.atomic():
+        attempt, = record_quiz_attempts(user, [(quiz.id, score)], {quiz.id: quiz.get_course_id()})
+    return attempt
+
+
+class AsyncSubmitQuizView(AsyncAPIView):
+    async def post(self, request, *args, **kwargs):
+        quiz_id = request.data.get('quiz_id')
+        answers = request.data.get('answers')
+        user = request.user
+
+        if quiz_id is None or answers is None:
+            return JsonResponse({"error": "quiz_id and answers are required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            answers = parse_answers(answers)
+            quiz = await aget_quiz_for_grading(quiz_id)
+            score = grade_quiz(quiz, answers, await answer_key_cache.aget(quiz, answer_key_version(quiz)))
+            writer = get_writer()
+            if writer is not None: # Write-behind mode (api/ingest.py)
+                return _queued_json_response(*await sync_to_async(queue_submission, thread_sensitive=False)(writer, 'quiz', user, quiz, score))
+            attempt = await sync_to_async(_save_quiz_submission)(user, quiz, score)
+            if quiz.topic: # Automatic Topic Completion
+                try:
+                    await amark_topic_completed(user, quiz.topic)
+                except Exception:
+                    logger.exception("Error updating progress for topic %s", quiz.topic.id)
+            return JsonResponse(QuizAttemptSerializer(attempt).data, status=status.HTTP_201_CREATED)
+        except InvalidSubmission as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Quiz.DoesNotExist:
+            return JsonResponse({"error": "Quiz not found"}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return JsonResponse({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncSubmitGameView(AsyncAPIView):
+    async def post(self, request, *args, **kwargs):
+        game_id = request.data.get('game_id')
+        score = request.data.get('score')
+        user = request.user
+
+        if game_id is None or score is None:
+            return JsonResponse({"error": "game_id and score are required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            score = parse_score(score)
+            game = await MatchingGame.objects.select_related('topic__chapter', 'chapter').aget(id=game_id)
+            writer = get_writer()
+            if writer is not None: # Write-behind mode (api/ingest.py)
+                return _queued_json_response(*await sync_to_async(queue_submission, thread_sensitive=False)(writer, 'game', user, game, score))
+            attempt = await arecord_game_attempt(user, game.id, score)
+            if game.topic: # Automatic Topic Completion
+                try:
+                    await amark_topic_completed(user, game.topic)
+                except Exception:
+                    logger.exception("Error updating progress for topic %s via game", game.topic.id)
+            return JsonResponse(GameAttemptSerializer(attempt).data, status=status.HTTP_201_CREATED)
+        except InvalidSubmission as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except MatchingGame.DoesNotExist:
+            return JsonResponse({"error": "MatchingGame not found"}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return JsonResponse({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncMarkTopicCompleteView(AsyncAPIView):
+    async def post(self, request, topic_id, *args, **kwargs):
+        try:
+            topic = await Topic.objects.select_related('chapter').aget(id=topic_id)
+            progress = await amark_topic_completed(request.user, topic)
+            return JsonResponse(UserProgressSerializer(progress).data, status=status.HTTP_200_OK)
+        except Topic.DoesNotExist:
+            return JsonResponse({"error": "Topic not found"}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncCourseProgressView(AsyncAPIView):
+    async def get(self, request, course_id, *args, **kwargs):
+        queryset = UserProgress.objects.filter(
+            user=request.user, topic__chapter__course_id=course_id, completed=True
+        )
+        paginator = IdCursorPagination()
+        page = await paginator.apaginate_queryset(queryset, Request(request))
+        data = UserProgressSerializer(page, many=True).data
+        return JsonResponse(paginator.get_paginated_data(data))
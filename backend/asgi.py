@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+# Route the write endpoints to their async views (settings.ASYNC_API_VIEWS)
+os.environ.setdefault("DJANGO_ASYNC_API_VIEWS", "1")
 
 application = get_asgi_application()
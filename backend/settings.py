@@ -3,6 +3,7 @@ Django settings for backend project.
 ... (আপনার ফাইলের উপরের সব লেখা) ...
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta # <-- এই লাইনটি না থাকলে যোগ করুন
 
@@ -46,6 +47,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.metrics.PerformanceMiddleware",  # first, so it times the whole stack
+    "api.compression.CompressionMiddleware",
+    "api.routers.ReplicaPinningMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -76,7 +80,7 @@ TEMPLATES = [
 WSGI_APPLICATION = "backend.wsgi.application"
 
 
-# Database
+# Database (the test suite uses SQLite instead: backend/test_settings.py)
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -88,6 +92,19 @@ DATABASES = {
     }
 }
 
+# Read replicas (api/routers.py): DJANGO_DB_REPLICA_HOSTS=host1,host2 adds
+# aliases replica1, replica2, ... with the primary's credentials
+DATABASE_REPLICAS = {
+    "ALIASES": [],
+    "MAX_LAG": 5.0,          # seconds; replicas further behind are skipped
+    "CHECK_INTERVAL": 5.0,   # seconds between lag checks
+    "STICKY_SECONDS": 10,    # reads stay on the primary this long after a client writes
+}
+for _n, _host in enumerate(filter(None, os.environ.get("DJANGO_DB_REPLICA_HOSTS", "").split(",")), start=1):
+    DATABASES[f"replica{_n}"] = {**DATABASES["default"], "HOST": _host.strip()}
+    DATABASE_REPLICAS["ALIASES"].append(f"replica{_n}")
+DATABASE_ROUTERS = ["api.routers.ReplicaRouter"]
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -125,9 +142,22 @@ CKEDITOR_CONFIGS = {
             'uploadimage',
             'codesnippet'
         ]),
+        # Keeps the <picture>/srcset markup api/images.py writes editable
+        'extraAllowedContent': 'picture; source[type,srcset,sizes]; img[srcset,sizes,width,height,loading,decoding]',
     },
 }
 
+# Uploaded images referenced by topic articles are resized and re-encoded
+# (WebP + JPEG/PNG) in a background thread pool and the article gets srcset
+# markup (api/images.py)
+IMAGE_OPTIMIZATION = {
+    "ENABLED": True,
+    "WORKERS": 2,
+    "WIDTHS": (320, 640, 1024, 1600),
+    "WEBP_QUALITY": 75,
+    "JPEG_QUALITY": 80,
+}
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -136,12 +166,114 @@ CORS_ALLOWED_ORIGINS = [
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # simplejwt's JWTAuthentication with users cached per worker
+        'api.authentication.CachedJWTAuthentication',
+    ),
+    # orjson-backed JSON (api/renderers.py); plain DRF behaviour without orjson
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
 }
 
+# Quizzes whose answer key (api/grading.py) is kept in memory per worker
+ANSWER_KEY_CACHE_SIZE = 10000
+
+# Cursor-paginated listings (api/pagination.py); clients may ask for up to
+# API_MAX_PAGE_SIZE rows with ?page_size=
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+
+# Upper bound on events accepted by one POST /api/sync/ request
+SYNC_MAX_EVENTS = 500
+# Days an applied event_id is remembered for retries (manage.py prune_sync_events)
+SYNC_EVENT_ID_DAYS = 30
+
+# Users resolved from access tokens are kept in memory per worker
+# (api/authentication.py); saves/deletes in the same worker evict at once,
+# the TTL bounds how long other workers may use a stale copy. TTL 0 disables.
+JWT_USER_CACHE = {
+    "TTL": 30,
+    "MAX_ENTRIES": 10000,
+}
+
 # SIMPLE_JWT Configuration
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
-}
\ No newline at end of file
+}
+
+# Cache shared by every worker: replica stickiness (api/routers.py) and the
+# shared tier of the course tree cache rely on it. DJANGO_REDIS_URL (e.g.
+# redis://localhost:6379/1) selects Redis; without it each process gets its
+# own memory cache, which is only fit for a single-process dev server, and
+# DJANGO_DB_REPLICA_HOSTS is refused.
+if os.environ.get("DJANGO_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["DJANGO_REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Rendered course tree cache (api/course_cache.py)
+COURSE_TREE_CACHE = {
+    "LRU_MAX_BYTES": 32 * 1024 * 1024,  # in-process tier, per worker
+    "TIMEOUT": 24 * 60 * 60,            # shared Django cache tier
+    "CACHE_ALIAS": "default",
+}
+
+# Publish-time course snapshots (api/snapshots.py): precompressed copies stored
+# with each published course tree (levels from RESPONSE_COMPRESSION)
+COURSE_SNAPSHOTS = {
+    "PRECOMPRESS": ("gzip", "br"),
+}
+
+# gzip/brotli negotiated from Accept-Encoding (api/compression.py); "br" needs
+# the optional brotli package. Course detail bytes are compressed once per
+# content version, other responses per request.
+RESPONSE_COMPRESSION = {
+    "ENABLED": True,
+    "MIN_SIZE": 1024,
+    "ENCODINGS": ("br", "gzip"),
+}
+
+# Per-view request metrics (api/metrics.py), exposed at /metrics
+PERF_METRICS = {
+    "ENABLED": True,
+    "SERVER_TIMING": DEBUG,  # adds a Server-Timing header with db/render/total time
+    # When set, /metrics requires "Authorization: Bearer <TOKEN>"; otherwise it
+    # is only served in DEBUG, to INTERNAL_IPS and to staff sessions
+    "TOKEN": os.environ.get("DJANGO_METRICS_TOKEN"),
+}
+# Addresses allowed to read /metrics without the token. Leave out the address
+# a reverse proxy connects from, or every client would be allowed
+INTERNAL_IPS = [ip.strip() for ip in os.environ.get("DJANGO_INTERNAL_IPS", "").split(",") if ip.strip()]
+
+# Serve submit-quiz/, submit-game/, topics/<id>/mark-complete/ and
+# courses/<id>/my-progress/ with the async views in api/views.py; backend/asgi.py
+# turns this on, WSGI deployments keep the sync DRF views
+ASYNC_API_VIEWS = os.environ.get("DJANGO_ASYNC_API_VIEWS") == "1"
+
+# Write-behind mode for submit-quiz/ and submit-game/ (api/ingest.py): graded
+# submissions are journaled to PATH (relative to BASE_DIR), acknowledged with
+# 202 and written in batches by a background thread in each worker
+SUBMISSION_WRITE_BEHIND = {
+    "ENABLED": False,
+    "PATH": "submission_queue.sqlite3",
+    "MAX_PENDING": 10000,    # past this, submissions get 503 + Retry-After
+    "ENQUEUE_TIMEOUT": 0.5,
+    "BATCH_SIZE": 500,
+    "FLUSH_INTERVAL": 0.5,
+}
@@ -0,0 +1,24 @@
+"""
+Settings for the test suite:
+
+    python manage.py test api --settings=backend.test_settings
+
+The suite runs against SQLite so it needs no PostgreSQL server. The
+"replica" alias is a second SQLite database for the router tests, which
+turn replicas on themselves.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASE_REPLICAS
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test_db.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'test_replica.sqlite3',
+    },
+}
+DATABASE_REPLICAS = {**DATABASE_REPLICAS, "ALIASES": []}
@@ -22,6 +22,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 
 #নিচের দুটি লাইন নতুন করে ইমপোর্ট করুন
+from api.metrics import metrics_view
+
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -35,6 +37,7 @@ urlpatterns = [
     # নিচের দুটি লাইন নতুন যুক্ত করুন
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('metrics', metrics_view, name='metrics'),
 
 ]
 
@@ -37,28 +37,15 @@ function QuizComponent({ quizData, onQuizComplete }) {
     // }
 
     setLoading(true);
-    let correctAnswers = 0;
 
-    quizData.questions.forEach(question => {
-      const correctAnswer = question.answers.find(ans => ans.is_correct);
-      // Ensure selected answer is compared correctly (it's stored as int)
-      if (correctAnswer && selectedAnswers[question.id] === correctAnswer.id) {
-        correctAnswers++;
-      }
-    });
-
-    const calculatedScore = (correctAnswers / quizData.questions.length) * 100;
-
-    // স্কোরটি ব্যাকএন্ডে সেভ করা
+    // Send the chosen answers; the score is computed on the server
     try {
-      await submitQuizScore(quizData.id, calculatedScore);
+      const response = await submitQuizScore(quizData.id, selectedAnswers);
       console.log("কুইজের স্কোর সফলভাবে সেভ হয়েছে!");
-      setScore(calculatedScore); // স্কোর দেখানোর জন্য সেট করা
+      setScore(response.data.score); // স্কোর দেখানোর জন্য সেট করা
     } catch (error) {
       console.error("কুইজের স্কোর সেভ করতে সমস্যা হয়েছে:", error);
       alert("স্কোর সেভ করা যায়নি। অনুগ্রহ করে আবার চেষ্টা করুন।");
-      // Optionally show score even if saving failed
-      // setScore(calculatedScore);
     } finally {
       setLoading(false); // লোডিং শেষ
       // কুইজ শেষ এবং স্কোর জমা দেওয়া শেষ হলে CourseDetailPage-কে জানানো
@@ -1,18 +1,22 @@
 import React, { useState, useEffect } from 'react';
-import axios from 'axios';
 import { Link as RouterLink } from 'react-router-dom';
+import { getCourses } from '../services/apiService';
 
 // --- MUI কম্পোনেন্টগুলো ইমপোর্ট করুন ---
 import { Grid, Card, CardContent, CardActions, Typography, Button, Box } from '@mui/material';
 
 function HomePage() {
   const [courses, setCourses] = useState([]);
+  // The next page's URL; null once every course is shown
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     const fetchCourses = async () => {
       try {
-        const response = await axios.get('http://127.0.0.1:8001/api/courses/');
-        setCourses(response.data);
+        const response = await getCourses();
+        setCourses(response.data.results);
+        setNextPage(response.data.next);
       } catch (error) {
         console.error('Error fetching courses:', error);
       }
@@ -21,6 +25,20 @@ function HomePage() {
     fetchCourses();
   }, []);
 
+  const loadMore = async () => {
+    if (!nextPage || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const response = await getCourses(nextPage);
+      setCourses(prev => [...prev, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (error) {
+      console.error('Error fetching courses:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   return (
     <Box>
       <Typography variant="h4" component="h1" gutterBottom align="center">
@@ -60,6 +78,14 @@ function HomePage() {
           </Typography>
         )}
       </Grid>
+
+      {nextPage && (
+        <Box sx={{ display: 'flex', justifyContent: 'center', mt: 4 }}>
+          <Button variant="outlined" onClick={loadMore} disabled={loadingMore}>
+            {loadingMore ? 'লোড হচ্ছে...' : 'আরও কোর্স দেখুন'}
+          </Button>
+        </Box>
+      )}
     </Box>
   );
 }
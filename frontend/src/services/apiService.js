@@ -41,6 +41,20 @@ apiClient.interceptors.request.use(async (config) => {
   }
 });
 
+// Cursor-paginated listings: follow `next` until the last page. Only for
+// listings whose every row is needed at once (a course's progress, bounded
+// by its topics); long lists load page by page instead
+const getAllPages = async (url) => {
+  const results = [];
+  let next = url;
+  while (next) {
+    const response = await apiClient.get(next);
+    results.push(...response.data.results);
+    next = response.data.next;
+  }
+  return { data: results };
+};
+
 // --- API ফাংশনগুলো ---
 
 export const registerUser = (userData) => {
@@ -51,8 +65,14 @@ export const loginUser = (userData) => {
   return axios.post(`${baseURL}token/`, userData);
 };
 
+// One page of courses: { results, next }. Pass the previous page's `next`
+// to load the following one
+export const getCourses = (pageUrl = 'courses/') => {
+  return apiClient.get(pageUrl);
+};
+
 export const getCourseProgress = (courseId) => {
-  return apiClient.get(`courses/${courseId}/my-progress/`);
+  return getAllPages(`courses/${courseId}/my-progress/?page_size=100`);
 };
 
 export const markTopicComplete = (topicId) => {
@@ -73,10 +93,11 @@ export const getDashboardStats = () => {
 
 // ... আপনার আগের সব ফাংশন ...
 
-export const submitQuizScore = (quizId, score) => {
+// answers: { [questionId]: answerId }; the score is computed on the server
+export const submitQuizScore = (quizId, answers) => {
   return apiClient.post('submit-quiz/', {
     quiz_id: quizId,
-    score: score,
+    answers: answers,
   });
 };
 
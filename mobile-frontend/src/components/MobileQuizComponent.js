@@ -27,22 +27,12 @@ const MobileQuizComponent = ({ quizData, onQuizComplete }) => {
 
   const handleSubmit = async () => {
     setLoading(true);
-    let correctAnswers = 0;
-    quizData.questions.forEach(question => {
-      const correctAnswer = question.answers.find(ans => ans.is_correct);
-      if (correctAnswer && selectedAnswers[question.id] === correctAnswer.id) {
-        correctAnswers++;
-      }
-    });
-    const calculatedScore = (correctAnswers / quizData.questions.length) * 100;
-
     try {
-      await submitQuizScoreApi(quizData.id, calculatedScore);
+      const response = await submitQuizScoreApi(quizData.id, selectedAnswers);
       console.log("কুইজের স্কোর সফলভাবে সেভ হয়েছে!");
-      setScore(calculatedScore);
+      setScore(response.data.score);
     } catch (error) {
       console.error("কুইজের স্কোর সেভ করতে সমস্যা হয়েছে:", error);
-      setScore(calculatedScore);
     } finally {
       setLoading(false);
       if (onQuizComplete) {
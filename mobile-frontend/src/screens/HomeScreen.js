@@ -11,13 +11,17 @@ const HomeScreen = () => {
 
   const [courses, setCourses] = useState([]);
   const [loading, setLoading] = useState(true);
+  // The next page's URL; null once every course is shown
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     if (user) {
       setLoading(true);
       getCoursesApi()
         .then(response => {
-          setCourses(response.data);
+          setCourses(response.data.results);
+          setNextPage(response.data.next);
         })
         .catch(error => {
           console.error('Failed to fetch courses:', error);
@@ -29,6 +33,23 @@ const HomeScreen = () => {
     }
   }, [user]);
 
+  // The next page is fetched as the list scrolls near its end
+  const loadMore = () => {
+    if (!nextPage || loadingMore) return;
+    setLoadingMore(true);
+    getCoursesApi(nextPage)
+      .then(response => {
+        setCourses(prev => [...prev, ...response.data.results]);
+        setNextPage(response.data.next);
+      })
+      .catch(error => {
+        console.error('Failed to fetch courses:', error);
+      })
+      .finally(() => {
+        setLoadingMore(false);
+      });
+  };
+
   // --- লগইন করা না থাকলে যা দেখাবে ---
   if (!user) {
     return (
@@ -61,6 +82,9 @@ const HomeScreen = () => {
       data={courses}
       keyExtractor={(item) => item.id.toString()}
       contentContainerStyle={styles.listContainer}
+      onEndReached={loadMore}
+      onEndReachedThreshold={0.5}
+      ListFooterComponent={loadingMore ? <ActivityIndicator style={styles.footer} /> : null}
       ListHeaderComponent={
         <Text variant="headlineMedium" style={styles.title}>
           স্বাগতম, {user.username}!
@@ -115,6 +139,9 @@ const styles = StyleSheet.create({
   card: {
     marginBottom: 15,
   },
+  footer: {
+    marginVertical: 15,
+  },
 });
 
 export default HomeScreen;
\ No newline at end of file
@@ -44,6 +44,20 @@ apiClient.interceptors.request.use(async (config) => {
 });
 
 
+// Cursor-paginated listings: follow `next` until the last page. Only for
+// listings whose every row is needed at once (a course's progress, bounded
+// by its topics); long lists load page by page instead
+const getAllPages = async (url) => {
+  const results = [];
+  let next = url;
+  while (next) {
+    const response = await apiClient.get(next);
+    results.push(...response.data.results);
+    next = response.data.next;
+  }
+  return { data: results };
+};
+
 // --- API ফাংশনগুলো ---
 export const registerUserApi = (userData) => {
   return apiClient.post('register/', userData);
@@ -53,8 +67,10 @@ export const loginUserApi = (userData) => {
   return axios.post(`${API_URL}token/`, userData);
 };
 
-export const getCoursesApi = () => {
-  return apiClient.get('courses/');
+// One page of courses: { results, next }. Pass the previous page's `next`
+// to load the following one
+export const getCoursesApi = (pageUrl = 'courses/') => {
+  return apiClient.get(pageUrl);
 };
 
 export const getCourseDetailApi = (courseId) => {
@@ -62,17 +78,18 @@ export const getCourseDetailApi = (courseId) => {
 };
 
 export const getCourseProgressApi = (courseId) => {
-  return apiClient.get(`courses/${courseId}/my-progress/`);
+  return getAllPages(`courses/${courseId}/my-progress/?page_size=100`);
 };
 
 export const markTopicCompleteApi = (topicId) => {
   return apiClient.post(`topics/${topicId}/mark-complete/`);
 };
 
-export const submitQuizScoreApi = (quizId, score) => {
+// answers: { [questionId]: answerId }; the score is computed on the server
+export const submitQuizScoreApi = (quizId, answers) => {
   return apiClient.post('submit-quiz/', {
     quiz_id: quizId,
-    score: score,
+    answers: answers,
   });
 };
 
@@ -83,6 +100,12 @@ export const submitGameScoreApi = (gameId, score) => {
   });
 };
 
+// Send results recorded while offline in one request
+// events: [{ type: 'quiz', quiz_id, answers }, { type: 'game', game_id, score }, { type: 'topic_complete', topic_id }]
+export const syncOfflineEventsApi = (events) => {
+  return apiClient.post('sync/', { events });
+};
+
 // ----- নিচের ফাংশনটি নতুন যোগ করুন -----
 export const getDashboardStatsApi = () => {
   return apiClient.get('dashboard-stats/');